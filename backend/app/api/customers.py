@@ -1,12 +1,23 @@
+from datetime import datetime, timedelta
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import and_, select, func, case, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.models.models import Customer
-from app.schemas.schemas import CustomerCreate, CustomerResponse, CustomerListResponse
+from app.core.responses import FastJSONResponse
+from app.services import entity_cache
+from app.services.media import media_url_for
+from app.models.models import Customer, RevisitDue, Treatment, TreatmentPhoto
+from app.schemas.schemas import (
+    CustomerCreate,
+    CustomerResponse,
+    CustomerListResponse,
+    RevisitDueResponse,
+    TreatmentTimelineItem,
+    UTCDateTime,
+)
 
 router = APIRouter(prefix="/shops/{shop_id}/customers", tags=["customers"])
 
@@ -24,18 +35,22 @@ async def create_customer(
 
 @router.get("/", response_model=list[CustomerListResponse])
 async def list_customers(
+    request: Request,
     shop_id: UUID,
     search: str | None = None,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=50, le=100),
     db: AsyncSession = Depends(get_db),
 ):
-    query = select(Customer).where(Customer.shop_id == shop_id)
+    # Only the CustomerListResponse columns - no ORM hydration
+    query = select(
+        Customer.id, Customer.name, Customer.phone, Customer.visit_count, Customer.last_visit
+    ).where(Customer.shop_id == shop_id)
     if search:
         query = query.where(Customer.name.ilike(f"%{search}%"))
     query = query.order_by(Customer.last_visit.desc().nullslast()).offset(skip).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return FastJSONResponse([dict(row) for row in result.mappings().all()], request)
 
 
 @router.get("/count")
@@ -46,6 +61,45 @@ async def count_customers(shop_id: UUID, db: AsyncSession = Depends(get_db)):
     return {"count": result.scalar()}
 
 
+@router.get("/revisit-due", response_model=list[RevisitDueResponse])
+async def list_revisit_due(
+    shop_id: UUID,
+    within_days: int = Query(default=7, ge=0, le=365),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Customers due (or overdue) for a revisit within `within_days`, most overdue first.
+
+    Reads the precomputed revisit_due table (idx_revisit_due_shop_due_at).
+    """
+    now = datetime.utcnow()
+    query = (
+        select(
+            RevisitDue.customer_id,
+            Customer.name,
+            Customer.phone,
+            RevisitDue.last_visit,
+            RevisitDue.interval_days,
+            RevisitDue.due_at,
+        )
+        .join(Customer, Customer.id == RevisitDue.customer_id)
+        .where(
+            RevisitDue.shop_id == shop_id,
+            RevisitDue.due_at <= now + timedelta(days=within_days),
+        )
+        .order_by(RevisitDue.due_at)
+        .offset(skip)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [
+        {**row, "overdue_days": (now - row["due_at"].replace(tzinfo=None)).days}
+        for row in result.mappings().all()
+    ]
+
+
 @router.get("/{customer_id}", response_model=CustomerResponse)
 async def get_customer(
     shop_id: UUID, customer_id: UUID, db: AsyncSession = Depends(get_db)
@@ -59,6 +113,77 @@ async def get_customer(
     return customer
 
 
+@router.get("/{customer_id}/timeline", response_model=list[TreatmentTimelineItem])
+async def get_customer_timeline(
+    shop_id: UUID,
+    customer_id: UUID,
+    before: UTCDateTime | None = None,
+    before_id: UUID | None = None,
+    limit: int = Query(default=20, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Treatment summaries for a customer profile, newest first.
+
+    Keyset-paginated on (created_at, id): pass the last item's `created_at` as
+    `before` and its `id` as `before_id`, so visits recorded in the same instant
+    are never skipped or repeated and deep pages stay an index range scan on
+    (customer_id, created_at desc, id desc). Each item carries a photo count and
+    one cover thumbnail; full photos are fetched per treatment via
+    GET /treatments/{treatment_id}/photos.
+    """
+    if await entity_cache.get_customer(db, shop_id, customer_id) is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    # Correlated on the partition key too, so each lookup reads one month's partition
+    of_treatment = and_(
+        TreatmentPhoto.treatment_id == Treatment.id,
+        TreatmentPhoto.treatment_created_at == Treatment.created_at,
+    )
+    photo_count = (
+        select(func.count())
+        .where(of_treatment)
+        .correlate(Treatment)
+        .scalar_subquery()
+    )
+    # Prefer an "after" shot as the cover, newest first
+    cover_path = (
+        select(func.coalesce(TreatmentPhoto.thumbnail_url, TreatmentPhoto.photo_url))
+        .where(of_treatment)
+        .order_by(
+            case((TreatmentPhoto.photo_type == "after", 0), else_=1),
+            TreatmentPhoto.taken_at.desc(),
+        )
+        .limit(1)
+        .correlate(Treatment)
+        .scalar_subquery()
+    )
+    query = select(
+        Treatment.id,
+        Treatment.service_type,
+        Treatment.service_detail,
+        Treatment.satisfaction,
+        Treatment.next_visit_recommendation,
+        Treatment.created_at,
+        photo_count.label("photo_count"),
+        cover_path.label("cover_path"),
+    ).where(Treatment.customer_id == customer_id, Treatment.shop_id == shop_id)
+    if before and before_id:
+        query = query.where(tuple_(Treatment.created_at, Treatment.id) < tuple_(before, before_id))
+    elif before:
+        query = query.where(Treatment.created_at < before)
+    query = query.order_by(Treatment.created_at.desc(), Treatment.id.desc()).limit(limit)
+    result = await db.execute(query)
+    items = []
+    for row in result.mappings().all():
+        item = dict(row)
+        cover = item.pop("cover_path")
+        # Local files get the versioned /media URL; remote ones are served by their CDN
+        item["cover_photo_url"] = media_url_for(cover) or cover
+        items.append(item)
+    return items
+
+
 @router.put("/{customer_id}", response_model=CustomerResponse)
 async def update_customer(
     shop_id: UUID,
@@ -75,5 +200,6 @@ async def update_customer(
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(customer, key, value)
     await db.commit()
+    entity_cache.invalidate(entity_cache.CUSTOMER, customer_id)
     await db.refresh(customer)
     return customer
@@ -1,12 +1,17 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.models import TreatmentPhoto
+from app.models.models import FaceSwapBatch, FaceSwapBatchItem, Treatment, TreatmentPhoto
+from app.schemas.schemas import FaceSwapBatchCreate, FaceSwapBatchResponse
+from app.services import entity_cache
 from app.services.akool import face_swap, get_face_swap_status
+from app.services.face_swap_batch import claimable, start_batch
 
 router = APIRouter(prefix="/face-swap", tags=["face-swap"])
 
@@ -22,31 +27,120 @@ async def start_face_swap(
     - source_photo_id: photo with the face to use (stock/model face)
     - target_photo_id: treatment photo whose face will be replaced
     """
-    source_result = await db.execute(
-        select(TreatmentPhoto).where(TreatmentPhoto.id == source_photo_id)
-    )
-    source = source_result.scalar_one_or_none()
+    source = await entity_cache.get_photo(db, source_photo_id)
     if not source:
         raise HTTPException(status_code=404, detail="Source photo not found")
 
-    target_result = await db.execute(
-        select(TreatmentPhoto).where(TreatmentPhoto.id == target_photo_id)
-    )
-    target = target_result.scalar_one_or_none()
+    # Shop of the target photo decides whose AKOOL quota the job counts against
+    target = await entity_cache.get_photo(db, target_photo_id)
     if not target:
         raise HTTPException(status_code=404, detail="Target photo not found")
 
-    result = await face_swap(source.photo_url, target.photo_url)
+    result = await face_swap(source.photo_url, target.photo_url, shop_id=target.shop_id)
     return result
 
 
 @router.get("/status/{job_id}")
-async def check_face_swap_status(job_id: str):
+async def check_face_swap_status(job_id: str, shop_id: UUID | None = None):
     """Check the status of a face swap job."""
-    result = await get_face_swap_status(job_id)
+    result = await get_face_swap_status(job_id, shop_id=shop_id)
     return result
 
 
+@router.post("/batch", response_model=FaceSwapBatchResponse)
+async def start_face_swap_batch(data: FaceSwapBatchCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Apply one source (model) face to many target photos.
+
+    Returns immediately with a batch id and per-item status; items are
+    submitted to AKOOL in the background with bounded concurrency.
+    """
+    target_ids = list(dict.fromkeys(data.target_photo_ids))
+    if not target_ids:
+        raise HTTPException(status_code=400, detail="No target photos")
+    if len(target_ids) > settings.FACE_SWAP_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.FACE_SWAP_BATCH_MAX_ITEMS} target photos per batch",
+        )
+
+    # Source and all targets in one query
+    result = await db.execute(
+        select(TreatmentPhoto.id, Treatment.shop_id)
+        .join(TreatmentPhoto.treatment)
+        .where(TreatmentPhoto.id.in_([data.source_photo_id, *target_ids]))
+    )
+    shop_by_photo = dict(result.all())
+    if data.source_photo_id not in shop_by_photo:
+        raise HTTPException(status_code=404, detail="Source photo not found")
+    missing = [pid for pid in target_ids if pid not in shop_by_photo]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Target photo not found: {missing[0]}")
+    shop_ids = {shop_by_photo[pid] for pid in target_ids}
+    if len(shop_ids) > 1:
+        raise HTTPException(status_code=400, detail="Target photos must belong to one shop")
+    shop_id = shop_ids.pop()
+    if shop_by_photo[data.source_photo_id] != shop_id:
+        raise HTTPException(status_code=400, detail="Source photo must belong to the target photos' shop")
+
+    batch = FaceSwapBatch(
+        shop_id=shop_id,
+        source_photo_id=data.source_photo_id,
+        items=[FaceSwapBatchItem(target_photo_id=pid, status="pending") for pid in target_ids],
+    )
+    db.add(batch)
+    await db.commit()
+
+    start_batch(batch.id)
+    return batch
+
+
+@router.get("/batch/{batch_id}", response_model=FaceSwapBatchResponse)
+async def get_face_swap_batch(batch_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Per-item status of a face swap batch."""
+    result = await db.execute(
+        select(FaceSwapBatch)
+        .options(selectinload(FaceSwapBatch.items))
+        .where(FaceSwapBatch.id == batch_id)
+    )
+    batch = result.scalar_one_or_none()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
+@router.post("/batch/{batch_id}/resume", response_model=FaceSwapBatchResponse)
+async def resume_face_swap_batch(batch_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Resubmit failed (or never submitted) items; submitted items are left alone.
+
+    Items are claimed in the database, so resuming a batch that is still
+    running just adds a runner; in_flight items are only picked up again once
+    their claim has timed out.
+    """
+    await db.execute(
+        update(FaceSwapBatchItem)
+        .where(FaceSwapBatchItem.batch_id == batch_id, FaceSwapBatchItem.status == "failed")
+        .values(status="pending", error=None)
+    )
+    await db.commit()
+
+    result = await db.execute(
+        select(FaceSwapBatch)
+        .options(selectinload(FaceSwapBatch.items))
+        .where(FaceSwapBatch.id == batch_id)
+    )
+    batch = result.scalar_one_or_none()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    has_work = await db.scalar(
+        select(FaceSwapBatchItem.id).where(FaceSwapBatchItem.batch_id == batch_id, claimable()).limit(1)
+    )
+    if has_work:
+        start_batch(batch.id)
+    return batch
+
+
 @router.post("/complete/{photo_id}")
 async def save_face_swap_result(
     photo_id: UUID,
@@ -63,5 +157,6 @@ async def save_face_swap_result(
 
     photo.face_swapped_url = face_swapped_url
     await db.commit()
+    entity_cache.invalidate(entity_cache.PHOTO, photo_id)
     await db.refresh(photo)
     return {"status": "ok", "photo_id": str(photo.id), "face_swapped_url": face_swapped_url}
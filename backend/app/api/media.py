@@ -0,0 +1,78 @@
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from app.core.config import settings
+from app.services.media import (
+    file_version,
+    media_url_for,
+    negotiate_variant,
+    resolve_media_path,
+)
+from app.services.storage import UPLOAD_DIR
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= int(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.api_route("/{version}/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_media(version: str, file_path: str, request: Request):
+    """
+    Serve an uploaded file under a versioned, immutable URL.
+
+    - Content negotiation: WebP/AVIF variants are served when the client's
+      Accept header allows them (Vary: Accept keeps CDN caches correct).
+    - Conditional requests: strong ETag derived from the file version, plus
+      Last-Modified; both answer with 304.
+    - Range requests and sendfile are handled by FileResponse, or handed off
+      to nginx via X-Accel-Redirect when MEDIA_ACCEL_REDIRECT_PREFIX is set.
+    """
+    original = resolve_media_path(file_path)
+    if original is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    current_version = file_version(original)
+    if version != current_version:
+        # Stale URL (file was replaced) - point to the current one without caching the redirect
+        return RedirectResponse(
+            media_url_for(file_path),
+            status_code=307,
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    served, media_type = negotiate_variant(original, request.headers.get("accept", ""))
+    stat = served.stat()
+    etag = f'"{current_version}-{served.suffix.lstrip(".")}"'
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Vary": "Accept",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        relative = served.relative_to(UPLOAD_DIR.resolve()).as_posix()
+        headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative)
+        return Response(media_type=media_type, headers=headers)
+
+    return FileResponse(served, media_type=media_type, headers=headers, stat_result=stat)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+
+from app.services import akool, audio, entity_cache, openai_service
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/ai")
+async def ai_call_metrics():
+    """Limiter, retry and circuit breaker metrics for outbound AI calls (this worker only)."""
+    return {
+        "openai": {
+            "limiter": openai_service.limiter.stats(),
+            "resilience": openai_service.upstream.stats(),
+            "audio_preprocess": audio.stats.as_dict(),
+        },
+        "akool": {
+            "limiter": akool.limiter.stats(),
+            "resilience": akool.upstream.stats(),
+        },
+    }
+
+
+@router.get("/cache")
+async def entity_cache_metrics():
+    """Entity cache hit ratio, DB round trips saved and invalidation traffic (this worker only)."""
+    return {**entity_cache.cache.stats(), "listener": entity_cache.listener.stats()}
@@ -1,13 +1,16 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.database import get_db
+from app.core.responses import FastJSONResponse
 from app.models.models import Portfolio, TreatmentPhoto
 from app.schemas.schemas import PortfolioCreate, PortfolioResponse
+from app.schemas.serializers import portfolio_to_dict
+from app.services import entity_cache
 
 router = APIRouter(prefix="/shops/{shop_id}/portfolio", tags=["portfolio"])
 
@@ -16,16 +19,15 @@ router = APIRouter(prefix="/shops/{shop_id}/portfolio", tags=["portfolio"])
 async def create_portfolio_item(
     shop_id: UUID, data: PortfolioCreate, db: AsyncSession = Depends(get_db)
 ):
-    # Verify photo exists
-    result = await db.execute(
-        select(TreatmentPhoto).where(TreatmentPhoto.id == data.photo_id)
-    )
-    photo = result.scalar_one_or_none()
+    # Verify photo exists and belongs to this shop
+    photo = await entity_cache.get_photo(db, data.photo_id, shop_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
 
     # Mark photo as portfolio
-    photo.is_portfolio = True
+    await db.execute(
+        update(TreatmentPhoto).where(TreatmentPhoto.id == data.photo_id).values(is_portfolio=True)
+    )
 
     portfolio = Portfolio(
         shop_id=shop_id,
@@ -36,6 +38,7 @@ async def create_portfolio_item(
     )
     db.add(portfolio)
     await db.commit()
+    entity_cache.invalidate(entity_cache.PHOTO, data.photo_id)
     await db.refresh(portfolio)
 
     # Re-fetch with photo
@@ -49,6 +52,7 @@ async def create_portfolio_item(
 
 @router.get("/", response_model=list[PortfolioResponse])
 async def list_portfolio(
+    request: Request,
     shop_id: UUID,
     published_only: bool = True,
     skip: int = Query(default=0, ge=0),
@@ -64,7 +68,7 @@ async def list_portfolio(
         query = query.where(Portfolio.is_published.is_(True))
     query = query.order_by(Portfolio.created_at.desc()).offset(skip).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return FastJSONResponse([portfolio_to_dict(p) for p in result.scalars().all()], request)
 
 
 @router.put("/{portfolio_id}/publish", response_model=PortfolioResponse)
@@ -0,0 +1,36 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.responses import FastJSONResponse
+from app.schemas.schemas import SyncChangesResponse
+from app.services.sync import SyncTokenError, SyncTokenExpiredError, fetch_changes
+
+router = APIRouter(prefix="/shops/{shop_id}/sync", tags=["sync"])
+
+
+@router.get("/changes", response_model=SyncChangesResponse)
+async def get_changes(
+    request: Request,
+    shop_id: UUID,
+    since: str | None = None,
+    limit: int = Query(default=settings.SYNC_PAGE_SIZE, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Customers, treatments and portfolio items changed since `since`, plus deletions.
+
+    Omit `since` for the initial sync. Keep calling with `next_token` while
+    `has_more` is true, then store `next_token` for the next sync.
+    410 means the token is too old - drop the local replica and start over.
+    """
+    try:
+        page = await fetch_changes(db, shop_id, since, limit)
+    except SyncTokenExpiredError as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    except SyncTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return FastJSONResponse(page, request)
@@ -1,15 +1,40 @@
+import asyncio
+import uuid
 from datetime import datetime
+from pathlib import Path
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy import select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, UploadFile, File, Form
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.responses import FastJSONResponse
 from app.models.models import Treatment, TreatmentPhoto, Customer
-from app.schemas.schemas import TreatmentCreate, TreatmentResponse, PhotoResponse
-from app.services.storage import save_file_local
+from app.schemas.schemas import (
+    DuplicateGroup,
+    PhotoBatchUploadResponse,
+    PhotoResponse,
+    QuickRecordCreate,
+    SimilarPhoto,
+    TreatmentCreate,
+    TreatmentResponse,
+    UTCDateTime,
+)
+from app.schemas.serializers import treatment_to_dict
+from app.services import entity_cache
+from app.services.image_hash import (
+    DEFAULT_MAX_DISTANCE,
+    HashIndex,
+    fingerprint,
+    group_near_duplicates,
+    shop_index,
+)
+from app.services.media import build_variants
+from app.services.photo_archive import restore_photo
+from app.services.storage import FileTooLargeError, save_file_local, save_upload_local
 
 router = APIRouter(prefix="/shops/{shop_id}/treatments", tags=["treatments"])
 
@@ -18,6 +43,11 @@ router = APIRouter(prefix="/shops/{shop_id}/treatments", tags=["treatments"])
 async def create_treatment(
     shop_id: UUID, data: TreatmentCreate, db: AsyncSession = Depends(get_db)
 ):
+    if not await entity_cache.get_customer(db, shop_id, data.customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    if data.designer_id and not await entity_cache.get_designer(db, shop_id, data.designer_id):
+        raise HTTPException(status_code=404, detail="Designer not found")
+
     products_data = None
     if data.products_used:
         products_data = [p.model_dump() for p in data.products_used]
@@ -38,14 +68,15 @@ async def create_treatment(
     )
     db.add(treatment)
 
-    # Update customer visit count
-    result = await db.execute(select(Customer).where(Customer.id == data.customer_id))
-    customer = result.scalar_one_or_none()
-    if customer:
-        customer.visit_count += 1
-        customer.last_visit = datetime.utcnow()
+    # Update customer visit count (atomic - no need to load the row)
+    await db.execute(
+        update(Customer)
+        .where(Customer.id == data.customer_id)
+        .values(visit_count=Customer.visit_count + 1, last_visit=datetime.utcnow())
+    )
 
     await db.commit()
+    entity_cache.invalidate(entity_cache.CUSTOMER, data.customer_id)
     await db.refresh(treatment)
 
     # Re-fetch with photos loaded
@@ -57,15 +88,91 @@ async def create_treatment(
     return result.scalar_one()
 
 
+@router.post("/quick", response_model=TreatmentResponse)
+async def quick_record(
+    shop_id: UUID, data: QuickRecordCreate, db: AsyncSession = Depends(get_db)
+):
+    """
+    Big-button save: create the treatment, attach already-uploaded photos and
+    bump the customer's visit stats in one transaction and one round trip.
+    """
+    if data.designer_id and not await entity_cache.get_designer(db, shop_id, data.designer_id):
+        raise HTTPException(status_code=404, detail="Designer not found")
+
+    treatment_id = uuid.uuid4()
+    now = datetime.utcnow()
+
+    # Atomic visit bump - also verifies the customer belongs to this shop
+    result = await db.execute(
+        update(Customer)
+        .where(Customer.id == data.customer_id, Customer.shop_id == shop_id)
+        .values(visit_count=Customer.visit_count + 1, last_visit=now, updated_at=now)
+        .returning(Customer.id)
+    )
+    if result.scalar_one_or_none() is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    db.add(
+        Treatment(
+            id=treatment_id,
+            shop_id=shop_id,
+            customer_id=data.customer_id,
+            designer_id=data.designer_id,
+            service_type=data.service_type,
+            products_used=[p.model_dump() for p in data.products] if data.products else None,
+            created_at=now,
+        )
+    )
+    await db.flush()
+
+    if data.photo_ids:
+        photo_ids = set(data.photo_ids)
+        # Re-parent all photos in one statement, limited to this shop's photos
+        result = await db.execute(
+            update(TreatmentPhoto)
+            .where(
+                TreatmentPhoto.id.in_(photo_ids),
+                TreatmentPhoto.treatment_id.in_(
+                    select(Treatment.id).where(Treatment.shop_id == shop_id)
+                ),
+            )
+            .values(treatment_id=treatment_id, treatment_created_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(photo_ids):
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Photo not found")
+
+    await db.commit()
+    entity_cache.invalidate(entity_cache.CUSTOMER, data.customer_id)
+    for photo_id in data.photo_ids or ():
+        entity_cache.invalidate(entity_cache.PHOTO, photo_id)
+        shop_index.invalidate_photo(photo_id)
+
+    result = await db.execute(
+        select(Treatment)
+        .options(selectinload(Treatment.photos))
+        .where(Treatment.id == treatment_id)
+    )
+    return result.scalar_one()
+
+
 @router.get("/", response_model=list[TreatmentResponse])
 async def list_treatments(
+    request: Request,
     shop_id: UUID,
     customer_id: UUID | None = None,
     service_type: str | None = None,
+    created_after: UTCDateTime | None = None,
+    created_before: UTCDateTime | None = None,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=50, le=100),
     db: AsyncSession = Depends(get_db),
 ):
+    # treatments is partitioned by created_at with no default partition
+    # (migration 013): the ORDER BY ... LIMIT reads partitions newest-first and
+    # stops early, and a created_after/before range prunes the rest
     query = (
         select(Treatment)
         .options(selectinload(Treatment.photos))
@@ -75,9 +182,74 @@ async def list_treatments(
         query = query.where(Treatment.customer_id == customer_id)
     if service_type:
         query = query.where(Treatment.service_type == service_type)
+    if created_after:
+        query = query.where(Treatment.created_at >= created_after)
+    if created_before:
+        query = query.where(Treatment.created_at < created_before)
     query = query.order_by(Treatment.created_at.desc()).offset(skip).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return FastJSONResponse([treatment_to_dict(t) for t in result.scalars().all()], request)
+
+
+@router.get("/photos/{photo_id}/similar", response_model=list[SimilarPhoto])
+async def find_similar_photos(
+    shop_id: UUID,
+    photo_id: UUID,
+    max_distance: int = Query(default=DEFAULT_MAX_DISTANCE, ge=0, le=16),
+    limit: int = Query(default=20, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """Near-duplicates of a photo across the whole shop (perceptual hash distance)."""
+    result = await db.execute(
+        select(TreatmentPhoto.phash)
+        .join(TreatmentPhoto.treatment)
+        .where(TreatmentPhoto.id == photo_id, Treatment.shop_id == shop_id)
+    )
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    if row.phash is None:
+        return []
+
+    index = shop_index.get(shop_id)
+    if index is None:
+        result = await db.execute(
+            select(TreatmentPhoto.phash, TreatmentPhoto.id)
+            .join(TreatmentPhoto.treatment)
+            .where(Treatment.shop_id == shop_id, TreatmentPhoto.phash.is_not(None))
+        )
+        index = HashIndex(result.all())
+        shop_index.put(shop_id, index)
+
+    matches = [
+        {"photo_id": other_id, "distance": distance}
+        for other_id, distance in index.search(row.phash, max_distance)
+        if other_id != photo_id
+    ]
+    return matches[:limit]
+
+
+@router.post("/photos/{photo_id}/restore", response_model=PhotoResponse)
+async def restore_archived_photo(
+    shop_id: UUID,
+    photo_id: UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """Bring an archived (cold) photo original back to the hot tier."""
+    result = await db.execute(
+        select(TreatmentPhoto)
+        .join(TreatmentPhoto.treatment)
+        .where(TreatmentPhoto.id == photo_id, Treatment.shop_id == shop_id)
+    )
+    photo = result.scalar_one_or_none()
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    try:
+        photo = await restore_photo(db, photo)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    entity_cache.invalidate(entity_cache.PHOTO, photo_id)
+    return photo
 
 
 @router.get("/{treatment_id}", response_model=TreatmentResponse)
@@ -95,34 +267,200 @@ async def get_treatment(
     return treatment
 
 
+@router.get("/{treatment_id}/photos", response_model=list[PhotoResponse])
+async def list_treatment_photos(
+    shop_id: UUID,
+    treatment_id: UUID,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, le=100),
+    collapse_duplicates: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Page through one treatment's photos (lazy loading for the customer timeline).
+
+    With collapse_duplicates, bursts of near-identical shots are reduced to
+    their sharpest photo.
+    """
+    treatment = await entity_cache.get_treatment(db, shop_id, treatment_id)
+    if not treatment:
+        raise HTTPException(status_code=404, detail="Treatment not found")
+    # The partition key comes from the treatment, so only its month is read
+    query = (
+        select(TreatmentPhoto)
+        .where(
+            TreatmentPhoto.treatment_id == treatment_id,
+            TreatmentPhoto.treatment_created_at == treatment.created_at,
+        )
+        .order_by(TreatmentPhoto.taken_at.desc())
+    )
+    if not collapse_duplicates:
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
+
+    result = await db.execute(query)
+    photos = result.scalars().all()
+    hashed = [(p.id, p.phash, p.sharpness) for p in photos if p.phash is not None]
+    best = {group[0] for group in group_near_duplicates(hashed)}
+    kept = [p for p in photos if p.phash is None or p.id in best]
+    return kept[skip:skip + limit]
+
+
+@router.get("/{treatment_id}/photos/duplicates", response_model=list[DuplicateGroup])
+async def list_duplicate_photos(
+    shop_id: UUID,
+    treatment_id: UUID,
+    max_distance: int = Query(default=DEFAULT_MAX_DISTANCE, ge=0, le=16),
+    db: AsyncSession = Depends(get_db),
+):
+    """Groups of near-duplicate photos within a treatment, best shot first."""
+    treatment = await entity_cache.get_treatment(db, shop_id, treatment_id)
+    if not treatment:
+        raise HTTPException(status_code=404, detail="Treatment not found")
+    result = await db.execute(
+        select(TreatmentPhoto.id, TreatmentPhoto.phash, TreatmentPhoto.sharpness)
+        .where(
+            TreatmentPhoto.treatment_id == treatment_id,
+            TreatmentPhoto.treatment_created_at == treatment.created_at,
+            TreatmentPhoto.phash.is_not(None),
+        )
+    )
+    groups = group_near_duplicates([tuple(row) for row in result.all()], max_distance)
+    return [
+        {"best_photo_id": group[0], "photo_ids": group}
+        for group in groups
+        if len(group) > 1
+    ]
+
+
 @router.post("/{treatment_id}/photos", response_model=PhotoResponse)
 async def upload_treatment_photo(
     shop_id: UUID,
     treatment_id: UUID,
+    background_tasks: BackgroundTasks,
     photo_type: str = Form(default="after"),
     caption: str | None = Form(default=None),
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
 ):
     # Verify treatment exists
-    result = await db.execute(
-        select(Treatment).where(
-            Treatment.id == treatment_id, Treatment.shop_id == shop_id
-        )
-    )
-    if not result.scalar_one_or_none():
+    treatment = await entity_cache.get_treatment(db, shop_id, treatment_id)
+    if not treatment:
         raise HTTPException(status_code=404, detail="Treatment not found")
 
     content = await file.read()
     file_path = await save_file_local(content, file.filename, subfolder="photos")
+    # Precompress WebP/AVIF variants off the request path
+    background_tasks.add_task(build_variants, Path(file_path))
+    phash, sharpness = await fingerprint(file_path) or (None, None)
 
     photo = TreatmentPhoto(
         treatment_id=treatment_id,
+        treatment_created_at=treatment.created_at,
         photo_url=file_path,
         photo_type=photo_type,
         caption=caption,
+        phash=phash,
+        sharpness=sharpness,
     )
     db.add(photo)
     await db.commit()
     await db.refresh(photo)
+    if phash is not None:
+        shop_index.add(shop_id, phash, photo.id)
     return photo
+
+
+@router.post("/{treatment_id}/photos/batch", response_model=PhotoBatchUploadResponse)
+async def upload_treatment_photos_batch(
+    shop_id: UUID,
+    treatment_id: UUID,
+    background_tasks: BackgroundTasks,
+    files: list[UploadFile] = File(...),
+    photo_types: list[str] | None = Form(default=None),
+    captions: list[str] | None = Form(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload many photos to a treatment in one request.
+
+    `photo_types` / `captions` are matched to `files` by position (missing
+    entries default to "after" / no caption). Files are streamed to disk and
+    fingerprinted concurrently (PHOTO_BATCH_CONCURRENCY), then all rows are
+    inserted in one statement. A bad file fails on its own; the rest are kept.
+    If the batch fails as a whole (an unexpected error, or the INSERT), every
+    file it saved is deleted again.
+    """
+    if len(files) > settings.PHOTO_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=422, detail=f"At most {settings.PHOTO_BATCH_MAX_FILES} files per batch"
+        )
+
+    treatment = await entity_cache.get_treatment(db, shop_id, treatment_id)
+    if not treatment:
+        raise HTTPException(status_code=404, detail="Treatment not found")
+    treatment_created_at = treatment.created_at
+
+    photo_types = photo_types or []
+    captions = captions or []
+    semaphore = asyncio.Semaphore(settings.PHOTO_BATCH_CONCURRENCY)
+    saved: list[str] = []
+
+    async def ingest(index: int, file: UploadFile) -> dict:
+        async with semaphore:
+            file_path = await save_upload_local(file, subfolder="photos", max_size=settings.MAX_FILE_SIZE)
+            saved.append(file_path)
+            phash, sharpness = await fingerprint(file_path) or (None, None)
+        return {
+            "treatment_id": treatment_id,
+            "treatment_created_at": treatment_created_at,
+            "photo_url": file_path,
+            "photo_type": photo_types[index] if index < len(photo_types) else "after",
+            "caption": (captions[index] or None) if index < len(captions) else None,
+            "phash": phash,
+            "sharpness": sharpness,
+        }
+
+    results: list[dict] = []
+    rows: list[dict] = []
+    photos: list[TreatmentPhoto] = []
+    try:
+        outcomes = await asyncio.gather(
+            *(ingest(i, f) for i, f in enumerate(files)), return_exceptions=True
+        )
+        for index, (file, outcome) in enumerate(zip(files, outcomes)):
+            if isinstance(outcome, BaseException):
+                if not isinstance(outcome, (OSError, FileTooLargeError)):
+                    raise outcome
+                results.append(
+                    {"index": index, "filename": file.filename, "status": "failed", "error": str(outcome)}
+                )
+            else:
+                results.append({"index": index, "filename": file.filename, "status": "created"})
+                rows.append(outcome)
+
+        if rows:
+            # One multi-row INSERT ... RETURNING for the whole batch
+            photos = (
+                await db.scalars(
+                    insert(TreatmentPhoto).returning(TreatmentPhoto, sort_by_parameter_order=True), rows
+                )
+            ).all()
+            await db.commit()
+    except BaseException:
+        # Nothing was recorded (or the client went away): don't leave orphaned files
+        for file_path in saved:
+            Path(file_path).unlink(missing_ok=True)
+        raise
+
+    for item, photo in zip((r for r in results if r["status"] == "created"), photos):
+        item["photo"] = photo
+        background_tasks.add_task(build_variants, Path(photo.photo_url))
+        if photo.phash is not None:
+            shop_index.add(shop_id, photo.phash, photo.id)
+
+    return {
+        "created": len(rows),
+        "failed": len(results) - len(rows),
+        "results": results,
+    }
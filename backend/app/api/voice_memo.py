@@ -1,40 +1,104 @@
+import json
 import os
 import tempfile
+from uuid import UUID
+
+from fastapi import APIRouter, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 
-from fastapi import APIRouter, UploadFile, File
 from app.schemas.schemas import VoiceMemoResponse
-from app.services.openai_service import transcribe_and_extract
+from app.services.openai_service import (
+    TreatmentExtraction,
+    stream_treatment_info,
+    transcribe_and_extract,
+    transcribe_audio,
+)
 
 router = APIRouter(prefix="/voice", tags=["voice"])
 
 
+async def _save_temp(file: UploadFile) -> str:
+    suffix = os.path.splitext(file.filename or "audio.webm")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        content = await file.read()
+        tmp.write(content)
+        return tmp.name
+
+
+def _to_response(extraction: TreatmentExtraction) -> VoiceMemoResponse:
+    return VoiceMemoResponse(
+        customer_name=extraction.customer_name,
+        service_type=extraction.service_type,
+        products_used=[
+            {"brand": p.brand, "code": p.code, "area": p.area}
+            for p in (extraction.products_used or [])
+        ],
+        area=extraction.area,
+        duration_minutes=extraction.duration_minutes,
+        satisfaction=extraction.satisfaction,
+        next_visit_recommendation=extraction.next_visit_recommendation,
+        summary=extraction.summary,
+    )
+
+
 @router.post("/transcribe", response_model=VoiceMemoResponse)
-async def transcribe_voice_memo(file: UploadFile = File(...)):
+async def transcribe_voice_memo(file: UploadFile = File(...), shop_id: UUID | None = None):
     """
     Receive a voice memo audio file, transcribe it with Whisper,
     and extract structured treatment info with GPT-4o Structured Output.
     """
     # Save uploaded file temporarily
-    suffix = os.path.splitext(file.filename or "audio.webm")[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    tmp_path = await _save_temp(file)
 
     try:
-        extraction = await transcribe_and_extract(tmp_path)
-        return VoiceMemoResponse(
-            customer_name=extraction.customer_name,
-            service_type=extraction.service_type,
-            products_used=[
-                {"brand": p.brand, "code": p.code, "area": p.area}
-                for p in (extraction.products_used or [])
-            ],
-            area=extraction.area,
-            duration_minutes=extraction.duration_minutes,
-            satisfaction=extraction.satisfaction,
-            next_visit_recommendation=extraction.next_visit_recommendation,
-            summary=extraction.summary,
-        )
+        extraction = await transcribe_and_extract(tmp_path, shop_id=shop_id)
+        return _to_response(extraction)
     finally:
         os.unlink(tmp_path)
+
+
+@router.post("/transcribe/stream")
+async def transcribe_voice_memo_stream(
+    file: UploadFile = File(...),
+    shop_id: UUID | None = None,
+    stream_format: str = Query(default="sse", alias="format", pattern="^(sse|ndjson)$"),
+):
+    """
+    Streaming variant of /transcribe, so the UI can fill in fields as they arrive.
+
+    Events, in order:
+    - transcript: {"text": ...} as soon as transcription finishes
+    - partial: {field: value, ...} whenever extracted fields are complete
+    - result: the final, validated VoiceMemoResponse
+    - error: {"detail": ...} if a stage fails (the stream then ends)
+
+    format=sse (default) emits Server-Sent Events; format=ndjson emits one
+    {"event": ..., "data": ...} object per line.
+    """
+    tmp_path = await _save_temp(file)
+
+    def encode(event: str, data: dict) -> str:
+        if stream_format == "ndjson":
+            return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        try:
+            transcript = await transcribe_audio(tmp_path, shop_id=shop_id)
+            yield encode("transcript", {"text": transcript})
+            async for kind, payload in stream_treatment_info(transcript, shop_id=shop_id):
+                if kind == "partial":
+                    yield encode("partial", payload)
+                else:
+                    yield encode("result", _to_response(payload).model_dump(mode="json"))
+        except Exception as exc:  # headers are already sent - report in-band
+            yield encode("error", {"detail": str(exc)})
+        finally:
+            os.unlink(tmp_path)
+
+    media_type = "application/x-ndjson" if stream_format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -15,10 +15,42 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str | None = None  # override to point at a local stub server
 
     # AKOOL
     AKOOL_API_KEY: str = ""
     AKOOL_CLIENT_ID: str = ""
+    AKOOL_BASE_URL: str = "https://openapi.akool.com/api/open/v3"
+
+    # External AI call limits (per process; requests/second and burst size)
+    OPENAI_RATE_LIMIT: float = 8.0
+    OPENAI_BURST: int = 16
+    OPENAI_SHOP_RATE_LIMIT: float = 1.0
+    OPENAI_SHOP_BURST: int = 4
+    AKOOL_RATE_LIMIT: float = 2.0
+    AKOOL_BURST: int = 4
+    AKOOL_SHOP_RATE_LIMIT: float = 0.5
+    AKOOL_SHOP_BURST: int = 2
+    AI_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+
+    # External AI call resilience
+    REQUEST_BUDGET_SECONDS: float = 90.0  # upper bound for all upstream calls in one request
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    AKOOL_TIMEOUT_SECONDS: float = 15.0
+    AI_MAX_RETRIES: int = 2
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Voice memo audio preprocessing (needs ffmpeg; skipped if unavailable)
+    AUDIO_PREPROCESS_ENABLED: bool = True
+    TRANSCRIBE_CHUNK_SECONDS: float = 120.0  # longer memos are split and transcribed in parallel
+    TRANSCRIBE_CHUNK_OVERLAP_SECONDS: float = 1.5
+    TRANSCRIBE_CHUNK_CONCURRENCY: int = 4
+
+    # Face swap batches
+    FACE_SWAP_BATCH_CONCURRENCY: int = 4
+    FACE_SWAP_BATCH_MAX_ITEMS: int = 100
+    FACE_SWAP_CLAIM_TIMEOUT_SECONDS: float = 600.0  # an in_flight item older than this was abandoned
 
     # AWS S3
     AWS_ACCESS_KEY_ID: str = ""
@@ -26,9 +58,33 @@ class Settings(BaseSettings):
     AWS_S3_BUCKET: str = "noteastyle-photos"
     AWS_REGION: str = "ap-northeast-2"
 
+    # Hot/cold photo tiering (app.services.photo_archive)
+    ARCHIVE_AFTER_MONTHS: int = 12
+    COLD_STORAGE_CLASS: str = "GLACIER_IR"  # instant retrieval - restores are a plain GET
+    COLD_STORAGE_PREFIX: str = "cold/"
+
+    # Tablet delta sync (GET /api/shops/{shop_id}/sync/changes)
+    SYNC_PAGE_SIZE: int = 200
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30  # older sync tokens must do a full resync
+    SYNC_HORIZON_MAX_LAG_SECONDS: int = 300  # a transaction open longer than this no longer holds the feed back
+
+    # In-process entity cache (app.services.entity_cache), invalidated via LISTEN/NOTIFY
+    ENTITY_CACHE_ENABLED: bool = True
+    ENTITY_CACHE_MAX_ENTRIES: int = 10_000
+    ENTITY_CACHE_TTL_SECONDS: float = 300.0  # upper bound on staleness if a notification is lost
+    ENTITY_CACHE_LISTEN_URL: str = ""  # direct/session-mode connection for LISTEN; empty = DATABASE_URL
+    ENTITY_CACHE_KEEPALIVE_SECONDS: float = 30.0  # SELECT 1 on the LISTEN connection when idle this long
+
     # File upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    PHOTO_BATCH_MAX_FILES: int = 30
+    PHOTO_BATCH_CONCURRENCY: int = 4  # files written + fingerprinted at once
+
+    # Media serving
+    MEDIA_CACHE_MAX_AGE: int = 31536000  # 1 year - URLs are versioned
+    MEDIA_VARIANT_FORMATS: str = "avif,webp"
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = ""  # e.g. "/_uploads/" behind nginx (internal location)
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
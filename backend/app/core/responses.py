@@ -0,0 +1,63 @@
+"""Fast JSON responses for large list payloads.
+
+`FastJSONResponse` encodes with orjson (native UUID/datetime support, no
+second Pydantic validation pass) in the same format as Pydantic's JSON mode
+(UTC datetimes end in "Z"), and compresses bodies above
+`COMPRESS_MIN_BYTES` with brotli (if installed) or gzip, depending on the
+client's Accept-Encoding. Endpoints still declare `response_model` so the
+OpenAPI schema is unchanged; FastAPI skips validation when a Response
+instance is returned.
+"""
+
+import gzip
+from uuid import UUID
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+
+# Match model_dump(mode="json"): "2026-10-19T12:00:00Z", not "+00:00"
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(value):
+    # orjson only encodes exact uuid.UUID; asyncpg returns its own subclass
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def _accepted_encodings(request: Request | None) -> set[str]:
+    if request is None:
+        return set()
+    header = request.headers.get("accept-encoding", "")
+    return {part.split(";")[0].strip().lower() for part in header.split(",")}
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content, request: Request | None = None, status_code: int = 200, headers: dict | None = None):
+        body = dumps(content)
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept-Encoding"
+        if len(body) >= COMPRESS_MIN_BYTES:
+            accepted = _accepted_encodings(request)
+            if brotli is not None and "br" in accepted:
+                body = brotli.compress(body, quality=4)
+                headers["Content-Encoding"] = "br"
+            elif "gzip" in accepted:
+                body = gzip.compress(body, compresslevel=5)
+                headers["Content-Encoding"] = "gzip"
+        super().__init__(content=body, status_code=status_code, headers=headers)
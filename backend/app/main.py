@@ -1,14 +1,30 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
-from app.api import shops, customers, treatments, voice_memo, portfolio, face_swap
+from app.api import shops, customers, treatments, voice_memo, portfolio, face_swap, media, metrics, sync
+from app.services import entity_cache
+from app.services.rate_limit import RateLimitedError
+from app.services.resilience import CircuitOpenError, UpstreamError, request_budget
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.ENTITY_CACHE_ENABLED:
+        entity_cache.listener.start()
+    yield
+    await entity_cache.listener.stop()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="뷰티샵 시술 기록 및 포트폴리오 플랫폼",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -21,6 +37,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deadline for all upstream (OpenAI/AKOOL) calls made while serving a request
+@app.middleware("http")
+async def upstream_request_budget(request: Request, call_next):
+    with request_budget(settings.REQUEST_BUDGET_SECONDS):
+        return await call_next(request)
+
+
 # Static files for uploaded photos (development)
 app.mount("/uploads", StaticFiles(directory="uploads", check_dir=False), name="uploads")
 
@@ -31,6 +54,29 @@ app.include_router(treatments.router, prefix="/api")
 app.include_router(voice_memo.router, prefix="/api")
 app.include_router(portfolio.router, prefix="/api")
 app.include_router(face_swap.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
+app.include_router(media.router)
+
+
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(request: Request, exc: RateLimitedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)},
+    )
+
+
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError):
+    # Open circuit: shed load immediately; exhausted budget: gateway timeout
+    status_code = 503 if isinstance(exc, CircuitOpenError) else 504
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)},
+    )
 
 
 @app.get("/api/health")
@@ -1,7 +1,9 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, Text, Integer, Boolean, ForeignKey, DateTime, Float, JSON
+from sqlalchemy import (
+    String, Text, Integer, BigInteger, Boolean, ForeignKey, ForeignKeyConstraint, DateTime, Float, JSON,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -60,6 +62,7 @@ class Customer(Base):
 
 
 class Treatment(Base):
+    # Range-partitioned by created_at (migration 013); primary key is (id, created_at)
     __tablename__ = "treatments"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -80,11 +83,12 @@ class Treatment(Base):
     customer_notes: Mapped[str | None] = mapped_column(Text)
 
     # AI-generated from voice memo
-    voice_memo_url: Mapped[str | None] = mapped_column(String(500))
+    voice_memo_text: Mapped[str | None] = mapped_column(Text)
     ai_summary: Mapped[str | None] = mapped_column(Text)
 
     next_visit_recommendation: Mapped[str | None] = mapped_column(String(100))
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     customer: Mapped["Customer"] = relationship(back_populates="treatments")
     designer: Mapped["Designer"] = relationship(back_populates="treatments")
@@ -92,15 +96,27 @@ class Treatment(Base):
 
 
 class TreatmentPhoto(Base):
+    # Partitioned by the owning treatment's created_at (migration 013); the
+    # foreign key carries it, so loading a treatment's photos prunes to one partition
     __tablename__ = "treatment_photos"
+    __table_args__ = (
+        ForeignKeyConstraint(["treatment_id", "treatment_created_at"], ["treatments.id", "treatments.created_at"]),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    treatment_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("treatments.id"))
+    treatment_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    treatment_created_at: Mapped[datetime] = mapped_column(DateTime)
     photo_url: Mapped[str] = mapped_column(String(500))
     photo_type: Mapped[str] = mapped_column(String(20))  # before, during, after
     face_swapped_url: Mapped[str | None] = mapped_column(String(500))
+    thumbnail_url: Mapped[str | None] = mapped_column(String(500))
     is_portfolio: Mapped[bool] = mapped_column(Boolean, default=False)
     caption: Mapped[str | None] = mapped_column(String(300))
+    phash: Mapped[int | None] = mapped_column(BigInteger)  # 64-bit perceptual hash (signed)
+    sharpness: Mapped[float | None] = mapped_column(Float)
+    storage_tier: Mapped[str] = mapped_column(String(10), default="hot")  # hot, cold
+    cold_key: Mapped[str | None] = mapped_column(String(500))  # object key of the archived original
+    archived_at: Mapped[datetime | None] = mapped_column(DateTime)
     taken_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -118,5 +134,59 @@ class Portfolio(Base):
     tags: Mapped[dict | None] = mapped_column(JSON)  # ["염색", "로레알", "뿌리"]
     is_published: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     photo: Mapped["TreatmentPhoto"] = relationship()
+
+
+class RevisitDue(Base):
+    """Precomputed revisit due date per customer (see app.services.revisit_due)."""
+
+    __tablename__ = "revisit_due"
+
+    customer_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("customers.id"), primary_key=True)
+    shop_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("shops.id"))
+    treatment_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("treatments.id"))
+    last_visit: Mapped[datetime] = mapped_column(DateTime)
+    interval_days: Mapped[int] = mapped_column(Integer)
+    due_at: Mapped[datetime] = mapped_column(DateTime)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    customer: Mapped["Customer"] = relationship()
+
+
+class FaceSwapBatch(Base):
+    __tablename__ = "face_swap_batches"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("shops.id"))
+    source_photo_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("treatment_photos.id"))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    items: Mapped[list["FaceSwapBatchItem"]] = relationship(back_populates="batch", cascade="all, delete-orphan")
+
+
+class FaceSwapBatchItem(Base):
+    __tablename__ = "face_swap_batch_items"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    batch_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("face_swap_batches.id"))
+    target_photo_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("treatment_photos.id"))
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, in_flight, submitted, failed
+    job_id: Mapped[str | None] = mapped_column(String(100))
+    error: Mapped[str | None] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    batch: Mapped["FaceSwapBatch"] = relationship(back_populates="items")
+
+
+class SyncTombstone(Base):
+    """Deleted customer/treatment/portfolio row, written by a DB trigger (migration 014)."""
+
+    __tablename__ = "sync_tombstones"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    entity: Mapped[str] = mapped_column(String(20))  # customers, treatments, portfolios
+    entity_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,7 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Annotated
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, computed_field
+
+from app.services.media import media_url_for
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# Timestamp query parameter. Columns are naive UTC DateTime; an aware value
+# (e.g. "...Z", as the list endpoints emit) can't be bound against them.
+UTCDateTime = Annotated[datetime, AfterValidator(_naive_utc)]
 
 
 # --- Shop ---
@@ -78,6 +92,18 @@ class CustomerListResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class RevisitDueResponse(BaseModel):
+    customer_id: UUID
+    name: str
+    phone: str | None
+    last_visit: datetime
+    interval_days: int
+    due_at: datetime
+    overdue_days: int  # negative = days until due
+
+    model_config = {"from_attributes": True}
+
+
 # --- Treatment ---
 class ProductUsed(BaseModel):
     brand: str
@@ -120,6 +146,21 @@ class TreatmentResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class TreatmentTimelineItem(BaseModel):
+    """Compact treatment summary for the customer timeline (photos loaded lazily)."""
+
+    id: UUID
+    service_type: str
+    service_detail: str | None
+    satisfaction: str | None
+    next_visit_recommendation: str | None
+    created_at: datetime
+    photo_count: int
+    cover_photo_url: str | None
+
+    model_config = {"from_attributes": True}
+
+
 # --- Photo ---
 class PhotoResponse(BaseModel):
     id: UUID
@@ -130,9 +171,47 @@ class PhotoResponse(BaseModel):
     is_portfolio: bool
     caption: str | None
     taken_at: datetime
+    thumbnail_url: str | None = None
+    storage_tier: str = "hot"  # cold: original archived, restore it to view full size
 
     model_config = {"from_attributes": True}
 
+    @computed_field
+    @property
+    def media_url(self) -> str | None:
+        """Immutable, versioned URL for locally stored photos (cache forever)."""
+        if self.storage_tier == "cold":
+            return media_url_for(self.thumbnail_url)
+        return media_url_for(self.photo_url)
+
+
+class PhotoBatchItemResult(BaseModel):
+    """Outcome for one file of a batch upload, in request order."""
+
+    index: int
+    filename: str | None
+    status: str  # created, failed
+    photo: PhotoResponse | None = None
+    error: str | None = None
+
+
+class PhotoBatchUploadResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[PhotoBatchItemResult]
+
+
+class DuplicateGroup(BaseModel):
+    """Near-duplicate photos; best_photo_id is the sharpest shot of the group."""
+
+    best_photo_id: UUID
+    photo_ids: list[UUID]
+
+
+class SimilarPhoto(BaseModel):
+    photo_id: UUID
+    distance: int
+
 
 # --- Portfolio ---
 class PortfolioCreate(BaseModel):
@@ -156,6 +235,48 @@ class PortfolioResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+# --- Face Swap Batch ---
+class FaceSwapBatchCreate(BaseModel):
+    source_photo_id: UUID
+    target_photo_ids: list[UUID]
+
+
+class FaceSwapBatchItemResponse(BaseModel):
+    target_photo_id: UUID
+    status: str
+    job_id: str | None
+    error: str | None
+
+    model_config = {"from_attributes": True}
+
+
+class FaceSwapBatchResponse(BaseModel):
+    id: UUID
+    shop_id: UUID
+    source_photo_id: UUID
+    created_at: datetime
+    items: list[FaceSwapBatchItemResponse]
+
+    model_config = {"from_attributes": True}
+
+
+# --- Delta Sync ---
+class SyncTombstoneResponse(BaseModel):
+    entity: str  # customers, treatments, portfolios
+    id: UUID
+
+
+class SyncChangesResponse(BaseModel):
+    """Rows created/updated since the sync token, plus deletions. Pass next_token back as `since`."""
+
+    customers: list[CustomerResponse]
+    treatments: list[TreatmentResponse]
+    portfolios: list[PortfolioResponse]
+    deleted: list[SyncTombstoneResponse]
+    next_token: str
+    has_more: bool
+
+
 # --- Voice Memo ---
 class VoiceMemoResponse(BaseModel):
     customer_name: str | None = None
@@ -171,6 +292,7 @@ class VoiceMemoResponse(BaseModel):
 # --- Quick Record (Big Button) ---
 class QuickRecordCreate(BaseModel):
     customer_id: UUID
+    designer_id: UUID | None = None
     service_type: str
     products: list[ProductUsed] | None = None
     photo_ids: list[UUID] | None = None
@@ -0,0 +1,79 @@
+"""Plain-dict serializers for hot list endpoints.
+
+These mirror the corresponding response schemas field for field, but build
+dicts straight from ORM rows so FastJSONResponse can encode them without a
+Pydantic validation pass. Keep them in sync with schemas.py.
+"""
+
+from app.models.models import Customer, Portfolio, Treatment, TreatmentPhoto
+from app.services.media import media_url_for
+
+
+def customer_to_dict(customer: Customer) -> dict:
+    """CustomerResponse."""
+    return {
+        "id": customer.id,
+        "shop_id": customer.shop_id,
+        "name": customer.name,
+        "phone": customer.phone,
+        "gender": customer.gender,
+        "birth_date": customer.birth_date,
+        "notes": customer.notes,
+        "visit_count": customer.visit_count,
+        "last_visit": customer.last_visit,
+        "created_at": customer.created_at,
+    }
+
+
+def photo_to_dict(photo: TreatmentPhoto) -> dict:
+    """PhotoResponse."""
+    return {
+        "id": photo.id,
+        "treatment_id": photo.treatment_id,
+        "photo_url": photo.photo_url,
+        "photo_type": photo.photo_type,
+        "face_swapped_url": photo.face_swapped_url,
+        "is_portfolio": photo.is_portfolio,
+        "caption": photo.caption,
+        "taken_at": photo.taken_at,
+        "thumbnail_url": photo.thumbnail_url,
+        "storage_tier": photo.storage_tier,
+        "media_url": media_url_for(photo.thumbnail_url if photo.storage_tier == "cold" else photo.photo_url),
+    }
+
+
+def treatment_to_dict(treatment: Treatment) -> dict:
+    """TreatmentResponse."""
+    return {
+        "id": treatment.id,
+        "customer_id": treatment.customer_id,
+        "designer_id": treatment.designer_id,
+        "shop_id": treatment.shop_id,
+        "service_type": treatment.service_type,
+        "service_detail": treatment.service_detail,
+        "products_used": treatment.products_used,
+        "area": treatment.area,
+        "duration_minutes": treatment.duration_minutes,
+        "price": treatment.price,
+        "satisfaction": treatment.satisfaction,
+        "customer_notes": treatment.customer_notes,
+        "ai_summary": treatment.ai_summary,
+        "next_visit_recommendation": treatment.next_visit_recommendation,
+        "created_at": treatment.created_at,
+        "photos": [photo_to_dict(p) for p in treatment.photos],
+    }
+
+
+def portfolio_to_dict(item: Portfolio) -> dict:
+    """PortfolioResponse."""
+    return {
+        "id": item.id,
+        "shop_id": item.shop_id,
+        "photo_id": item.photo_id,
+        "title": item.title,
+        "description": item.description,
+        "tags": item.tags,
+        "is_published": item.is_published,
+        "created_at": item.created_at,
+        "photo": photo_to_dict(item.photo),
+    }
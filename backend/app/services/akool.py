@@ -1,16 +1,58 @@
 """AKOOL Face Swap API integration service."""
 
+import time
+from uuid import UUID
+
 import httpx
 
 from app.core.config import settings
+from app.services.rate_limit import FairLimiter, Priority
+from app.services.resilience import Upstream
+
+AKOOL_BASE_URL = settings.AKOOL_BASE_URL
+
+limiter = FairLimiter(
+    "akool",
+    global_rate=settings.AKOOL_RATE_LIMIT,
+    global_burst=settings.AKOOL_BURST,
+    shop_rate=settings.AKOOL_SHOP_RATE_LIMIT,
+    shop_burst=settings.AKOOL_SHOP_BURST,
+    max_wait=settings.AI_LIMIT_MAX_WAIT_SECONDS,
+)
+
+upstream = Upstream(
+    "akool",
+    timeout=settings.AKOOL_TIMEOUT_SECONDS,
+    max_retries=settings.AI_MAX_RETRIES,
+    failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.AI_BREAKER_RESET_SECONDS,
+)
 
-AKOOL_BASE_URL = "https://openapi.akool.com/api/open/v3"
+TOKEN_TTL_SECONDS = 30 * 60
+
+_client: httpx.AsyncClient | None = None
+_token: tuple[str, float] | None = None  # (token, expires_at)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client so calls (and batch fan-out) reuse pooled keep-alive connections."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=settings.AKOOL_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _client
 
 
 async def get_akool_token() -> str:
-    """Get authentication token from AKOOL API."""
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
+    """Get authentication token from AKOOL API (cached for TOKEN_TTL_SECONDS)."""
+    global _token
+    if _token is not None and _token[1] > time.monotonic():
+        return _token[0]
+
+    async def _get_token():
+        resp = await get_client().post(
             f"{AKOOL_BASE_URL}/getToken",
             json={
                 "clientId": settings.AKOOL_CLIENT_ID,
@@ -18,11 +60,19 @@ async def get_akool_token() -> str:
             },
         )
         resp.raise_for_status()
-        data = resp.json()
-        return data["token"]
+        return resp.json()
 
+    data = await upstream.call(_get_token)
+    _token = (data["token"], time.monotonic() + TOKEN_TTL_SECONDS)
+    return data["token"]
 
-async def face_swap(source_image_url: str, target_image_url: str) -> dict:
+
+async def face_swap(
+    source_image_url: str,
+    target_image_url: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> dict:
     """
     Perform face swap using AKOOL API.
 
@@ -35,8 +85,8 @@ async def face_swap(source_image_url: str, target_image_url: str) -> dict:
     """
     token = await get_akool_token()
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
+    async def _submit():
+        resp = await get_client().post(
             f"{AKOOL_BASE_URL}/faceswap/highquality/specifyimage",
             headers={"Authorization": f"Bearer {token}"},
             json={
@@ -59,16 +109,25 @@ async def face_swap(source_image_url: str, target_image_url: str) -> dict:
         resp.raise_for_status()
         return resp.json()
 
+    # Creates a job upstream - never retried, a duplicate would be billed twice
+    return await upstream.call(_submit, idempotent=False, acquire=lambda: limiter.acquire(shop_id, priority))
+
 
-async def get_face_swap_status(job_id: str) -> dict:
+async def get_face_swap_status(
+    job_id: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> dict:
     """Check the status of a face swap job."""
     token = await get_akool_token()
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
+    async def _get_status():
+        resp = await get_client().get(
             f"{AKOOL_BASE_URL}/faceswap/highquality/infobymodelid",
             headers={"Authorization": f"Bearer {token}"},
             params={"_id": job_id},
         )
         resp.raise_for_status()
         return resp.json()
+
+    return await upstream.call(_get_status, acquire=lambda: limiter.acquire(shop_id, priority))
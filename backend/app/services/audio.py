@@ -0,0 +1,272 @@
+"""Voice memo audio preprocessing with ffmpeg.
+
+Phone recordings are usually stereo 44.1/48 kHz WebM/M4A with dead air at
+both ends. Before transcription they are downmixed to mono, resampled to
+16 kHz, stripped of leading/trailing silence (and long pauses) with ffmpeg's
+energy-based voice activity filter, and re-encoded as low-bitrate Opus -
+plenty for speech recognition and typically a fraction of the upload size.
+Long memos are then split at pauses so chunks can be transcribed in parallel.
+
+ffmpeg runs in a process pool so CPU-heavy encodes never block the event loop.
+If ffmpeg is missing or fails, the original file is used unchanged.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+OPUS_BITRATE = "24k"
+SILENCE_THRESHOLD = "-45dB"
+
+# Trim leading silence, drop trailing silence and collapse pauses > 1s, keeping 0.5s of padding
+_VAD_FILTER = (
+    f"silenceremove=start_periods=1:start_duration=0.1:start_threshold={SILENCE_THRESHOLD}"
+    f":stop_periods=-1:stop_duration=1.0:stop_threshold={SILENCE_THRESHOLD}:stop_silence=0.5"
+)
+
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+    return _pool
+
+
+@dataclass
+class PreprocessResult:
+    path: str
+    original_bytes: int
+    processed_bytes: int
+    original_seconds: float | None
+    processed_seconds: float | None
+    processed: bool  # False when the original file is passed through
+
+    @property
+    def size_reduction(self) -> float:
+        if not self.original_bytes:
+            return 0.0
+        return 1 - self.processed_bytes / self.original_bytes
+
+
+def probe_duration(path: str) -> float | None:
+    """Duration in seconds via ffprobe, or None if unknown."""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True,
+            text=True,
+            timeout=30,
+            check=True,
+        ).stdout.strip()
+        return float(out)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def preprocess_file(path: str) -> PreprocessResult:
+    """Blocking: mono/16 kHz/VAD-trimmed Opus copy of `path` (runs in the process pool)."""
+    original_bytes = os.path.getsize(path)
+    passthrough = PreprocessResult(path, original_bytes, original_bytes, None, None, False)
+    if shutil.which("ffmpeg") is None:
+        return passthrough
+
+    fd, out_path = tempfile.mkstemp(suffix=".ogg")
+    os.close(fd)
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", path,
+                "-vn", "-af", _VAD_FILTER,
+                "-ac", "1", "-ar", str(SAMPLE_RATE),
+                "-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip",
+                out_path,
+            ],
+            capture_output=True,
+            timeout=300,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning("audio preprocessing failed for %s: %s", path, exc)
+        os.unlink(out_path)
+        return passthrough
+
+    processed_bytes = os.path.getsize(out_path)
+    if processed_bytes == 0 or processed_bytes >= original_bytes:
+        # All silence, or already compact - not worth swapping in
+        os.unlink(out_path)
+        return passthrough
+
+    return PreprocessResult(
+        path=out_path,
+        original_bytes=original_bytes,
+        processed_bytes=processed_bytes,
+        original_seconds=probe_duration(path),
+        processed_seconds=probe_duration(out_path),
+        processed=True,
+    )
+
+
+async def preprocess_audio(path: str) -> PreprocessResult:
+    """Run `preprocess_file` in the process pool and log the reduction."""
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_get_pool(), preprocess_file, path)
+    if result.processed:
+        stats.record(result)
+        logger.info(
+            "voice memo preprocessed: %d -> %d bytes (%.0f%% smaller), %.1fs -> %.1fs",
+            result.original_bytes,
+            result.processed_bytes,
+            result.size_reduction * 100,
+            result.original_seconds or 0.0,
+            result.processed_seconds or 0.0,
+        )
+    return result
+
+
+@dataclass
+class AudioChunk:
+    path: str
+    start: float
+    end: float
+
+
+def detect_silence_midpoints(path: str, min_silence: float = 0.4) -> list[float]:
+    """Midpoints (seconds) of pauses longer than `min_silence`, via ffmpeg silencedetect."""
+    try:
+        proc = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+                "-af", f"silencedetect=noise={SILENCE_THRESHOLD}:d={min_silence}",
+                "-f", "null", "-",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=300,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return []
+    midpoints = []
+    start = None
+    for kind, value in _SILENCE_RE.findall(proc.stderr):
+        if kind == "start":
+            start = float(value)
+        elif start is not None:
+            midpoints.append((start + float(value)) / 2)
+            start = None
+    return midpoints
+
+
+def plan_cuts(duration: float, silences: list[float], max_chunk: float) -> list[float]:
+    """
+    Cut points so no chunk exceeds `max_chunk` seconds, preferring the latest
+    pause in the second half of each window; falls back to a hard cut.
+    """
+    cuts = []
+    pos = 0.0
+    while duration - pos > max_chunk:
+        limit = pos + max_chunk
+        candidates = [t for t in silences if pos + max_chunk / 2 < t <= limit]
+        pos = candidates[-1] if candidates else limit
+        cuts.append(pos)
+    return cuts
+
+
+def split_file(path: str, max_chunk: float, overlap: float) -> list[AudioChunk]:
+    """
+    Blocking: split `path` at pauses into chunks of at most ~`max_chunk` seconds.
+
+    Each chunk after the first starts `overlap` seconds before its cut point,
+    so a word straddling a hard cut is heard whole by at least one chunk; the
+    duplicated words are removed when transcripts are stitched.
+    Returns a single chunk pointing at `path` when no split is needed.
+
+    Ogg input (what preprocessing produces) is cut with a stream copy, which
+    costs next to nothing; anything else is re-encoded to Opus per chunk.
+    """
+    duration = probe_duration(path)
+    if duration is None or duration <= max_chunk or shutil.which("ffmpeg") is None:
+        return [AudioChunk(path, 0.0, duration or 0.0)]
+
+    if path.endswith(".ogg"):
+        codec = ["-c:a", "copy"]
+    else:
+        codec = [
+            "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip",
+        ]
+    cuts = plan_cuts(duration, detect_silence_midpoints(path), max_chunk)
+    bounds = zip([0.0, *cuts], [*cuts, duration])
+    chunks: list[AudioChunk] = []
+    try:
+        for i, (start, end) in enumerate(bounds):
+            start = max(0.0, start - overlap) if i else 0.0
+            fd, chunk_path = tempfile.mkstemp(suffix=".ogg")
+            os.close(fd)
+            chunks.append(AudioChunk(chunk_path, start, end))
+            subprocess.run(
+                [
+                    "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                    "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path,
+                    "-vn", *codec, chunk_path,
+                ],
+                capture_output=True,
+                timeout=300,
+                check=True,
+            )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning("audio split failed for %s: %s", path, exc)
+        for chunk in chunks:
+            os.unlink(chunk.path)
+        return [AudioChunk(path, 0.0, duration)]
+    return chunks
+
+
+async def split_audio(path: str, max_chunk: float, overlap: float) -> list[AudioChunk]:
+    """Run `split_file` in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), split_file, path, max_chunk, overlap)
+
+
+class PreprocessStats:
+    """Running totals of what preprocessing saved (this worker only)."""
+
+    def __init__(self):
+        self.memos = 0
+        self.original_bytes = 0
+        self.processed_bytes = 0
+        self.original_seconds = 0.0
+        self.processed_seconds = 0.0
+
+    def record(self, result: PreprocessResult) -> None:
+        self.memos += 1
+        self.original_bytes += result.original_bytes
+        self.processed_bytes += result.processed_bytes
+        self.original_seconds += result.original_seconds or 0.0
+        self.processed_seconds += result.processed_seconds or 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "memos": self.memos,
+            "original_bytes": self.original_bytes,
+            "processed_bytes": self.processed_bytes,
+            "original_seconds": round(self.original_seconds, 1),
+            "processed_seconds": round(self.processed_seconds, 1),
+        }
+
+
+stats = PreprocessStats()
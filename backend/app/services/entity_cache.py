@@ -0,0 +1,314 @@
+"""Shop-scoped in-process cache for hot single-row lookups.
+
+Shop, Designer, Customer, Treatment and TreatmentPhoto rows are read by id on
+almost every request (verify the customer, re-check the treatment, fetch a
+photo's URL). This keeps read-only snapshots of them per worker, bounded by
+ENTITY_CACHE_MAX_ENTRIES (LRU) and ENTITY_CACHE_TTL_SECONDS.
+
+Every entry remembers the shop that owns the row, and lookups pass the
+caller's shop, so a cached row is never served to another shop.
+
+Invalidation across uvicorn workers (and writes that bypass this process:
+batch jobs such as photo_archive, or SQL run against the database) goes
+through Postgres LISTEN/NOTIFY: triggers from migration 015 send
+`<table>:<id>` on the `entity_cache` channel when a row is updated (beyond
+its updated_at) or deleted, delivered at commit. Each worker keeps one
+listening connection; while it is down the cache is bypassed and it is
+cleared on reconnect, since notifications may have been missed. An idle
+connection is checked with SELECT 1 every ENTITY_CACHE_KEEPALIVE_SECONDS, so
+a silently dropped link (NAT, failover) disables the cache instead of
+leaving it stale. Write endpoints also invalidate locally right after
+committing, so the writing worker reads its own writes without waiting for
+the notification.
+
+LISTEN needs a real server session: through a transaction-mode pooler
+(pgbouncer/Supavisor in transaction mode, Supabase port 6543) the listening
+connection is handed back after each statement and notifications never
+arrive. Set ENTITY_CACHE_LISTEN_URL to a direct or session-mode URL then.
+
+Photo notifications also drop the cached near-duplicate index holding that
+photo (image_hash.shop_index).
+
+Snapshots are shared between requests - treat them as read-only.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import Customer, Designer, Shop, Treatment, TreatmentPhoto
+from app.services.image_hash import shop_index
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "entity_cache"
+
+# Kinds are table names, matching the NOTIFY payload
+SHOP = Shop.__tablename__
+DESIGNER = Designer.__tablename__
+CUSTOMER = Customer.__tablename__
+TREATMENT = Treatment.__tablename__
+PHOTO = TreatmentPhoto.__tablename__
+
+Loader = Callable[[], Awaitable[tuple[SimpleNamespace, UUID] | None]]
+
+
+class EntityCache:
+    """TTL + LRU map of (kind, id) -> (expires_at, owning shop id, snapshot)."""
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = False  # switched on by the listener once LISTEN is active
+        self._entries: OrderedDict[tuple[str, UUID], tuple[float, UUID, SimpleNamespace]] = OrderedDict()
+        # Bumped on every invalidation; a fill that raced with one is dropped
+        self.generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._dropped_fills = 0
+
+    def get(self, kind: str, entity_id: UUID) -> tuple[UUID, SimpleNamespace] | None:
+        if not self.enabled:
+            return None
+        key = (kind, entity_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        if time.monotonic() > entry[0]:
+            del self._entries[key]
+            self._expirations += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[1], entry[2]
+
+    def put(self, kind: str, entity_id: UUID, shop_id: UUID, value: SimpleNamespace, generation: int) -> None:
+        if not self.enabled:
+            return
+        if generation != self.generation:
+            # Invalidated while we were reading from the DB - the row may be stale
+            self._dropped_fills += 1
+            return
+        self._entries[(kind, entity_id)] = (time.monotonic() + self.ttl, shop_id, value)
+        self._entries.move_to_end((kind, entity_id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, kind: str, entity_id: UUID) -> None:
+        self.generation += 1
+        if self._entries.pop((kind, entity_id), None) is not None:
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+            "db_round_trips_saved": self._hits,  # each hit is one SELECT not sent
+            "invalidations": self._invalidations,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "dropped_fills": self._dropped_fills,
+        }
+
+
+cache = EntityCache(settings.ENTITY_CACHE_MAX_ENTRIES, settings.ENTITY_CACHE_TTL_SECONDS)
+
+
+def _naive_utc(value):
+    # The models map timestamptz as naive UTC DateTime; asyncpg returns aware
+    # values, which can't be bound back into those columns
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _snapshot(row) -> SimpleNamespace:
+    return SimpleNamespace(**{key: _naive_utc(value) for key, value in row._mapping.items()})
+
+
+async def _lookup(kind: str, entity_id: UUID, shop_id: UUID | None, load: Loader) -> SimpleNamespace | None:
+    cached = cache.get(kind, entity_id)
+    if cached is None:
+        generation = cache.generation
+        loaded = await load()
+        if loaded is None:
+            return None
+        value, owner = loaded
+        cache.put(kind, entity_id, owner, value, generation)
+        cached = owner, value
+    owner, value = cached
+    if shop_id is not None and owner != shop_id:
+        return None
+    return value
+
+
+def _row_loader(db: AsyncSession, model, entity_id: UUID) -> Loader:
+    async def load():
+        table = model.__table__
+        row = (await db.execute(select(table).where(table.c.id == entity_id))).one_or_none()
+        if row is None:
+            return None
+        value = _snapshot(row)
+        return value, value.id if model is Shop else value.shop_id
+
+    return load
+
+
+async def get_shop(db: AsyncSession, shop_id: UUID) -> SimpleNamespace | None:
+    return await _lookup(SHOP, shop_id, shop_id, _row_loader(db, Shop, shop_id))
+
+
+async def get_designer(db: AsyncSession, shop_id: UUID, designer_id: UUID) -> SimpleNamespace | None:
+    return await _lookup(DESIGNER, designer_id, shop_id, _row_loader(db, Designer, designer_id))
+
+
+async def get_customer(db: AsyncSession, shop_id: UUID, customer_id: UUID) -> SimpleNamespace | None:
+    return await _lookup(CUSTOMER, customer_id, shop_id, _row_loader(db, Customer, customer_id))
+
+
+async def get_treatment(db: AsyncSession, shop_id: UUID, treatment_id: UUID) -> SimpleNamespace | None:
+    return await _lookup(TREATMENT, treatment_id, shop_id, _row_loader(db, Treatment, treatment_id))
+
+
+async def get_photo(db: AsyncSession, photo_id: UUID, shop_id: UUID | None = None) -> SimpleNamespace | None:
+    """Photo row plus `shop_id` of its treatment. Without `shop_id`, any shop's photo is returned."""
+
+    async def load():
+        photos = TreatmentPhoto.__table__
+        row = (
+            await db.execute(
+                select(photos, Treatment.shop_id)
+                .join(
+                    Treatment,
+                    (photos.c.treatment_id == Treatment.id)
+                    & (photos.c.treatment_created_at == Treatment.created_at),
+                )
+                .where(photos.c.id == photo_id)
+            )
+        ).one_or_none()
+        if row is None:
+            return None
+        value = _snapshot(row)
+        return value, value.shop_id
+
+    return await _lookup(PHOTO, photo_id, shop_id, load)
+
+
+def invalidate(kind: str, entity_id: UUID) -> None:
+    """Drop a row this worker just wrote; other workers hear about it via NOTIFY."""
+    cache.invalidate(kind, entity_id)
+
+
+class InvalidationListener:
+    """Keeps a LISTEN connection open and applies remote invalidations to `cache`."""
+
+    def __init__(
+        self, dsn: str, retry_seconds: float = 5.0, keepalive_seconds: float = 30.0, keepalive_timeout: float = 5.0
+    ):
+        self.dsn = dsn
+        self.retry_seconds = retry_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.keepalive_timeout = keepalive_timeout
+        self._task: asyncio.Task | None = None
+        self._received = 0
+        self._reconnects = 0
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        self._received += 1
+        kind, _, entity_id = payload.partition(":")
+        try:
+            entity_id = UUID(entity_id)
+        except ValueError:
+            logger.warning("bad entity_cache notification: %r", payload)
+            return
+        cache.invalidate(kind, entity_id)
+        if kind == PHOTO:
+            shop_index.invalidate_photo(entity_id)
+
+    async def _ping(self, conn: asyncpg.Connection) -> None:
+        await asyncio.wait_for(conn.fetchval("SELECT 1"), self.keepalive_timeout)
+
+    async def _run(self) -> None:
+        while True:
+            lost = asyncio.Event()
+            try:
+                conn = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("entity cache listener can't connect: %s", exc)
+                await asyncio.sleep(self.retry_seconds)
+                continue
+            try:
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                # Anything cached before LISTEN started may have missed a notification
+                cache.clear()
+                shop_index.clear()
+                cache.enabled = True
+                while True:
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.keepalive_seconds)
+                        break
+                    except TimeoutError:
+                        pass
+                    # No termination event doesn't mean the link is alive
+                    await self._ping(conn)
+            except (OSError, TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+                logger.warning("entity cache listener failed: %s", exc)
+            finally:
+                cache.enabled = False
+                cache.clear()
+                if not conn.is_closed():
+                    conn.terminate()
+            self._reconnects += 1
+            logger.warning("entity cache listener disconnected, cache bypassed until reconnect")
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": cache.enabled,
+            "notifications": self._received,
+            "reconnects": self._reconnects,
+        }
+
+
+listener = InvalidationListener(
+    (settings.ENTITY_CACHE_LISTEN_URL or settings.DATABASE_URL).replace("+asyncpg", "", 1),
+    keepalive_seconds=settings.ENTITY_CACHE_KEEPALIVE_SECONDS,
+)
@@ -0,0 +1,117 @@
+"""Batch face swap - one model face applied to many target photos.
+
+Items are submitted to AKOOL concurrently (capped by
+FACE_SWAP_BATCH_CONCURRENCY) over the shared AKOOL client, at batch priority
+so interactive face swaps from other designers go first.
+
+Runners claim items in the database before submitting them: one
+UPDATE ... SET status = 'in_flight' over a FOR UPDATE SKIP LOCKED subquery
+(migration 012), so any number of runners - in other API workers, or started
+by a resume while the batch is still going - share the work and no item is
+sent twice. Each item's outcome is written as soon as it is known, so a
+crashed or partially failed batch can be resumed. An item a crashed runner
+left in_flight is claimable again after FACE_SWAP_CLAIM_TIMEOUT_SECONDS.
+"""
+
+import asyncio
+import contextvars
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import FaceSwapBatch, FaceSwapBatchItem, TreatmentPhoto
+from app.services.akool import face_swap
+from app.services.rate_limit import Priority
+
+# Strong references so running batches are not garbage collected mid-flight
+_running: set[asyncio.Task] = set()
+
+
+def claimable():
+    """Items a runner may claim: pending, or in_flight past the claim timeout."""
+    stale = func.now() - timedelta(seconds=settings.FACE_SWAP_CLAIM_TIMEOUT_SECONDS)
+    return or_(
+        FaceSwapBatchItem.status == "pending",
+        (FaceSwapBatchItem.status == "in_flight") & (FaceSwapBatchItem.updated_at < stale),
+    )
+
+
+async def claim_item(db: AsyncSession, batch_id: UUID) -> tuple[UUID, str] | None:
+    """Mark one claimable item in_flight and return (item id, target URL), or None when done."""
+    candidate = (
+        select(FaceSwapBatchItem.id)
+        .where(FaceSwapBatchItem.batch_id == batch_id, claimable())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    items, photos = FaceSwapBatchItem.__table__, TreatmentPhoto.__table__
+    result = await db.execute(
+        update(items)
+        .where(items.c.id == candidate, photos.c.id == items.c.target_photo_id)
+        .values(status="in_flight", error=None, updated_at=func.now())
+        .returning(items.c.id, photos.c.photo_url)
+    )
+    claimed = result.one_or_none()
+    await db.commit()
+    return tuple(claimed) if claimed else None
+
+
+async def run_batch(batch_id: UUID) -> None:
+    """Claim and submit the batch's items until none are left to claim."""
+    db_lock = asyncio.Lock()
+
+    async with async_session() as db:
+        result = await db.execute(
+            select(FaceSwapBatch.shop_id, TreatmentPhoto.photo_url)
+            .join(TreatmentPhoto, TreatmentPhoto.id == FaceSwapBatch.source_photo_id)
+            .where(FaceSwapBatch.id == batch_id)
+        )
+        batch = result.one_or_none()
+        if batch is None:
+            return
+        shop_id, source_url = batch
+
+        async def worker() -> None:
+            while True:
+                async with db_lock:
+                    claimed = await claim_item(db, batch_id)
+                if claimed is None:
+                    return
+                item_id, target_url = claimed
+                try:
+                    response = await face_swap(source_url, target_url, shop_id=shop_id, priority=Priority.BATCH)
+                    job_id = (response.get("data") or {}).get("_id") or response.get("_id")
+                    values = {"status": "submitted", "job_id": job_id, "error": None}
+                except Exception as exc:  # recorded per item; the batch keeps going
+                    values = {"status": "failed", "error": str(exc)[:1000]}
+                async with db_lock:
+                    await db.execute(
+                        update(FaceSwapBatchItem)
+                        .where(FaceSwapBatchItem.id == item_id)
+                        .values(**values, updated_at=func.now())
+                    )
+                    await db.commit()
+
+        # A DB error in one worker cancels the others before the session closes
+        async with asyncio.TaskGroup() as workers:
+            for _ in range(settings.FACE_SWAP_BATCH_CONCURRENCY):
+                workers.create_task(worker())
+
+
+def start_batch(batch_id: UUID) -> None:
+    """
+    Run a batch in the background.
+
+    Safe to call while another runner is working on the same batch - they
+    split the remaining items between them. The task runs in a fresh context
+    so the submitting request's deadline (see
+    app.services.resilience.request_budget) does not cut it short.
+    """
+    task = asyncio.get_running_loop().create_task(run_batch(batch_id), context=contextvars.Context())
+    _running.add(task)
+    task.add_done_callback(_running.discard)
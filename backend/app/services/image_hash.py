@@ -0,0 +1,246 @@
+"""Perceptual hashing and near-duplicate lookup for treatment photos.
+
+Photos get a 64-bit pHash (DCT of a 32x32 grayscale thumbnail) and a
+sharpness score when uploaded. Hashing runs in a process pool so Pillow work
+never blocks the event loop. Near-duplicates are photos whose hashes are
+within a small Hamming distance; lookups go through a multi-index hash
+(`HashIndex`), which only compares against photos sharing a nearly equal
+16-bit block with the query.
+
+Per-shop indexes are cached per worker (`shop_index`). A cached index is
+dropped when one of its photos is moved or deleted - by this worker directly,
+or by anyone via the entity cache's LISTEN/NOTIFY channel - and rebuilt on the
+next lookup; uploads are added in place.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+from uuid import UUID
+
+from PIL import Image, ImageFilter, ImageStat
+
+HASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 6  # out of 64 bits; bursts of the same shot are typically <= 4
+
+_HASH_SIZE = 8
+_IMG_SIZE = 32
+_BLOCKS = 4  # multi-index hashing: 4 x 16-bit blocks
+_BLOCK_BITS = HASH_BITS // _BLOCKS
+_BLOCK_MASK = (1 << _BLOCK_BITS) - 1
+_DCT_COS = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * _IMG_SIZE)) for x in range(_IMG_SIZE)]
+    for u in range(_HASH_SIZE)
+]
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+    return _pool
+
+
+def to_signed(value: int) -> int:
+    """Store unsigned 64-bit hashes in a Postgres BIGINT."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+def hamming(a: int, b: int) -> int:
+    return (to_unsigned(a) ^ to_unsigned(b)).bit_count()
+
+
+def _phash(img: Image.Image) -> int:
+    gray = img.convert("L").resize((_IMG_SIZE, _IMG_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    rows = [pixels[i * _IMG_SIZE:(i + 1) * _IMG_SIZE] for i in range(_IMG_SIZE)]
+    # Separable 2D DCT-II, keeping only the 8x8 low-frequency block
+    row_dct = [[sum(c * p for c, p in zip(_DCT_COS[u], row)) for u in range(_HASH_SIZE)] for row in rows]
+    coeffs = [
+        sum(_DCT_COS[v][y] * row_dct[y][u] for y in range(_IMG_SIZE))
+        for v in range(_HASH_SIZE)
+        for u in range(_HASH_SIZE)
+    ]
+    # Median without the DC term, which only encodes overall brightness
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]
+    value = 0
+    for coeff in coeffs:
+        value = (value << 1) | (coeff > median)
+    return value
+
+
+def _sharpness(img: Image.Image) -> float:
+    """Edge-response variance - higher means sharper (used to pick the best shot)."""
+    gray = img.convert("L")
+    gray.thumbnail((512, 512))
+    return float(ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES)).var[0])
+
+
+def fingerprint_file(path: str) -> tuple[int, float] | None:
+    """Return (signed pHash, sharpness) for an image file, or None if it can't be decoded."""
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (256, 256))  # JPEG: decode at reduced size
+            img.load()
+            return to_signed(_phash(img)), _sharpness(img)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Corrupt/truncated files, unsupported modes, or absurd pixel counts
+        return None
+
+
+async def fingerprint(path: str) -> tuple[int, float] | None:
+    """Compute the fingerprint in the worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), fingerprint_file, path)
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius: int) -> tuple[int, ...]:
+    """Every 16-bit mask with at most `radius` bits set."""
+    return tuple(
+        sum(1 << bit for bit in bits)
+        for k in range(radius + 1)
+        for bits in combinations(range(_BLOCK_BITS), k)
+    )
+
+
+class HashIndex:
+    """
+    Multi-index hashing over 64-bit hashes under Hamming distance.
+
+    Each hash is split into four 16-bit blocks, one dict per block. Two hashes
+    within distance r differ in at most r // 4 bits in at least one block
+    (pigeonhole), so a search only probes the keys within that radius of each
+    query block and verifies the few candidates it finds - instead of scanning
+    everything, or walking a BK-tree, which for 64-bit hashes visits most nodes
+    once r reaches the default distance (see benchmarks/near_duplicates.py).
+    Large radii, where probing would touch most of the index anyway, scan.
+    """
+
+    def __init__(self, items: list[tuple[int, UUID]] | None = None):
+        self._values: dict[UUID, int] = {}  # id -> unsigned hash
+        self._tables: list[dict[int, list[UUID]]] = [{} for _ in range(_BLOCKS)]
+        for value, item_id in items or ():
+            self.add(value, item_id)
+
+    @property
+    def size(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, item_id: UUID) -> bool:
+        return item_id in self._values
+
+    def add(self, value: int, item_id: UUID) -> None:
+        value = to_unsigned(value)
+        self._values[item_id] = value
+        for block, table in enumerate(self._tables):
+            table.setdefault((value >> (block * _BLOCK_BITS)) & _BLOCK_MASK, []).append(item_id)
+
+    def search(self, value: int, max_distance: int) -> list[tuple[UUID, int]]:
+        """All (id, distance) pairs within `max_distance` of `value`, closest first."""
+        value = to_unsigned(value)
+        masks = _flip_masks(min(max_distance // _BLOCKS, _BLOCK_BITS))
+        probes = len(masks) * _BLOCKS
+        # A probed candidate costs ~20x a scanned hash, and each probe finds
+        # size / 2**16 of them: past that, or on tiny indexes, just scan
+        if probes * 20 >= 1 << _BLOCK_BITS or len(self._values) <= probes:
+            pairs = self._values.items()
+        else:
+            candidates = set()
+            for block, table in enumerate(self._tables):
+                key = (value >> (block * _BLOCK_BITS)) & _BLOCK_MASK
+                for mask in masks:
+                    bucket = table.get(key ^ mask)
+                    if bucket:
+                        candidates.update(bucket)
+            pairs = ((item_id, self._values[item_id]) for item_id in candidates)
+        found = [
+            (item_id, distance)
+            for item_id, other in pairs
+            if (distance := (other ^ value).bit_count()) <= max_distance
+        ]
+        found.sort(key=lambda pair: pair[1])
+        return found
+
+
+def group_near_duplicates(
+    photos: list[tuple[UUID, int, float | None]], max_distance: int = DEFAULT_MAX_DISTANCE
+) -> list[list[UUID]]:
+    """
+    Cluster (id, hash, sharpness) tuples into near-duplicate groups.
+
+    Groups are connected components of the "within max_distance" graph, each
+    sorted best shot (sharpest) first. Singletons are included.
+    """
+    index = HashIndex([(value, photo_id) for photo_id, value, _ in photos])
+    sharpness = {photo_id: s or 0.0 for photo_id, _, s in photos}
+    parent = {photo_id: photo_id for photo_id, _, _ in photos}
+
+    def find(x: UUID) -> UUID:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for photo_id, value, _ in photos:
+        for other_id, _ in index.search(value, max_distance):
+            parent[find(other_id)] = find(photo_id)
+
+    groups: dict[UUID, list[UUID]] = {}
+    for photo_id in parent:
+        groups.setdefault(find(photo_id), []).append(photo_id)
+    return [sorted(g, key=lambda pid: sharpness[pid], reverse=True) for g in groups.values()]
+
+
+class ShopHashIndex:
+    """Per-shop hash indexes, LRU-bounded with a TTL so other workers' uploads show up eventually."""
+
+    def __init__(self, max_shops: int = 64, ttl: float = 600.0):
+        self.max_shops = max_shops
+        self.ttl = ttl
+        self._indexes: OrderedDict[UUID, tuple[float, HashIndex]] = OrderedDict()
+
+    def get(self, shop_id: UUID) -> HashIndex | None:
+        entry = self._indexes.get(shop_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._indexes.pop(shop_id, None)
+            return None
+        self._indexes.move_to_end(shop_id)
+        return entry[1]
+
+    def put(self, shop_id: UUID, index: HashIndex) -> None:
+        self._indexes[shop_id] = (time.monotonic(), index)
+        self._indexes.move_to_end(shop_id)
+        while len(self._indexes) > self.max_shops:
+            self._indexes.popitem(last=False)
+
+    def add(self, shop_id: UUID, value: int, photo_id: UUID) -> None:
+        """Keep a cached index current after an upload in this worker."""
+        index = self.get(shop_id)
+        if index is not None:
+            index.add(value, photo_id)
+
+    def invalidate(self, shop_id: UUID) -> None:
+        self._indexes.pop(shop_id, None)
+
+    def invalidate_photo(self, photo_id: UUID) -> None:
+        """Drop whichever cached index holds this photo (moved, deleted or rehashed)."""
+        for shop_id, (_, index) in list(self._indexes.items()):
+            if photo_id in index:
+                del self._indexes[shop_id]
+
+    def clear(self) -> None:
+        self._indexes.clear()
+
+
+shop_index = ShopHashIndex()
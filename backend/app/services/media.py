@@ -0,0 +1,155 @@
+"""Media serving helpers - versioned URLs and precompressed image variants."""
+
+import hashlib
+from pathlib import Path
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.storage import UPLOAD_DIR
+
+MEDIA_PREFIX = "/media"
+
+# Variant formats in order of preference: format -> (mime type, Pillow save kwargs)
+VARIANT_FORMATS = {
+    "avif": ("image/avif", {"quality": 60}),
+    "webp": ("image/webp", {"quality": 80, "method": 4}),
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".bmp", ".gif"}
+
+def file_version(path: Path) -> str:
+    """
+    Short version tag for a stored file, derived from its stat signature.
+
+    Uploads are write-once, so (inode, mtime, size) changes whenever the file
+    is replaced. Only a stat() - the content is never read, so building URLs
+    for a whole list page stays cheap.
+    """
+    stat = path.stat()
+    signature = f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}".encode()
+    return hashlib.blake2b(signature, digest_size=8).hexdigest()
+
+
+def resolve_media_path(relative_path: str, must_exist: bool = True) -> Path | None:
+    """Resolve a path under UPLOAD_DIR, rejecting traversal outside of it."""
+    root = UPLOAD_DIR.resolve()
+    relative = Path(relative_path)
+    if relative.parts and relative.parts[0] == UPLOAD_DIR.name:
+        relative = Path(*relative.parts[1:])
+    candidate = (root / relative).resolve()
+    if root not in candidate.parents or (must_exist and not candidate.is_file()):
+        return None
+    return candidate
+
+
+def media_url_for(stored_path: str | None) -> str | None:
+    """
+    Build an immutable, versioned URL for a locally stored file.
+
+    Returns None for paths that are not local uploads (e.g. S3 or Supabase URLs),
+    which are already served by their own CDN.
+    """
+    if not stored_path or "://" in stored_path:
+        return None
+    path = resolve_media_path(stored_path)
+    if path is None:
+        return None
+    relative = path.relative_to(UPLOAD_DIR.resolve()).as_posix()
+    return f"{MEDIA_PREFIX}/{file_version(path)}/{relative}"
+
+
+def enabled_variant_formats() -> list[str]:
+    """Variant formats from settings that this Pillow build can actually encode."""
+    Image.init()
+    formats = []
+    for fmt in settings.MEDIA_VARIANT_FORMATS.split(","):
+        fmt = fmt.strip().lower()
+        if fmt in VARIANT_FORMATS and fmt.upper() in Image.SAVE:
+            formats.append(fmt)
+    return formats
+
+
+def variant_path(original: Path, fmt: str) -> Path:
+    return original.with_name(f"{original.name}.{fmt}")
+
+
+def parse_accept(accept: str) -> dict[str, float]:
+    """Media ranges of an Accept header mapped to their q-values (lower-cased)."""
+    ranges: dict[str, float] = {}
+    for part in accept.lower().split(","):
+        media_range, *params = (p.strip() for p in part.split(";"))
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        ranges[media_range] = max(q, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def negotiate_variant(original: Path, accept: str) -> tuple[Path, str | None]:
+    """
+    Pick the best precompressed variant the client accepts.
+
+    Only variants whose type the client names explicitly (with q > 0) are
+    considered - `*/*` and `image/*` are sent by clients that can't decode
+    AVIF/WebP too. Highest q wins; ties go to the configured format order.
+    Returns (path, mime type); mime type is None when the original is served.
+    """
+    if original.suffix.lower() not in IMAGE_EXTENSIONS:
+        return original, None
+    ranges = parse_accept(accept)
+    best: tuple[float, Path, str] | None = None
+    for fmt in enabled_variant_formats():
+        mime, _ = VARIANT_FORMATS[fmt]
+        q = ranges.get(mime, 0.0)
+        if q <= 0 or (best is not None and q <= best[0]):
+            continue
+        candidate = variant_path(original, fmt)
+        if candidate.is_file():
+            best = (q, candidate, mime)
+    if best is None:
+        return original, None
+    return best[1], best[2]
+
+
+def build_variants(original: Path) -> list[Path]:
+    """
+    Encode WebP/AVIF variants next to the original image.
+
+    Blocking (Pillow) - run it in a thread. Variants that would not be smaller
+    than the original are skipped so negotiation never serves a bigger file.
+    """
+    if original.suffix.lower() not in IMAGE_EXTENSIONS:
+        return []
+    created = []
+    original_size = original.stat().st_size
+    try:
+        img = Image.open(original)
+        img.load()
+    except OSError:
+        # Not decodable by this Pillow build (e.g. HEIC) - keep serving the original
+        return []
+    with img:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        for fmt in enabled_variant_formats():
+            target = variant_path(original, fmt)
+            if target.is_file():
+                created.append(target)
+                continue
+            _, save_kwargs = VARIANT_FORMATS[fmt]
+            tmp = target.with_name(f".{target.name}.tmp")
+            img.save(tmp, format=fmt.upper(), **save_kwargs)
+            if tmp.stat().st_size >= original_size:
+                tmp.unlink()
+                continue
+            tmp.replace(target)
+            created.append(target)
+    return created
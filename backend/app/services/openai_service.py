@@ -1,11 +1,42 @@
 """OpenAI Whisper transcription + GPT-4o Structured Output service."""
 
-from openai import AsyncOpenAI
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from uuid import UUID
+
+from openai import APIConnectionError, AsyncOpenAI
 from pydantic import BaseModel
 
 from app.core.config import settings
+from app.services.audio import preprocess_audio, split_audio
+from app.services.rate_limit import FairLimiter, Priority
+from app.services.resilience import Upstream
+
+# Retries and timeouts are handled by `upstream`, not the SDK
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
+    max_retries=0,
+)
+
+upstream = Upstream(
+    "openai",
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+    max_retries=settings.AI_MAX_RETRIES,
+    failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.AI_BREAKER_RESET_SECONDS,
+    retryable=(APIConnectionError,),
+)
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+limiter = FairLimiter(
+    "openai",
+    global_rate=settings.OPENAI_RATE_LIMIT,
+    global_burst=settings.OPENAI_BURST,
+    shop_rate=settings.OPENAI_SHOP_RATE_LIMIT,
+    shop_burst=settings.OPENAI_SHOP_BURST,
+    max_wait=settings.AI_LIMIT_MAX_WAIT_SECONDS,
+)
 
 
 class ProductInfo(BaseModel):
@@ -27,46 +58,180 @@ class TreatmentExtraction(BaseModel):
     summary: str | None = None
 
 
-async def transcribe_audio(audio_file_path: str) -> str:
-    """Transcribe audio file using OpenAI Whisper API."""
-    with open(audio_file_path, "rb") as audio_file:
-        transcription = await client.audio.transcriptions.create(
-            model="gpt-4o-mini-transcribe",
-            file=audio_file,
-            language="ko",
-        )
+STITCH_MAX_OVERLAP_WORDS = 30
+
+
+def stitch_transcripts(parts: list[str]) -> str:
+    """
+    Join chunk transcripts, dropping words repeated across the audio overlap:
+    the longest run that ends one part and starts the next is kept once.
+    """
+    words: list[str] = []
+    for part in parts:
+        next_words = part.split()
+        max_k = min(len(words), len(next_words), STITCH_MAX_OVERLAP_WORDS)
+        overlap = next((k for k in range(max_k, 0, -1) if words[-k:] == next_words[:k]), 0)
+        words.extend(next_words[overlap:])
+    return " ".join(words)
+
+
+async def _transcribe_file(path: str, shop_id: UUID | None, priority: Priority) -> str:
+    async def _transcribe():
+        with open(path, "rb") as audio_file:
+            return await client.audio.transcriptions.create(
+                model="gpt-4o-mini-transcribe",
+                file=audio_file,
+                language="ko",
+            )
+
+    transcription = await upstream.call(_transcribe, acquire=lambda: limiter.acquire(shop_id, priority))
     return transcription.text
 
 
-async def extract_treatment_info(transcript: str) -> TreatmentExtraction:
+async def transcribe_audio(
+    audio_file_path: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    """
+    Transcribe audio file using OpenAI Whisper API.
+
+    The recording is first shrunk (mono, 16 kHz, silence trimmed, Opus) so
+    less has to be uploaded and transcribed. Memos longer than
+    TRANSCRIBE_CHUNK_SECONDS are split at pauses into overlapping chunks that
+    are transcribed concurrently and stitched back together.
+    """
+    upload_path = audio_file_path
+    if settings.AUDIO_PREPROCESS_ENABLED:
+        upload_path = (await preprocess_audio(audio_file_path)).path
+    chunks = []
+
+    try:
+        chunks = await split_audio(
+            upload_path, settings.TRANSCRIBE_CHUNK_SECONDS, settings.TRANSCRIBE_CHUNK_OVERLAP_SECONDS
+        )
+        semaphore = asyncio.Semaphore(settings.TRANSCRIBE_CHUNK_CONCURRENCY)
+
+        async def _transcribe_chunk(path: str) -> str:
+            async with semaphore:
+                return await _transcribe_file(path, shop_id, priority)
+
+        tasks = [asyncio.ensure_future(_transcribe_chunk(chunk.path)) for chunk in chunks]
+        try:
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            # One chunk failed (or we were cancelled): stop the rest and wait
+            # for them to let go of their files before those are deleted
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    finally:
+        for chunk in chunks:
+            if chunk.path not in (upload_path, audio_file_path):
+                os.unlink(chunk.path)
+        if upload_path != audio_file_path:
+            os.unlink(upload_path)
+    return stitch_transcripts(parts)
+
+
+def _extraction_messages(transcript: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": (
+                "당신은 한국 미용실 시술 기록 전문 AI 어시스턴트입니다. "
+                "음성 메모 텍스트에서 시술 정보를 정확하게 추출하세요. "
+                "브랜드명과 제품 코드를 정확히 구분하세요. "
+                "예: '로레알 7.1' → brand='로레알', code='7.1'"
+            ),
+        },
+        {
+            "role": "user",
+            "content": f"다음 음성 메모에서 시술 정보를 추출해주세요:\n\n{transcript}",
+        },
+    ]
+
+
+async def extract_treatment_info(
+    transcript: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> TreatmentExtraction:
     """
     Extract structured treatment information from a transcript
     using GPT-4o Structured Output.
     """
-    completion = await client.beta.chat.completions.parse(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "당신은 한국 미용실 시술 기록 전문 AI 어시스턴트입니다. "
-                    "음성 메모 텍스트에서 시술 정보를 정확하게 추출하세요. "
-                    "브랜드명과 제품 코드를 정확히 구분하세요. "
-                    "예: '로레알 7.1' → brand='로레알', code='7.1'"
-                ),
-            },
-            {
-                "role": "user",
-                "content": f"다음 음성 메모에서 시술 정보를 추출해주세요:\n\n{transcript}",
-            },
-        ],
-        response_format=TreatmentExtraction,
-    )
+
+    async def _parse():
+        return await client.beta.chat.completions.parse(
+            model="gpt-4o",
+            messages=_extraction_messages(transcript),
+            response_format=TreatmentExtraction,
+        )
+
+    completion = await upstream.call(_parse, acquire=lambda: limiter.acquire(shop_id, priority))
     return completion.choices[0].message.parsed
 
 
-async def transcribe_and_extract(audio_file_path: str) -> TreatmentExtraction:
+async def transcribe_and_extract(
+    audio_file_path: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> TreatmentExtraction:
     """Transcribe audio and extract structured treatment info in one step."""
-    transcript = await transcribe_audio(audio_file_path)
-    extraction = await extract_treatment_info(transcript)
+    transcript = await transcribe_audio(audio_file_path, shop_id, priority)
+    extraction = await extract_treatment_info(transcript, shop_id, priority)
     return extraction
+
+
+async def stream_treatment_info(
+    transcript: str,
+    shop_id: UUID | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> AsyncIterator[tuple[str, dict | TreatmentExtraction]]:
+    """
+    Stream the structured extraction as the model writes it.
+
+    Yields ("partial", {field: value}) each time a field is complete - i.e. the
+    model has moved on to the next key - and finally ("result", extraction)
+    with the validated object. Streams are not retried; the breaker and the
+    request deadline still apply.
+
+    The upstream stream is read by a producer task and handed over through a
+    queue, so the upstream timeout only covers the model and never the time
+    the consumer (e.g. a slow client connection) spends between items.
+    """
+    await limiter.acquire(shop_id, priority)
+    queue: asyncio.Queue[tuple[str, dict | TreatmentExtraction] | None] = asyncio.Queue()
+
+    async def produce() -> None:
+        emitted: dict = {}
+        async with upstream.guard():
+            async with client.beta.chat.completions.stream(
+                model="gpt-4o",
+                messages=_extraction_messages(transcript),
+                response_format=TreatmentExtraction,
+            ) as stream:
+                async for event in stream:
+                    if event.type != "content.delta" or not isinstance(event.parsed, dict):
+                        continue
+                    # The last key may still be mid-value; everything before it is final
+                    complete = list(event.parsed.items())[:-1]
+                    fresh = {k: v for k, v in complete if k not in emitted}
+                    if fresh:
+                        emitted.update(fresh)
+                        queue.put_nowait(("partial", fresh))
+                completion = await stream.get_final_completion()
+        queue.put_nowait(("result", completion.choices[0].message.parsed))
+
+    producer = asyncio.create_task(produce())
+    producer.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (item := await queue.get()) is not None:
+            yield item
+        producer.result()  # re-raise whatever ended the stream early
+    finally:
+        # Consumer went away (or failed): stop reading upstream
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,255 @@
+"""Hot/cold tiering for treatment photo originals.
+
+Run periodically (e.g. nightly cron):
+
+    python -m app.services.photo_archive            # archive + create upcoming partitions
+    python -m app.services.photo_archive --dry-run  # only count what would move
+
+Photos whose treatment is older than ARCHIVE_AFTER_MONTHS are archived in
+keyset-paginated batches: a small WebP thumbnail is written next to the
+original and stays hot (it is what timelines and lists show), the original is
+uploaded to S3 under COLD_STORAGE_PREFIX with COLD_STORAGE_CLASS (Glacier
+Instant Retrieval by default, so restores are a plain GET), then the local
+original and its variants are deleted. `restore_photo` brings an original
+back on demand and rebuilds its variants; the cold copy and cold_key are
+kept, so the next run drops the restored original again without a second
+upload.
+
+The batch query filters on treatment_created_at, so it only touches the old
+partitions of treatment_photos (migration 013) and uses the partial
+idx_treatment_photos_hot index. No transaction is held open across an S3
+upload: each batch is read in its own transaction and each archived photo is
+recorded and committed on its own, then its local files are deleted.
+
+There is no default partition (migration 013), so this job must run at
+least monthly: ensure_partitions keeps monthly partitions
+PARTITION_MONTHS_AHEAD ahead of the clock, and inserts past the last one fail.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID
+
+import boto3
+from PIL import Image
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import TreatmentPhoto
+from app.services.media import (
+    IMAGE_EXTENSIONS,
+    VARIANT_FORMATS,
+    build_variants,
+    resolve_media_path,
+    variant_path,
+)
+from app.services.storage import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+THUMBNAIL_SIZE = (480, 480)
+PARTITIONED_TABLES = ("treatments", "treatment_photos")
+PARTITION_MONTHS_AHEAD = 3
+
+_s3 = None
+
+
+def _get_s3():
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client(
+            "s3",
+            region_name=settings.AWS_REGION,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+        )
+    return _s3
+
+
+def cold_key_for(path: Path) -> str:
+    return settings.COLD_STORAGE_PREFIX + path.relative_to(UPLOAD_DIR.resolve()).as_posix()
+
+
+def thumbnail_path(original: Path) -> Path:
+    return original.with_name(f"{original.stem}_thumb.webp")
+
+
+def make_thumbnail(original: Path) -> Path | None:
+    """Blocking (Pillow): small WebP thumbnail next to the original, or None if undecodable."""
+    if original.suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    target = thumbnail_path(original)
+    if target.is_file():
+        return target
+    try:
+        with Image.open(original) as img:
+            img.draft("RGB", THUMBNAIL_SIZE)  # JPEG: decode at reduced size
+            img.thumbnail(THUMBNAIL_SIZE)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            img.save(target, format="WEBP", quality=75)
+    except OSError:
+        return None
+    return target
+
+
+def archive_file(original: Path, cold_key: str | None = None) -> tuple[str, Path | None]:
+    """
+    Blocking: write the hot thumbnail and upload the original to the cold tier.
+
+    A photo that already has a `cold_key` (restored earlier) is not uploaded again.
+    """
+    thumbnail = make_thumbnail(original)
+    if cold_key:
+        return cold_key, thumbnail
+    key = cold_key_for(original)
+    _get_s3().upload_file(
+        str(original),
+        settings.AWS_S3_BUCKET,
+        key,
+        ExtraArgs={"StorageClass": settings.COLD_STORAGE_CLASS},
+    )
+    return key, thumbnail
+
+
+def delete_local(original: Path) -> None:
+    """Blocking: drop an archived original and its WebP/AVIF variants from local disk."""
+    for fmt in VARIANT_FORMATS:
+        variant_path(original, fmt).unlink(missing_ok=True)
+    original.unlink(missing_ok=True)
+
+
+def restore_file(key: str, original: Path) -> None:
+    """Blocking: download an archived original back to its local path and rebuild its variants."""
+    original.parent.mkdir(parents=True, exist_ok=True)
+    tmp = original.with_name(f".{original.name}.tmp")
+    _get_s3().download_file(settings.AWS_S3_BUCKET, key, str(tmp))
+    tmp.replace(original)
+    build_variants(original)
+
+
+async def restore_photo(db: AsyncSession, photo: TreatmentPhoto) -> TreatmentPhoto:
+    """Bring a cold photo's original back to the hot tier. No-op for hot photos."""
+    if photo.storage_tier != "cold" or not photo.cold_key:
+        return photo
+    original = resolve_media_path(photo.photo_url, must_exist=False)
+    if original is None:
+        raise ValueError(f"photo {photo.id} has no local path to restore to")
+    await db.commit()  # don't sit idle in a transaction during the download
+    await asyncio.to_thread(restore_file, photo.cold_key, original)
+    photo.storage_tier = "hot"
+    photo.archived_at = None
+    await db.commit()
+    await db.refresh(photo)
+    logger.info("photo %s restored from %s", photo.id, photo.cold_key)
+    return photo
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    """Create monthly partitions up to `months_ahead` - without them inserts fail."""
+    today = datetime.now(timezone.utc).date()
+    until = today + timedelta(days=31 * months_ahead)
+    for table in PARTITIONED_TABLES:
+        await db.execute(
+            text("SELECT create_monthly_partitions(:parent, :from_month, :to_month)"),
+            {"parent": table, "from_month": today, "to_month": until},
+        )
+    await db.commit()
+
+
+async def run_archive(
+    older_than_months: int | None = None, batch_size: int = BATCH_SIZE, dry_run: bool = False
+) -> dict:
+    """
+    Archive hot originals of photos older than `older_than_months`.
+
+    Returns counters: archived, skipped (file missing or not local), failed,
+    batches and elapsed seconds.
+    """
+    months = older_than_months if older_than_months is not None else settings.ARCHIVE_AFTER_MONTHS
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30 * months)
+    clock = time.perf_counter()
+    archived = skipped = failed = batches = 0
+
+    async with async_session() as db:
+        await ensure_partitions(db)
+        after_id = UUID(int=0)
+
+        while True:
+            result = await db.execute(
+                select(TreatmentPhoto.id, TreatmentPhoto.photo_url, TreatmentPhoto.cold_key)
+                .where(
+                    TreatmentPhoto.treatment_created_at < cutoff,
+                    TreatmentPhoto.storage_tier == "hot",
+                    TreatmentPhoto.id > after_id,
+                )
+                .order_by(TreatmentPhoto.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            await db.commit()  # end the read before the uploads
+            if not rows:
+                break
+            batches += 1
+            after_id = rows[-1].id
+            if dry_run:
+                archived += len(rows)
+                continue
+
+            for photo_id, photo_url, cold_key in rows:
+                original = resolve_media_path(photo_url)
+                if original is None or not original.is_file():
+                    skipped += 1  # remote URL or already gone
+                    continue
+                try:
+                    key, thumbnail = await asyncio.to_thread(archive_file, original, cold_key)
+                except Exception as exc:  # logged per photo; the run keeps going
+                    logger.warning("archiving photo %s failed: %s", photo_id, exc)
+                    failed += 1
+                    continue
+                values = {
+                    "storage_tier": "cold",
+                    "cold_key": key,
+                    "archived_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                }
+                if thumbnail is not None:
+                    values["thumbnail_url"] = str(UPLOAD_DIR / thumbnail.relative_to(UPLOAD_DIR.resolve()))
+                await db.execute(
+                    update(TreatmentPhoto)
+                    .where(TreatmentPhoto.id == photo_id, TreatmentPhoto.storage_tier == "hot")
+                    .values(**values)
+                )
+                # The local original is deleted only once the cold tier is
+                # committed, so a crash never loses it
+                await db.commit()
+                await asyncio.to_thread(delete_local, original)
+                archived += 1
+
+    stats = {
+        "mode": "dry_run" if dry_run else "archive",
+        "cutoff": cutoff.isoformat(),
+        "archived": archived,
+        "skipped": skipped,
+        "failed": failed,
+        "batches": batches,
+        "elapsed_seconds": round(time.perf_counter() - clock, 2),
+    }
+    logger.info("photo_archive run finished: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old photo originals to cold storage")
+    parser.add_argument("--months", type=int, default=None, help="archive photos older than this")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count candidates")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_archive(args.months, batch_size=args.batch_size, dry_run=args.dry_run)))
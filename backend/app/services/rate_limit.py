@@ -0,0 +1,214 @@
+"""Per-shop rate limiting and fair scheduling for outbound AI API calls.
+
+Each upstream (OpenAI, AKOOL) gets one FairLimiter. A call must take a token
+from both its shop's bucket and the upstream's global bucket. Waiting calls
+are queued per priority class and per shop; whenever a token frees up it goes
+to the next shop in round-robin order, interactive requests before batch
+ones. One shop bulk-processing memos therefore only ever consumes its own
+share plus whatever capacity nobody else is asking for.
+
+Calls without a shop (shop_id=None) only take from the global bucket. They
+are queued together for round-robin purposes, but are not squeezed into one
+shared per-shop bucket as if every unidentified caller were a single shop.
+
+State is per process. With several uvicorn workers, size the rates per worker
+(global quota / worker count).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from uuid import UUID
+
+from app.services.resilience import remaining_budget
+
+ANONYMOUS_SHOP = "anonymous"  # queue key for calls without a shop; no per-shop bucket
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a designer is waiting on the response
+    BATCH = 1  # bulk/background processing
+
+
+class RateLimitedError(Exception):
+    """Raised when a call could not get a slot within the limiter's max wait."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} rate limit exceeded, retry after {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def available(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class FairLimiter:
+    """Global + per-shop token buckets with round-robin, priority-aware dispatch."""
+
+    MAX_IDLE_BUCKETS = 1000
+
+    def __init__(
+        self,
+        name: str,
+        global_rate: float,
+        global_burst: int,
+        shop_rate: float,
+        shop_burst: int,
+        max_wait: float = 30.0,
+    ):
+        self.name = name
+        self.shop_rate = shop_rate
+        self.shop_burst = shop_burst
+        self.max_wait = max_wait
+        self._global = TokenBucket(global_rate, global_burst)
+        self._shops: dict[str, TokenBucket] = {}
+        self._queues: dict[Priority, OrderedDict[str, deque[_Waiter]]] = {
+            p: OrderedDict() for p in Priority
+        }
+        self._timer: asyncio.TimerHandle | None = None
+        self._waits: deque[float] = deque(maxlen=1000)
+        self._granted = 0
+        self._rejected = 0
+
+    def _shop_bucket(self, shop_key: str, now: float) -> TokenBucket | None:
+        if shop_key == ANONYMOUS_SHOP:
+            return None  # global limit only
+        bucket = self._shops.get(shop_key)
+        if bucket is None:
+            if len(self._shops) >= self.MAX_IDLE_BUCKETS:
+                # Full buckets carry no state worth keeping
+                self._shops = {k: b for k, b in self._shops.items() if not b.is_full(now)}
+            bucket = self._shops[shop_key] = TokenBucket(self.shop_rate, self.shop_burst)
+        return bucket
+
+    def _grant(self, waiter: _Waiter, now: float) -> None:
+        waiter.future.set_result(None)
+        self._waits.append(now - waiter.enqueued_at)
+        self._granted += 1
+
+    def _dispatch(self) -> None:
+        """Hand out available tokens; re-arm a timer for when the next one frees up."""
+        self._timer = None
+        now = time.monotonic()
+        next_wake: float | None = None
+
+        while True:
+            if not self._global.available(now):
+                next_wake = self._global.wait_time(now)
+                break
+            granted = False
+            for priority in Priority:
+                shops = self._queues[priority]
+                for shop_key in list(shops):
+                    waiters = shops[shop_key]
+                    while waiters and waiters[0].future.done():  # cancelled / timed out
+                        waiters.popleft()
+                    if not waiters:
+                        del shops[shop_key]
+                        continue
+                    bucket = self._shop_bucket(shop_key, now)
+                    if bucket is not None:
+                        if not bucket.available(now):
+                            wait = bucket.wait_time(now)
+                            next_wake = wait if next_wake is None else min(next_wake, wait)
+                            continue
+                        bucket.take(now)
+                    self._global.take(now)
+                    self._grant(waiters.popleft(), now)
+                    if waiters:
+                        shops.move_to_end(shop_key)  # round robin across shops
+                    else:
+                        del shops[shop_key]
+                    granted = True
+                    break
+                if granted:
+                    break
+            if not granted:
+                break
+
+        if next_wake is not None and self.queue_depth() > 0:
+            self._timer = asyncio.get_running_loop().call_later(next_wake, self._dispatch)
+
+    def queue_depth(self) -> int:
+        return sum(len(w) for shops in self._queues.values() for w in shops.values())
+
+    async def acquire(self, shop_id: UUID | str | None, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Wait for a slot. Raises RateLimitedError after `max_wait` seconds (or the request budget)."""
+        shop_key = str(shop_id) if shop_id else ANONYMOUS_SHOP
+        waiter = _Waiter(asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(shop_key, deque()).append(waiter)
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+        max_wait = self.max_wait
+        remaining = remaining_budget()
+        if remaining is not None:
+            max_wait = max(min(max_wait, remaining), 0)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                return  # granted right at the deadline
+            waiter.future.cancel()
+            self._rejected += 1
+            now = time.monotonic()
+            bucket = self._shop_bucket(shop_key, now) or self._global
+            retry_after = max(bucket.wait_time(now), 1.0)
+            raise RateLimitedError(self.name, retry_after)
+        except asyncio.CancelledError:
+            waiter.future.cancel()
+            raise
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": {p.name.lower(): sum(len(w) for w in self._queues[p].values()) for p in Priority},
+            "queued_shops": len({k for shops in self._queues.values() for k in shops}),
+            "granted": self._granted,
+            "rejected": self._rejected,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95) - 1], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+        }
@@ -0,0 +1,291 @@
+"""Deadlines, retries and circuit breaking for outbound AI API calls.
+
+Every call to an upstream (OpenAI, AKOOL) goes through `Upstream.call`:
+
+- Deadline: each attempt is bounded by the upstream's per-call timeout and by
+  what is left of the current request's budget (see `request_budget`), so a
+  slow upstream can't hold a request handler past its budget.
+- Retries: idempotent calls are retried on transient failures (connection
+  errors, timeouts, 429/5xx) with full-jitter exponential backoff, waiting at
+  least as long as the upstream's Retry-After, as long as the budget allows
+  another attempt. Every attempt - retries included - first takes a token
+  from the caller's rate limiter (`acquire`), so retries queue fairly behind
+  other shops' calls instead of bypassing the limiter.
+- Circuit breaker: after `failure_threshold` consecutive failures the circuit
+  opens and calls fail fast with CircuitOpenError; after `reset_timeout` one
+  probe call is let through (half-open) to decide whether to close it again.
+  429s are retried but never count as failures - a throttled upstream is up,
+  and opening the circuit would only turn our own quota overrun into an outage.
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# Absolute monotonic deadline of the request being served, if any
+_request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_budget(seconds: float):
+    """Bound all upstream calls made inside this block to `seconds` in total."""
+    deadline = time.monotonic() + seconds
+    current = _request_deadline.get()
+    token = _request_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_budget() -> float | None:
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class UpstreamError(Exception):
+    """Base class for failures raised by the resilience layer itself."""
+
+    def __init__(self, upstream: str, message: str, retry_after: float = 1.0):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class DeadlineExceededError(UpstreamError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 1.0)
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_throttled(self) -> None:
+        """A 429: says nothing about upstream health, just frees the probe slot."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+def _status_code(exc: BaseException) -> int | None:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code
+    return getattr(exc, "status_code", None)
+
+
+def _retry_after(exc: BaseException) -> float:
+    """Seconds the upstream asked us to wait (Retry-After), or 0."""
+    # httpx.HTTPStatusError and the OpenAI SDK's APIStatusError both carry the response
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if isinstance(response, httpx.Response) else None
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Upstream:
+    """Resilience policy for one external API."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        retryable: tuple[type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retryable = (httpx.TransportError, TimeoutError, *retryable)
+        self._calls = 0
+        self._retries = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._throttled = 0
+        self._rejected = 0
+
+    def is_transient(self, exc: BaseException) -> bool:
+        """Failures that say nothing about our request - worth retrying."""
+        status = _status_code(exc)
+        if status is not None:
+            return status == 429 or status >= 500
+        return isinstance(exc, self.retryable)
+
+    def _record(self, exc: BaseException) -> None:
+        """Feed a failed attempt to the breaker and counters."""
+        if isinstance(exc, TimeoutError):
+            self._timeouts += 1
+        if _status_code(exc) == 429:
+            self._throttled += 1
+            self.breaker.record_throttled()
+        elif self.is_transient(exc):
+            self._failures += 1
+            self.breaker.record_failure()
+        else:
+            # Our fault (4xx, bad input) - upstream is healthy
+            self.breaker.record_success()
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        idempotent: bool = True,
+        acquire: Callable[[], Awaitable[None]] | None = None,
+    ) -> T:
+        """
+        Run `fn` under this upstream's deadline, retry and breaker policy.
+
+        `fn` is a zero-argument coroutine factory so each attempt starts fresh.
+        `acquire`, if given, is awaited before every attempt (e.g.
+        `lambda: limiter.acquire(shop_id, priority)`).
+        Non-idempotent calls (e.g. creating a job) are attempted once.
+        """
+        self._calls += 1
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            timeout = await self._begin_attempt(acquire)
+            try:
+                async with asyncio.timeout(timeout):
+                    result = await fn()
+            except asyncio.CancelledError:
+                # Client went away - don't leave a half-open probe slot dangling
+                self.breaker._probe_in_flight = False
+                raise
+            except Exception as exc:
+                self._record(exc)
+                if not self.is_transient(exc) or attempt == attempts - 1:
+                    raise
+                delay = max(
+                    random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt)),
+                    _retry_after(exc),
+                )
+                remaining = remaining_budget()
+                if remaining is not None and remaining <= delay:
+                    raise
+                self._retries += 1
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+        raise AssertionError("unreachable")
+
+    async def _begin_attempt(self, acquire: Callable[[], Awaitable[None]] | None = None) -> float:
+        """Check the breaker, take a rate-limit token and check the budget; return the timeout for this attempt."""
+        if not self.breaker.allow():
+            self._rejected += 1
+            raise CircuitOpenError(self.name, "circuit open", self.breaker.retry_after())
+        try:
+            if acquire is not None:
+                await acquire()
+            timeout = self.timeout
+            remaining = remaining_budget()
+            if remaining is not None:
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise DeadlineExceededError(self.name, "request budget exhausted")
+                timeout = min(timeout, remaining)
+        except BaseException:
+            # Nothing was sent - don't hold on to a half-open probe slot
+            self.breaker._probe_in_flight = False
+            raise
+        return timeout
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        Single attempt under the breaker and deadline, without retries.
+
+        For streaming calls whose partial output has already been sent and so
+        can't be replayed.
+        """
+        self._calls += 1
+        timeout = await self._begin_attempt()
+        try:
+            async with asyncio.timeout(timeout):
+                yield
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker._probe_in_flight = False
+            raise
+        except Exception as exc:
+            self._record(exc)
+            raise
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "calls": self._calls,
+            "retries": self._retries,
+            "failures": self._failures,
+            "timeouts": self._timeouts,
+            "throttled": self._throttled,
+            "rejected": self._rejected,
+        }
@@ -0,0 +1,195 @@
+"""Batch job computing which customers are due for a revisit, across all shops.
+
+Run periodically (e.g. cron every 15 minutes):
+
+    python -m app.services.revisit_due          # incremental
+    python -m app.services.revisit_due --full   # recompute everything
+
+Customers are processed in keyset-paginated batches, each in its own short
+transaction, so no long-held locks. Every batch is one set-based upsert (plus
+a delete of rows that no longer qualify): the latest treatment's `next_visit_recommendation` is parsed into days by
+the `parse_revisit_interval_days` SQL function (migration 010) and added to
+`customers.last_visit`. Incremental runs only visit customers whose row or
+treatments changed since the previous run's horizon.
+
+The watermark is the sync horizon (`sync_horizon()`, migration 014) taken
+when a run starts: the start of the oldest transaction still open. updated_at
+is stamped with the writing transaction's start time, so a transaction that
+commits after the run started still stamps at or after that horizon and is
+picked up by the next run. Deleting a treatment, or moving it to another
+customer, touches the customer it belonged to (migration 010).
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "revisit_due"
+BATCH_SIZE = 5000
+
+_FULL_CANDIDATES = text(
+    """
+    SELECT id FROM customers
+    WHERE id > :after_id AND last_visit IS NOT NULL
+    ORDER BY id
+    LIMIT :batch_size
+    """
+)
+
+_CHANGED_CANDIDATES = text(
+    """
+    SELECT id FROM (
+      SELECT id FROM customers WHERE updated_at >= :since
+      UNION
+      SELECT customer_id AS id FROM treatments WHERE updated_at >= :since
+    ) changed
+    WHERE id > :after_id
+    ORDER BY id
+    LIMIT :batch_size
+    """
+)
+
+# Latest treatment with a recommendation, per customer in the batch
+_LATEST_CTE = """
+    latest AS (
+      SELECT DISTINCT ON (t.customer_id)
+        t.customer_id, t.id AS treatment_id,
+        parse_revisit_interval_days(t.next_visit_recommendation) AS interval_days
+      FROM treatments t
+      WHERE t.customer_id = ANY(:ids) AND t.next_visit_recommendation IS NOT NULL
+      ORDER BY t.customer_id, t.created_at DESC
+    )
+"""
+
+_UPSERT_DUE = text(
+    "WITH" + _LATEST_CTE + """
+    INSERT INTO revisit_due
+      (customer_id, shop_id, treatment_id, last_visit, interval_days, due_at, computed_at)
+    SELECT c.id, c.shop_id, l.treatment_id, c.last_visit, l.interval_days,
+           c.last_visit + make_interval(days => l.interval_days), now()
+    FROM customers c
+    JOIN latest l ON l.customer_id = c.id
+    WHERE c.last_visit IS NOT NULL AND l.interval_days IS NOT NULL
+    ON CONFLICT (customer_id) DO UPDATE SET
+      shop_id = excluded.shop_id,
+      treatment_id = excluded.treatment_id,
+      last_visit = excluded.last_visit,
+      interval_days = excluded.interval_days,
+      due_at = excluded.due_at,
+      computed_at = excluded.computed_at
+    WHERE (revisit_due.treatment_id, revisit_due.due_at)
+      IS DISTINCT FROM (excluded.treatment_id, excluded.due_at)
+    """
+)
+
+# Customers in the batch that no longer have a parseable recommendation
+_DELETE_STALE = text(
+    "WITH" + _LATEST_CTE + """
+    DELETE FROM revisit_due r
+    WHERE r.customer_id = ANY(:ids)
+      AND NOT EXISTS (
+        SELECT 1 FROM latest l
+        JOIN customers c ON c.id = l.customer_id
+        WHERE l.customer_id = r.customer_id
+          AND l.interval_days IS NOT NULL AND c.last_visit IS NOT NULL
+      )
+    """
+)
+
+
+async def _get_watermark(db: AsyncSession) -> datetime | None:
+    result = await db.execute(
+        text("SELECT last_started_at FROM revisit_job_runs WHERE job_name = :name AND last_finished_at IS NOT NULL"),
+        {"name": JOB_NAME},
+    )
+    return result.scalar_one_or_none()
+
+
+async def _get_horizon(db: AsyncSession) -> datetime:
+    # Every row stamped before this is committed; nothing can commit behind it
+    return (await db.execute(text("SELECT sync_horizon()"))).scalar_one()
+
+
+async def _set_watermark(db: AsyncSession, horizon: datetime) -> None:
+    await db.execute(
+        text(
+            """
+            INSERT INTO revisit_job_runs (job_name, last_started_at, last_finished_at)
+            VALUES (:name, :horizon, now())
+            ON CONFLICT (job_name) DO UPDATE
+              SET last_started_at = excluded.last_started_at,
+                  last_finished_at = excluded.last_finished_at
+            """
+        ),
+        {"name": JOB_NAME, "horizon": horizon},
+    )
+    await db.commit()
+
+
+async def run_revisit_due(full: bool = False, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Recompute revisit_due rows. Incremental unless `full` or no previous run.
+
+    Returns counters: processed customers, batches and elapsed seconds.
+    """
+    clock = time.perf_counter()
+    processed = batches = 0
+
+    async with async_session() as db:
+        since = None if full else await _get_watermark(db)
+        horizon = await _get_horizon(db)
+        await db.commit()
+        after_id = UUID(int=0)
+
+        while True:
+            if since is None:
+                result = await db.execute(
+                    _FULL_CANDIDATES, {"after_id": after_id, "batch_size": batch_size}
+                )
+            else:
+                result = await db.execute(
+                    _CHANGED_CANDIDATES,
+                    {"after_id": after_id, "batch_size": batch_size, "since": since},
+                )
+            ids = list(result.scalars().all())
+            if not ids:
+                break
+
+            await db.execute(_DELETE_STALE, {"ids": ids})
+            await db.execute(_UPSERT_DUE, {"ids": ids})
+            # One short transaction per batch - locks are only held on this slice
+            await db.commit()
+
+            processed += len(ids)
+            batches += 1
+            after_id = ids[-1]
+
+        await _set_watermark(db, horizon)
+
+    stats = {
+        "mode": "full" if since is None else "incremental",
+        "customers": processed,
+        "batches": batches,
+        "elapsed_seconds": round(time.perf_counter() - clock, 2),
+    }
+    logger.info("revisit_due run finished: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute customers due for a revisit")
+    parser.add_argument("--full", action="store_true", help="recompute all customers")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(run_revisit_due(full=args.full, batch_size=args.batch_size)))
@@ -1,12 +1,20 @@
 """File storage service - local filesystem for dev, S3 for production."""
 
+import asyncio
 import os
 import uuid
 from pathlib import Path
 
+from fastapi import UploadFile
+
 from app.core.config import settings
 
 UPLOAD_DIR = Path(settings.UPLOAD_DIR)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLargeError(ValueError):
+    pass
 
 
 def ensure_upload_dir():
@@ -30,6 +38,36 @@ async def save_file_local(file_content: bytes, filename: str, subfolder: str = "
     return str(file_path)
 
 
+async def save_upload_local(upload: UploadFile, subfolder: str = "", max_size: int | None = None) -> str:
+    """
+    Stream an upload to the local filesystem in chunks and return its relative path.
+
+    Disk writes run in a thread so concurrent uploads don't block the event
+    loop. Raises FileTooLargeError (and removes the partial file) past `max_size`.
+    """
+    ensure_upload_dir()
+    target_dir = UPLOAD_DIR / subfolder if subfolder else UPLOAD_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    ext = os.path.splitext(upload.filename or "")[1]
+    file_path = target_dir / f"{uuid.uuid4()}{ext}"
+
+    size = 0
+    f = await asyncio.to_thread(open, file_path, "wb")
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise FileTooLargeError(f"file exceeds {max_size} bytes")
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        file_path.unlink(missing_ok=True)
+        raise
+    f.close()
+    return str(file_path)
+
+
 async def get_file_url(file_path: str) -> str:
     """Get URL for a stored file. In dev, returns local path."""
     return f"/uploads/{file_path}"
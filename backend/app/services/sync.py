@@ -0,0 +1,183 @@
+"""Delta sync change feed for the tablet app's local replica.
+
+Each synced table is a stream keyset-paginated on (updated_at, id); deletions
+come from the sync_tombstones stream on (deleted_at, id) (migration 014). A
+sync token is the per-stream cursor, base64url-encoded JSON - opaque to the
+client, which just passes `next_token` back as `since`.
+
+Streams are only read up to the sync horizon: the start of the oldest still
+open client transaction (sync_horizon(), migration 014). updated_at is stamped
+by the database with the writing transaction's start time, so every row before
+the horizon is committed and a slow transaction can never commit a change
+"behind" a token already handed out.
+
+A session left idle in a transaction would stall every tablet's feed, so the
+horizon never lags more than SYNC_HORIZON_MAX_LAG_SECONDS behind now(). When
+the cap applies a warning is logged: rows that transaction commits later are
+stamped before the horizon and are missed until they change again, so keep
+idle_in_transaction_session_timeout below the cap.
+
+Tombstones are pruned after SYNC_TOMBSTONE_RETENTION_DAYS (run
+`python -m app.services.sync` daily); tokens older than that raise
+SyncTokenExpiredError and the client must resync from scratch.
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import orjson
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import Customer, Portfolio, SyncTombstone, Treatment
+from app.schemas.serializers import customer_to_dict, portfolio_to_dict, treatment_to_dict
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = 1
+EPOCH = datetime(2000, 1, 1)
+NIL_ID = UUID(int=0)
+
+Cursor = tuple[datetime, UUID]
+
+# stream name -> (model, change timestamp column, eager loads, serializer)
+_STREAMS = {
+    "customers": (Customer, Customer.updated_at, (), customer_to_dict),
+    "treatments": (Treatment, Treatment.updated_at, (selectinload(Treatment.photos),), treatment_to_dict),
+    "portfolios": (Portfolio, Portfolio.updated_at, (selectinload(Portfolio.photo),), portfolio_to_dict),
+    "deleted": (
+        SyncTombstone,
+        SyncTombstone.deleted_at,
+        (),
+        lambda t: {"entity": t.entity, "id": t.entity_id},
+    ),
+}
+
+
+class SyncTokenError(ValueError):
+    """The sync token could not be decoded."""
+
+
+class SyncTokenExpiredError(SyncTokenError):
+    """Tombstones the token would need have been pruned - resync from scratch."""
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_token(cursors: dict[str, Cursor]) -> str:
+    payload = {"v": TOKEN_VERSION, **{name: [ts.isoformat(), str(i)] for name, (ts, i) in cursors.items()}}
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=").decode()
+
+
+def decode_token(token: str) -> dict[str, Cursor]:
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        version = payload.get("v")
+        cursors = {
+            name: (_naive_utc(datetime.fromisoformat(payload[name][0])), UUID(payload[name][1]))
+            for name in _STREAMS
+        }
+    except (binascii.Error, AttributeError, KeyError, IndexError, TypeError, ValueError) as exc:
+        raise SyncTokenError("invalid sync token") from exc
+    if version != TOKEN_VERSION:
+        raise SyncTokenError("unsupported sync token version")
+    return cursors
+
+
+async def sync_horizon(db: AsyncSession) -> datetime:
+    """sync_horizon(), but at most SYNC_HORIZON_MAX_LAG_SECONDS behind the database clock."""
+    oldest, now = (await db.execute(select(func.sync_horizon(), func.now()))).one()
+    floor = now - timedelta(seconds=settings.SYNC_HORIZON_MAX_LAG_SECONDS)
+    if oldest < floor:
+        logger.warning(
+            "sync horizon capped: a transaction open since %s is %.0fs old (max %ds)",
+            oldest.isoformat(),
+            (now - oldest).total_seconds(),
+            settings.SYNC_HORIZON_MAX_LAG_SECONDS,
+        )
+        oldest = floor
+    return _naive_utc(oldest)
+
+
+async def fetch_changes(db: AsyncSession, shop_id: UUID, since: str | None, limit: int) -> dict:
+    """
+    One page of changes for a shop: at most `limit` rows across all streams.
+
+    Without `since` this is an initial sync - every row, and no tombstones
+    from before it started. Keep calling with `next_token` while `has_more`.
+    """
+    horizon = await sync_horizon(db)
+    if since is None:
+        cursors = {name: (EPOCH, NIL_ID) for name in _STREAMS}
+        cursors["deleted"] = (horizon, NIL_ID)
+    else:
+        cursors = decode_token(since)
+        retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        if cursors["deleted"][0] < horizon - retention:
+            raise SyncTokenExpiredError("sync token expired")
+
+    page: dict = {}
+    budget = limit
+    has_more = False
+    for name, (model, changed_at, loads, serialize) in _STREAMS.items():
+        if budget == 0:
+            page[name] = []
+            has_more = True
+            continue
+        result = await db.execute(
+            select(model)
+            .options(*loads)
+            .where(
+                model.shop_id == shop_id,
+                tuple_(changed_at, model.id) > tuple_(*cursors[name]),
+                changed_at < horizon,
+            )
+            .order_by(changed_at, model.id)
+            .limit(budget + 1)
+        )
+        rows = list(result.scalars().all())
+        if len(rows) > budget:
+            rows = rows[:budget]
+            last = rows[-1]
+            cursors[name] = (_naive_utc(getattr(last, changed_at.key)), last.id)
+            has_more = True
+        else:
+            # Caught up: everything before the horizon has been sent
+            cursors[name] = (horizon, NIL_ID)
+        budget -= len(rows)
+        page[name] = [serialize(row) for row in rows]
+
+    page["next_token"] = encode_token(cursors)
+    page["has_more"] = has_more
+    return page
+
+
+async def prune_tombstones(retention_days: int | None = None) -> int:
+    """Delete tombstones older than the retention window. Returns the number removed."""
+    days = retention_days if retention_days is not None else settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    async with async_session() as db:
+        result = await db.execute(delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff))
+        await db.commit()
+    logger.info("pruned %d sync tombstones older than %s", result.rowcount, cutoff.isoformat())
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune delta-sync tombstones past the retention window")
+    parser.add_argument("--days", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(prune_tombstones(args.days)))
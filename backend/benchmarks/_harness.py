@@ -0,0 +1,119 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Each script seeds a throwaway shop into the database given by --database-url
+(default: settings.DATABASE_URL, e.g. the docker-compose Postgres with the
+migrations applied), times the operation and deletes the shop again. Run
+them from backend/:
+
+    python -m benchmarks.timeline --visits 500
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+
+# Children first; treatment_photos go with their treatments (on delete cascade)
+_SHOP_TABLES = (
+    "delete from portfolios where shop_id = :shop_id",
+    "delete from face_swap_batch_items where batch_id in (select id from face_swap_batches where shop_id = :shop_id)",
+    "delete from face_swap_batches where shop_id = :shop_id",
+    "delete from revisit_due where shop_id = :shop_id",
+    "delete from treatments where shop_id = :shop_id",
+    "delete from customers where shop_id = :shop_id",
+    "delete from designers where shop_id = :shop_id",
+    "delete from sync_tombstones where shop_id = :shop_id",
+    "delete from shops where id = :shop_id",
+)
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--iterations", type=int, default=50)
+    return parser
+
+
+def make_engine(database_url: str) -> AsyncEngine:
+    return create_async_engine(database_url, pool_size=10)
+
+
+async def create_shop(engine: AsyncEngine) -> uuid.UUID:
+    shop_id = uuid.uuid4()
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("insert into shops (id, name, shop_type) values (:id, 'benchmark', 'hair')"), {"id": shop_id}
+        )
+    return shop_id
+
+
+async def create_partitions(engine: AsyncEngine, since: datetime) -> None:
+    """Monthly treatment partitions back to `since` - there is no default partition for backdated rows."""
+    async with engine.begin() as conn:
+        for table in ("treatments", "treatment_photos"):
+            await conn.execute(
+                text("select create_monthly_partitions(:table, :since, current_date)"),
+                {"table": table, "since": since.date()},
+            )
+
+
+async def drop_shop(engine: AsyncEngine, shop_id: uuid.UUID) -> None:
+    async with engine.begin() as conn:
+        for statement in _SHOP_TABLES:
+            await conn.execute(text(statement), {"shop_id": shop_id})
+
+
+@asynccontextmanager
+async def api_client(engine: AsyncEngine):
+    """httpx client calling the app in-process, with get_db bound to `engine`."""
+    from app.core.database import get_db
+    from app.main import app
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+async def measure(run: Callable[[], Awaitable[object]], iterations: int, warmup: int = 3) -> dict[str, float]:
+    """Wall-clock milliseconds per call of `run`."""
+    for _ in range(warmup):
+        await run()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await run()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+def report(title: str, results: dict[str, dict[str, float]]) -> None:
+    print(title)
+    width = max(len(name) for name in results)
+    print(f"  {'':<{width}}  {'p50 ms':>9}  {'p95 ms':>9}  {'max ms':>9}")
+    for name, stats in results.items():
+        print(f"  {name:<{width}}  {stats['p50']:>9.2f}  {stats['p95']:>9.2f}  {stats['max']:>9.2f}")
@@ -0,0 +1,146 @@
+"""
+List endpoint encoding: Pydantic response_model path vs serializers + orjson.
+
+No database needed. Builds --rows ORM objects per endpoint (treatments with
+--photos photos each, customer list rows, portfolio items) and times what
+FastAPI does with response_model (validate, dump to JSON-mode Python, json.dumps
+as in JSONResponse) against the serializers.py + FastJSONResponse path, plus
+the body size with and without compression.
+"""
+
+import asyncio
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pydantic import TypeAdapter
+
+from app.core.responses import dumps
+from app.models.models import Portfolio, Treatment, TreatmentPhoto
+from app.schemas.schemas import CustomerListResponse, PortfolioResponse, TreatmentResponse
+from app.schemas.serializers import portfolio_to_dict, treatment_to_dict
+from benchmarks._harness import base_parser, measure, report
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def _photo(treatment_id: uuid.UUID, n: int) -> TreatmentPhoto:
+    return TreatmentPhoto(
+        id=uuid.uuid4(),
+        treatment_id=treatment_id,
+        photo_url=f"https://cdn.example.com/photos/{treatment_id}_{n}.jpg",
+        photo_type="after" if n == 0 else "before",
+        face_swapped_url=None,
+        thumbnail_url=None,
+        is_portfolio=False,
+        caption="뿌리 염색 후",
+        storage_tier="hot",
+        taken_at=NOW,
+    )
+
+
+def _treatment(n: int, photos: int) -> Treatment:
+    treatment_id = uuid.uuid4()
+    return Treatment(
+        id=treatment_id,
+        customer_id=uuid.uuid4(),
+        designer_id=uuid.uuid4(),
+        shop_id=uuid.uuid4(),
+        service_type="color",
+        service_detail="뿌리 염색",
+        products_used=[{"brand": "로레알", "code": "7.1", "area": "뿌리"}],
+        area="뿌리",
+        duration_minutes=90,
+        price=80000,
+        satisfaction="high",
+        customer_notes="만족",
+        ai_summary="7.1 뿌리 염색, 다음 방문 4주 후 권장",
+        next_visit_recommendation="4주 후",
+        created_at=NOW - timedelta(days=n),
+        photos=[_photo(treatment_id, p) for p in range(photos)],
+    )
+
+
+def _customer_row(n: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "name": f"고객{n}",
+        "phone": "010-0000-0000",
+        "visit_count": n % 20,
+        "last_visit": NOW - timedelta(days=n),
+    }
+
+
+def _portfolio(n: int) -> Portfolio:
+    photo = _photo(uuid.uuid4(), 0)
+    return Portfolio(
+        id=uuid.uuid4(),
+        shop_id=uuid.uuid4(),
+        photo_id=photo.id,
+        title=f"작품 {n}",
+        description="봄 컬러",
+        tags=["염색", "로레알"],
+        is_published=True,
+        created_at=NOW,
+        photo=photo,
+    )
+
+
+def _pydantic_path(schema):
+    adapter = TypeAdapter(list[schema])
+
+    def encode(rows) -> bytes:
+        # FastAPI's serialize_response + starlette JSONResponse.render
+        content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    return encode
+
+
+def _run(encode, rows):
+    async def run():
+        encode(rows)
+
+    return run
+
+
+async def main(args) -> None:
+    endpoints = {
+        "treatments": (
+            [_treatment(n, args.photos) for n in range(args.rows)],
+            _pydantic_path(TreatmentResponse),
+            lambda rows: dumps([treatment_to_dict(t) for t in rows]),
+        ),
+        "customers": (
+            [_customer_row(n) for n in range(args.rows)],
+            _pydantic_path(CustomerListResponse),
+            lambda rows: dumps(rows),
+        ),
+        "portfolio": (
+            [_portfolio(n) for n in range(args.rows)],
+            _pydantic_path(PortfolioResponse),
+            lambda rows: dumps([portfolio_to_dict(p) for p in rows]),
+        ),
+    }
+    for name, (rows, pydantic_encode, fast_encode) in endpoints.items():
+        body = fast_encode(rows)
+        assert json.loads(body) == json.loads(pydantic_encode(rows)), f"{name}: serializer output differs"
+        results = {
+            "response_model + json": await measure(_run(pydantic_encode, rows), args.iterations),
+            "serializers + orjson": await measure(_run(fast_encode, rows), args.iterations),
+            "serializers + orjson + gzip": await measure(
+                _run(lambda r: gzip.compress(fast_encode(r), compresslevel=5), rows), args.iterations
+            ),
+        }
+        report(
+            f"{name}: {args.rows} rows, {len(body)} bytes ({len(gzip.compress(body, compresslevel=5))} gzipped)",
+            results,
+        )
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--photos", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
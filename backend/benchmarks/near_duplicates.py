@@ -0,0 +1,79 @@
+"""
+Near-duplicate lookup at scale: multi-index HashIndex vs linear scan.
+
+No database needed. Indexes --photos random 64-bit hashes, a fraction of them
+in bursts of near-identical shots (a few flipped bits, as consecutive photos
+of one look produce), and times the build, per-query search at several
+distances and a linear Hamming scan over the same hashes.
+"""
+
+import asyncio
+import random
+import time
+import tracemalloc
+import uuid
+
+from app.services.image_hash import HashIndex, to_signed, to_unsigned
+from benchmarks._harness import base_parser, measure, report
+
+
+def make_hashes(count: int, burst_share: float, seed: int) -> list[tuple[int, uuid.UUID]]:
+    rng = random.Random(seed)
+    items = []
+    while len(items) < count:
+        value = rng.getrandbits(64)
+        items.append((to_signed(value), uuid.UUID(int=rng.getrandbits(128))))
+        if rng.random() < burst_share:
+            for _ in range(rng.randint(2, 6)):
+                flipped = value
+                for _ in range(rng.randint(1, 4)):
+                    flipped ^= 1 << rng.randrange(64)
+                items.append((to_signed(flipped), uuid.UUID(int=rng.getrandbits(128))))
+    return items[:count]
+
+
+async def main(args) -> None:
+    items = make_hashes(args.photos, args.burst_share, args.seed)
+    queries = [value for value, _ in random.Random(args.seed + 1).sample(items, args.iterations + 3)]
+    unsigned = [to_unsigned(value) for value, _ in items]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = HashIndex(items)
+    build_seconds = time.perf_counter() - started
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def searcher(max_distance: int):
+        pending = iter(queries)
+
+        async def run():
+            index.search(next(pending), max_distance)
+
+        return run
+
+    def linear(max_distance: int):
+        pending = iter(queries)
+
+        async def run():
+            query = to_unsigned(next(pending))
+            [value for value in unsigned if (value ^ query).bit_count() <= max_distance]
+
+        return run
+
+    results = {f"index, distance <= {d}": await measure(searcher(d), args.iterations) for d in args.distances}
+    results["linear scan, any distance"] = await measure(linear(args.distances[-1]), min(args.iterations, 10))
+    report(
+        f"{args.photos:,} photos: built in {build_seconds:.1f}s, index ~{index_bytes / 2**20:.0f} MiB",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__.strip().splitlines()[0])
+    parser.set_defaults(iterations=20)
+    parser.add_argument("--photos", type=int, default=1_000_000)
+    parser.add_argument("--burst-share", type=float, default=0.2)
+    parser.add_argument("--distances", type=int, nargs="+", default=[4, 6, 8, 12, 16])
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
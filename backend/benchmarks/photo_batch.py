@@ -0,0 +1,95 @@
+"""
+Photo upload: one batch request vs one request per photo.
+
+Seeds a treatment, then times uploading --photos camera-sized JPEGs with
+POST .../photos/batch against the same photos sent one by one to
+POST .../photos. Files go to a temporary upload directory. WebP/AVIF variant
+encoding is switched off (it runs after the response in both cases), so
+this measures the request path: streaming to disk, fingerprinting and the
+INSERTs.
+"""
+
+import asyncio
+import io
+import random
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.models import Customer, Treatment
+from app.services import media, photo_archive, storage
+from benchmarks._harness import api_client, base_parser, create_shop, drop_shop, make_engine, measure, report
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    """Noisy gradient - compresses like a photo, not like a flat test card."""
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    buffer = io.BytesIO()
+    Image.blend(img, noise, 0.3).save(buffer, format="JPEG", quality=88)
+    return buffer.getvalue()
+
+
+async def seed(engine, shop_id: uuid.UUID) -> uuid.UUID:
+    customer_id, treatment_id = uuid.uuid4(), uuid.uuid4()
+    async with engine.begin() as conn:
+        await conn.execute(insert(Customer), [{"id": customer_id, "shop_id": shop_id, "name": "benchmark"}])
+        await conn.execute(
+            insert(Treatment),
+            [{"id": treatment_id, "shop_id": shop_id, "customer_id": customer_id,
+              "service_type": "cut", "created_at": datetime.utcnow()}],
+        )
+    return treatment_id
+
+
+async def main(args) -> None:
+    upload_dir = Path(tempfile.mkdtemp(prefix="bench-uploads-"))
+    for module in (storage, media, photo_archive):
+        module.UPLOAD_DIR = upload_dir
+    settings.MEDIA_VARIANT_FORMATS = ""
+    photos = [make_jpeg(args.width, args.height, n) for n in range(args.photos)]
+
+    engine = make_engine(args.database_url)
+    shop_id = await create_shop(engine)
+    try:
+        treatment_id = await seed(engine, shop_id)
+        url = f"/api/shops/{shop_id}/treatments/{treatment_id}/photos"
+
+        async with api_client(engine) as client:
+
+            async def batch():
+                files = [("files", (f"{n}.jpg", content, "image/jpeg")) for n, content in enumerate(photos)]
+                response = await client.post(f"{url}/batch", files=files)
+                assert response.json()["created"] == len(photos), response.text
+
+            async def one_by_one():
+                for n, content in enumerate(photos):
+                    response = await client.post(url, files={"file": (f"{n}.jpg", content, "image/jpeg")})
+                    assert response.status_code == 200, response.text
+
+            results = {
+                f"batch x{settings.PHOTO_BATCH_CONCURRENCY}": await measure(batch, args.iterations, warmup=1),
+                "one request per photo": await measure(one_by_one, args.iterations, warmup=1),
+            }
+        size = sum(map(len, photos)) / len(photos) / 2**20
+        report(f"{args.photos} photos of {args.width}x{args.height} (~{size:.1f} MiB each)", results)
+    finally:
+        await drop_shop(engine, shop_id)
+        await engine.dispose()
+        shutil.rmtree(upload_dir)
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__.strip().splitlines()[0])
+    parser.set_defaults(iterations=5)
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--height", type=int, default=1536)
+    asyncio.run(main(parser.parse_args()))
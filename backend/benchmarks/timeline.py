@@ -0,0 +1,104 @@
+"""
+Customer profile load: full treatments+photos vs the keyset timeline.
+
+Seeds one customer with --visits treatments of --photos photos each, then
+times GET .../treatments?customer_id= (every photo of every visit, offset
+paging) against GET .../customers/{id}/timeline, for the first page and for
+a deep page near the end of the history.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models.models import Customer, Treatment, TreatmentPhoto
+from benchmarks._harness import (
+    api_client,
+    base_parser,
+    create_partitions,
+    create_shop,
+    drop_shop,
+    make_engine,
+    measure,
+    report,
+)
+
+
+async def seed(engine, shop_id: uuid.UUID, visits: int, photos: int) -> uuid.UUID:
+    customer_id = uuid.uuid4()
+    now = datetime.utcnow()
+    treatments = [
+        {
+            "id": uuid.uuid4(),
+            "shop_id": shop_id,
+            "customer_id": customer_id,
+            "service_type": "color",
+            "service_detail": "뿌리 염색",
+            "created_at": now - timedelta(days=7 * n),
+        }
+        for n in range(visits)
+    ]
+    await create_partitions(engine, treatments[-1]["created_at"])
+    async with engine.begin() as conn:
+        await conn.execute(insert(Customer), [{"id": customer_id, "shop_id": shop_id, "name": "benchmark"}])
+        await conn.execute(insert(Treatment), treatments)
+        await conn.execute(
+            insert(TreatmentPhoto),
+            [
+                {
+                    "treatment_id": t["id"],
+                    "treatment_created_at": t["created_at"],
+                    "photo_url": f"uploads/photos/{t['id']}_{p}.jpg",
+                    "photo_type": "after" if p == photos - 1 else "before",
+                    "taken_at": t["created_at"],
+                }
+                for t in treatments
+                for p in range(photos)
+            ],
+        )
+    return customer_id
+
+
+async def main(args) -> None:
+    engine = make_engine(args.database_url)
+    shop_id = await create_shop(engine)
+    try:
+        customer_id = await seed(engine, shop_id, args.visits, args.photos)
+        url = f"/api/shops/{shop_id}/customers/{customer_id}/timeline"
+        treatments_url = f"/api/shops/{shop_id}/treatments/"
+        offset_first = {"customer_id": customer_id, "limit": args.page_size}
+        offset_deep = {**offset_first, "skip": (args.visits - 1) // args.page_size * args.page_size}
+
+        async with api_client(engine) as client:
+            # Walk the cursor to find the last non-empty page
+            params = deep = {"limit": args.page_size}
+            while page := (await client.get(url, params=params)).json():
+                deep = params
+                params = {"limit": args.page_size, "before": page[-1]["created_at"], "before_id": page[-1]["id"]}
+
+            results = {
+                "treatments first page": await measure(
+                    lambda: client.get(treatments_url, params=offset_first), args.iterations
+                ),
+                "timeline first page": await measure(
+                    lambda: client.get(url, params={"limit": args.page_size}), args.iterations
+                ),
+                "treatments last page (offset)": await measure(
+                    lambda: client.get(treatments_url, params=offset_deep), args.iterations
+                ),
+                "timeline last page (keyset)": await measure(lambda: client.get(url, params=deep), args.iterations),
+            }
+        report(f"customer with {args.visits} visits x {args.photos} photos, page size {args.page_size}", results)
+    finally:
+        await drop_shop(engine, shop_id)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--visits", type=int, default=500)
+    parser.add_argument("--photos", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Voice memo transcription: one upload vs chunks transcribed concurrently.
+
+No database needed; needs ffmpeg/ffprobe. Generates a --minutes long
+recording (tone with a pause every few seconds, like speech), then times
+transcribe_audio end to end - preprocessing, splitting and transcription -
+with TRANSCRIBE_CHUNK_SECONDS disabled and at --chunk-seconds.
+
+By default the OpenAI call is simulated with a latency of --base-latency plus
+--seconds-per-minute per minute of audio sent, which is how transcription
+latency scales; pass --live to call the real API (uses OPENAI_API_KEY and
+counts against its quota).
+"""
+
+import asyncio
+import os
+import subprocess
+import tempfile
+
+from app.core.config import settings
+from app.services import openai_service
+from app.services.audio import probe_duration
+from benchmarks._harness import base_parser, measure, report
+
+
+def make_recording(minutes: float) -> str:
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    # 220 Hz tone, silent for 0.8 s out of every 6 s
+    expression = "0.5*sin(2*PI*220*t)*gt(mod(t\\,6)\\,0.8)"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"aevalsrc={expression}:s=44100:d={minutes * 60}",
+            "-ac", "2", path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def simulated_transcriber(base_latency: float, seconds_per_minute: float):
+    async def transcribe(path, shop_id, priority):
+        duration = probe_duration(path) or 0.0
+        await asyncio.sleep(base_latency + seconds_per_minute * duration / 60)
+        return "시술 메모"
+
+    return transcribe
+
+
+async def main(args) -> None:
+    if not args.live:
+        openai_service._transcribe_file = simulated_transcriber(args.base_latency, args.seconds_per_minute)
+    recording = make_recording(args.minutes)
+    try:
+
+        def transcriber(chunk_seconds: float):
+            async def run():
+                settings.TRANSCRIBE_CHUNK_SECONDS = chunk_seconds
+                await openai_service.transcribe_audio(recording)
+
+            return run
+
+        results = {
+            "single upload": await measure(transcriber(float("inf")), args.iterations, warmup=1),
+            f"{args.chunk_seconds:.0f}s chunks x{settings.TRANSCRIBE_CHUNK_CONCURRENCY}": await measure(
+                transcriber(args.chunk_seconds), args.iterations, warmup=1
+            ),
+        }
+    finally:
+        os.unlink(recording)
+    mode = "live API" if args.live else f"simulated {args.base_latency}s + {args.seconds_per_minute}s/min"
+    report(f"{args.minutes:g} min memo, {mode}", results)
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__.strip().splitlines()[0])
+    parser.set_defaults(iterations=5)
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--chunk-seconds", type=float, default=settings.TRANSCRIBE_CHUNK_SECONDS)
+    parser.add_argument("--base-latency", type=float, default=0.5)
+    parser.add_argument("--seconds-per-minute", type=float, default=2.0)
+    parser.add_argument("--live", action="store_true")
+    asyncio.run(main(parser.parse_args()))
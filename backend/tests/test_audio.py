@@ -0,0 +1,136 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services import audio
+from app.services.audio import plan_cuts, preprocess_file
+
+
+@pytest.fixture
+def memo(tmp_path):
+    path = tmp_path / "memo.webm"
+    path.write_bytes(b"\x1a" * 1000)
+    return str(path)
+
+
+class FakeFfmpeg:
+    """Stands in for subprocess.run: writes `output` to the target path, or raises `error`."""
+
+    def __init__(self, output: bytes = b"", error: Exception | None = None):
+        self.output = output
+        self.error = error
+        self.out_paths = []
+
+    def __call__(self, args, **kwargs):
+        assert args[0] == "ffmpeg"
+        self.out_paths.append(args[-1])
+        if self.error is not None:
+            raise self.error
+        with open(args[-1], "wb") as f:
+            f.write(self.output)
+        return subprocess.CompletedProcess(args, 0)
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    def install(fake: FakeFfmpeg) -> FakeFfmpeg:
+        monkeypatch.setattr(audio.shutil, "which", lambda name: f"/usr/bin/{name}")
+        monkeypatch.setattr(audio.subprocess, "run", fake)
+        monkeypatch.setattr(audio, "probe_duration", lambda path: 30.0 if path.endswith(".webm") else 20.0)
+        return fake
+
+    return install
+
+
+def test_compact_copy_replaces_the_original(memo, ffmpeg):
+    fake = ffmpeg(FakeFfmpeg(output=b"o" * 100))
+
+    result = preprocess_file(memo)
+
+    assert result.processed
+    assert result.path == fake.out_paths[0] != memo
+    assert (result.original_bytes, result.processed_bytes) == (1000, 100)
+    assert result.size_reduction == pytest.approx(0.9)
+    assert (result.original_seconds, result.processed_seconds) == (30.0, 20.0)
+
+
+def test_without_ffmpeg_the_original_passes_through(memo, monkeypatch):
+    monkeypatch.setattr(audio.shutil, "which", lambda name: None)
+
+    result = preprocess_file(memo)
+
+    assert (result.path, result.processed, result.processed_bytes) == (memo, False, 1000)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [subprocess.CalledProcessError(1, "ffmpeg"), subprocess.TimeoutExpired("ffmpeg", 300), OSError("no exec")],
+)
+def test_ffmpeg_error_passes_the_original_through(memo, ffmpeg, error):
+    fake = ffmpeg(FakeFfmpeg(error=error))
+
+    result = preprocess_file(memo)
+
+    assert (result.path, result.processed) == (memo, False)
+    assert not os.path.exists(fake.out_paths[0])  # temp output cleaned up
+
+
+@pytest.mark.parametrize("output", [b"", b"o" * 1000, b"o" * 2000])
+def test_empty_or_larger_output_is_discarded(memo, ffmpeg, output):
+    fake = ffmpeg(FakeFfmpeg(output=output))
+
+    result = preprocess_file(memo)
+
+    assert (result.path, result.processed) == (memo, False)
+    assert not os.path.exists(fake.out_paths[0])
+
+
+def _chunks(duration: float, cuts: list[float]) -> list[float]:
+    bounds = [0.0, *cuts, duration]
+    return [end - start for start, end in zip(bounds, bounds[1:])]
+
+
+def test_short_memo_is_not_cut():
+    assert plan_cuts(80.0, [20.0, 40.0], max_chunk=100.0) == []
+    assert plan_cuts(100.0, [], max_chunk=100.0) == []
+
+
+def test_no_silence_falls_back_to_hard_cuts():
+    assert plan_cuts(250.0, [], max_chunk=100.0) == [100.0, 200.0]
+
+
+def test_cuts_at_the_latest_pause_in_the_second_half_of_each_window():
+    # 95 beats 70 (later); 150 is the only pause in (145, 195]
+    assert plan_cuts(250.0, [30.0, 70.0, 95.0, 150.0], max_chunk=100.0) == [95.0, 150.0]
+
+
+def test_pauses_early_in_a_window_are_not_used():
+    # Cutting at 20 would leave a 130s remainder to split again
+    assert plan_cuts(150.0, [20.0], max_chunk=100.0) == [100.0]
+
+
+def test_pause_past_the_window_is_not_used():
+    # A cut at 120 would make a chunk longer than the maximum
+    assert plan_cuts(150.0, [120.0], max_chunk=100.0) == [100.0]
+
+
+@pytest.mark.parametrize(
+    "duration, silences",
+    [
+        (1000.0, []),
+        (1000.0, [51.0, 140.0, 260.0, 270.0, 555.0, 901.0]),
+        (1000.0, [float(t) for t in range(7, 1000, 13)]),
+        (200.0, [100.0]),  # last chunk lands exactly on the maximum
+        (200.1, [99.9]),
+    ],
+)
+def test_no_chunk_exceeds_the_maximum(duration, silences):
+    chunks = _chunks(duration, plan_cuts(duration, silences, max_chunk=100.0))
+    assert all(0 < length <= 100.0 for length in chunks)
+    assert sum(chunks) == pytest.approx(duration)
+
+
+def test_last_chunk_keeps_the_remainder():
+    cuts = plan_cuts(230.0, [], max_chunk=100.0)
+    assert _chunks(230.0, cuts) == [100.0, 100.0, 30.0]
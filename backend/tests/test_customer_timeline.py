@@ -0,0 +1,127 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models.models import Treatment, TreatmentPhoto
+
+
+async def _add_treatments(db, customer, created_at: list[datetime]) -> list[uuid.UUID]:
+    ids = [uuid.uuid4() for _ in created_at]
+    await db.execute(
+        insert(Treatment),
+        [
+            {"id": i, "shop_id": customer.shop_id, "customer_id": customer.id, "service_type": "cut", "created_at": ts}
+            for i, ts in zip(ids, created_at)
+        ],
+    )
+    await db.commit()
+    return ids
+
+
+async def test_keyset_pages_cover_ties_exactly_once(client, db, customer):
+    base = datetime(2026, 10, 1, 12, 0)
+    # Five visits share one timestamp, so a created_at-only cursor would skip some
+    stamps = [base] * 5 + [base - timedelta(days=d) for d in range(1, 6)]
+    ids = await _add_treatments(db, customer, stamps)
+    url = f"/api/shops/{customer.shop_id}/customers/{customer.id}/timeline"
+
+    seen, params = [], {"limit": 3}
+    while True:
+        page = (await client.get(url, params=params)).json()
+        if not page:
+            break
+        seen += page
+        params = {"limit": 3, "before": page[-1]["created_at"], "before_id": page[-1]["id"]}
+
+    assert sorted(item["id"] for item in seen) == sorted(str(i) for i in ids)
+    keys = [(item["created_at"], item["id"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_unknown_customer_is_404(client, shop):
+    response = await client.get(f"/api/shops/{shop.id}/customers/{uuid.uuid4()}/timeline")
+    assert response.status_code == 404
+
+
+async def test_other_shops_customer_is_404(client, customer):
+    response = await client.get(f"/api/shops/{uuid.uuid4()}/customers/{customer.id}/timeline")
+    assert response.status_code == 404
+
+
+async def test_cover_is_versioned_media_url(client, db, customer, upload_dir):
+    created_at = datetime(2026, 10, 1, 12, 0)
+    (treatment_id,) = await _add_treatments(db, customer, [created_at])
+    (upload_dir / "photos").mkdir()
+    (upload_dir / "photos" / "after.jpg").write_bytes(b"jpeg")
+    await db.execute(
+        insert(TreatmentPhoto),
+        [
+            {
+                "treatment_id": treatment_id,
+                "treatment_created_at": created_at,
+                "photo_url": "uploads/photos/after.jpg",
+                "photo_type": "after",
+            },
+            {
+                "treatment_id": treatment_id,
+                "treatment_created_at": created_at,
+                "photo_url": "https://cdn.example.com/before.jpg",
+                "photo_type": "before",
+            },
+        ],
+    )
+    await db.commit()
+
+    (item,) = (await client.get(f"/api/shops/{customer.shop_id}/customers/{customer.id}/timeline")).json()
+    assert item["photo_count"] == 2
+    assert item["cover_photo_url"].startswith("/media/")
+    assert item["cover_photo_url"].endswith("/photos/after.jpg")
+
+
+async def test_before_accepts_utc_z_suffix(client, db, customer):
+    base = datetime(2026, 10, 1, 12, 0)
+    ids = await _add_treatments(db, customer, [base, base - timedelta(days=1)])
+    url = f"/api/shops/{customer.shop_id}/customers/{customer.id}/timeline"
+
+    response = await client.get(url, params={"before": "2026-10-01T12:00:00Z"})
+    assert response.status_code == 200, response.text
+    assert [item["id"] for item in response.json()] == [str(ids[1])]
+
+    # 21:00 KST is 12:00 UTC: the cursor row itself is excluded
+    response = await client.get(url, params={"before": "2026-10-01T21:00:00+09:00", "before_id": str(ids[0])})
+    assert [item["id"] for item in response.json()] == [str(ids[1])]
+
+
+async def test_treatment_photo_page(client, db, customer):
+    created_at = datetime(2026, 10, 1, 12, 0)
+    (treatment_id,) = await _add_treatments(db, customer, [created_at])
+    await db.execute(
+        insert(TreatmentPhoto),
+        [
+            {"treatment_id": treatment_id, "treatment_created_at": created_at, "photo_type": "after",
+             "photo_url": f"https://cdn.example.com/{n}.jpg", "taken_at": created_at + timedelta(minutes=n)}
+            for n in range(3)
+        ],
+    )
+    await db.commit()
+    url = f"/api/shops/{customer.shop_id}/treatments/{treatment_id}/photos"
+
+    page = (await client.get(url, params={"limit": 2})).json()
+    assert [p["photo_url"] for p in page] == ["https://cdn.example.com/2.jpg", "https://cdn.example.com/1.jpg"]
+
+    assert (await client.get(f"/api/shops/{uuid.uuid4()}/treatments/{treatment_id}/photos")).status_code == 404
+
+
+async def test_treatment_list_range_accepts_utc_z_suffix(client, db, customer):
+    base = datetime(2026, 10, 1, 12, 0)
+    ids = await _add_treatments(db, customer, [base - timedelta(days=d) for d in range(3)])
+
+    # The format the list endpoints emit (orjson OPT_UTC_Z)
+    response = await client.get(
+        f"/api/shops/{customer.shop_id}/treatments/",
+        params={"created_after": "2026-09-30T00:00:00Z", "created_before": "2026-10-01T12:00:00Z"},
+    )
+
+    assert response.status_code == 200, response.text
+    assert [item["id"] for item in response.json()] == [str(ids[1])]
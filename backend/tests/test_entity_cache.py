@@ -0,0 +1,118 @@
+import asyncio
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.models.models import Treatment, TreatmentPhoto
+from app.services import entity_cache
+
+
+async def test_snapshot_datetimes_are_naive_utc(db, customer):
+    treatment_id = uuid.uuid4()
+    created_at = datetime(2026, 10, 1, 12, 0)
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at}],
+    )
+    await db.commit()
+
+    treatment = await entity_cache.get_treatment(db, customer.shop_id, treatment_id)
+
+    # Bound straight back into naive DateTime columns (e.g. treatment_created_at)
+    assert treatment.created_at == created_at
+
+
+@pytest.fixture
+async def listener(database_url, engine, monkeypatch):
+    """A listener on the test database; the global cache is restored afterwards."""
+    monkeypatch.setattr(entity_cache.cache, "enabled", False)
+    listener = entity_cache.InvalidationListener(
+        database_url.set(drivername="postgresql").render_as_string(hide_password=False),
+        retry_seconds=0.05,
+        keepalive_seconds=0.05,
+        keepalive_timeout=0.5,
+    )
+    listener.start()
+    yield listener
+    await listener.stop()
+    entity_cache.cache.clear()
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def test_treatment_update_invalidates_cached_row(listener, db, customer):
+    await wait_for(lambda: entity_cache.cache.enabled)
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": datetime(2026, 10, 1, 12, 0)}],
+    )
+    await db.commit()
+    assert (await entity_cache.get_treatment(db, customer.shop_id, treatment_id)).service_type == "cut"
+
+    # Written outside the API: only the NOTIFY (sent with the partition root's name) drops the entry
+    await db.execute(update(Treatment).where(Treatment.id == treatment_id).values(service_type="perm"))
+    await db.commit()
+    await wait_for(lambda: entity_cache.cache.get(entity_cache.TREATMENT, treatment_id) is None)
+
+    assert (await entity_cache.get_treatment(db, customer.shop_id, treatment_id)).service_type == "perm"
+
+
+async def test_photo_upload_keeps_its_treatment_cached(listener, db, customer):
+    await wait_for(lambda: entity_cache.cache.enabled)
+    created_at = datetime(2026, 10, 1, 12, 0)
+    treatment_id, sentinel_id = uuid.uuid4(), uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": i, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at} for i in (treatment_id, sentinel_id)],
+    )
+    await db.commit()
+    for i in (treatment_id, sentinel_id):
+        await entity_cache.get_treatment(db, customer.shop_id, i)
+
+    # Touches only the treatment's updated_at (migration 014)
+    await db.execute(
+        insert(TreatmentPhoto),
+        [{"id": uuid.uuid4(), "treatment_id": treatment_id, "treatment_created_at": created_at,
+          "photo_url": "uploads/photos/a.jpg", "photo_type": "after"}],
+    )
+    await db.commit()
+    # Notifications arrive in commit order: once the sentinel is gone, any for the upload would have been seen
+    await db.execute(update(Treatment).where(Treatment.id == sentinel_id).values(service_type="perm"))
+    await db.commit()
+    await wait_for(lambda: entity_cache.cache.get(entity_cache.TREATMENT, sentinel_id) is None)
+
+    assert entity_cache.cache.get(entity_cache.TREATMENT, treatment_id) is not None
+
+
+async def test_failed_keepalive_disables_cache_and_reconnects(listener, monkeypatch, customer):
+    await wait_for(lambda: entity_cache.cache.enabled)
+    hung = asyncio.Event()
+    ping = entity_cache.InvalidationListener._ping
+
+    async def dead_link(self, conn):
+        if not hung.is_set():
+            hung.set()
+            # A dropped link never answers; the timeout, not a socket error, notices
+            await asyncio.wait_for(asyncio.Event().wait(), self.keepalive_timeout)
+        await ping(self, conn)
+
+    monkeypatch.setattr(entity_cache.InvalidationListener, "_ping", dead_link)
+    entity_cache.cache.put(entity_cache.CUSTOMER, customer.id, customer.shop_id, SimpleNamespace(),
+                           entity_cache.cache.generation)
+
+    await wait_for(lambda: hung.is_set() and not entity_cache.cache.enabled)
+    assert entity_cache.cache.get(entity_cache.CUSTOMER, customer.id) is None
+
+    await wait_for(lambda: entity_cache.cache.enabled)
+    assert listener.stats()["reconnects"] == 1
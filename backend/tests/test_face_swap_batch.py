@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, text, update
+
+from app.models.models import FaceSwapBatch, FaceSwapBatchItem, Shop, Treatment, TreatmentPhoto
+from app.services import face_swap_batch
+
+
+class FakeAkool:
+    def __init__(self, fail: set[str] = frozenset()):
+        self.fail = fail
+        self.calls: list[str] = []
+
+    async def __call__(self, source_url, target_url, **kwargs):
+        self.calls.append(target_url)
+        await asyncio.sleep(0.01)
+        if target_url in self.fail:
+            raise RuntimeError("akool says no")
+        return {"data": {"_id": f"job-{target_url}"}}
+
+
+@pytest.fixture
+def akool(monkeypatch, session_factory):
+    monkeypatch.setattr(face_swap_batch, "async_session", session_factory)
+    fake = FakeAkool()
+    monkeypatch.setattr(face_swap_batch, "face_swap", fake)
+    return fake
+
+
+async def _photos(db, customer, count: int) -> list[uuid.UUID]:
+    created_at = datetime(2026, 10, 1, 12, 0)
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at}],
+    )
+    ids = [uuid.uuid4() for _ in range(count)]
+    await db.execute(
+        insert(TreatmentPhoto),
+        [
+            {"id": i, "treatment_id": treatment_id, "treatment_created_at": created_at,
+             "photo_url": f"https://cdn.example.com/{n}.jpg", "photo_type": "after"}
+            for n, i in enumerate(ids)
+        ],
+    )
+    await db.commit()
+    return ids
+
+
+async def _batch(db, customer, targets: int) -> FaceSwapBatch:
+    source, *target_ids = await _photos(db, customer, targets + 1)
+    batch = FaceSwapBatch(
+        shop_id=customer.shop_id,
+        source_photo_id=source,
+        items=[FaceSwapBatchItem(target_photo_id=pid, status="pending") for pid in target_ids],
+    )
+    db.add(batch)
+    await db.commit()
+    return batch
+
+
+async def _statuses(db, batch) -> dict[uuid.UUID, str]:
+    result = await db.execute(
+        select(FaceSwapBatchItem.id, FaceSwapBatchItem.status).where(FaceSwapBatchItem.batch_id == batch.id)
+    )
+    return dict(result.all())
+
+
+async def test_concurrent_runners_submit_each_item_once(db, customer, akool):
+    batch = await _batch(db, customer, targets=10)
+
+    await asyncio.gather(*(face_swap_batch.run_batch(batch.id) for _ in range(3)))
+
+    assert len(akool.calls) == 10
+    assert len(set(akool.calls)) == 10
+    assert set((await _statuses(db, batch)).values()) == {"submitted"}
+
+
+async def test_in_flight_items_are_reclaimed_only_after_timeout(db, customer, akool):
+    batch = await _batch(db, customer, targets=2)
+    fresh, stale = (item.id for item in batch.items)
+    await db.execute(update(FaceSwapBatchItem).values(status="in_flight"))
+    await db.execute(
+        update(FaceSwapBatchItem)
+        .where(FaceSwapBatchItem.id == stale)
+        .values(updated_at=text("now() - interval '1 hour'"))
+    )
+    await db.commit()
+
+    await face_swap_batch.run_batch(batch.id)
+
+    assert await _statuses(db, batch) == {fresh: "in_flight", stale: "submitted"}
+
+
+async def test_resume_resubmits_only_failed_items(client, db, customer, akool):
+    batch = await _batch(db, customer, targets=3)
+    akool.fail = {"https://cdn.example.com/1.jpg"}
+    await face_swap_batch.run_batch(batch.id)
+    assert sorted((await _statuses(db, batch)).values()) == ["failed", "submitted", "submitted"]
+
+    akool.fail = set()
+    akool.calls.clear()
+    response = await client.post(f"/api/face-swap/batch/{batch.id}/resume")
+    assert response.status_code == 200
+    await asyncio.gather(*face_swap_batch._running)
+
+    assert akool.calls == ["https://cdn.example.com/1.jpg"]
+    assert set((await _statuses(db, batch)).values()) == {"submitted"}
+
+
+async def test_source_photo_from_another_shop_is_rejected(client, db, customer, akool):
+    other_shop = Shop(name="다른샵", shop_type="hair")
+    db.add(other_shop)
+    await db.commit()
+    source_customer_id = uuid.uuid4()
+    await db.execute(
+        text("insert into customers (id, shop_id, name) values (:id, :shop, '다른고객')"),
+        {"id": source_customer_id, "shop": other_shop.id},
+    )
+    await db.commit()
+    (source,) = await _photos(db, type("C", (), {"id": source_customer_id, "shop_id": other_shop.id}), 1)
+    targets = await _photos(db, customer, 2)
+
+    response = await client.post(
+        "/api/face-swap/batch",
+        json={"source_photo_id": str(source), "target_photo_ids": [str(t) for t in targets]},
+    )
+
+    assert response.status_code == 400
+    assert not akool.calls
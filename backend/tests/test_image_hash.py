@@ -0,0 +1,78 @@
+import random
+import uuid
+
+import pytest
+from PIL import Image
+
+from app.services import image_hash
+from app.services.entity_cache import PHOTO, InvalidationListener
+from app.services.image_hash import HashIndex, ShopHashIndex, fingerprint_file, hamming, shop_index
+
+
+def test_fingerprint_of_near_identical_images(tmp_path):
+    img = Image.radial_gradient("L").convert("RGB")
+    img.save(tmp_path / "a.jpg", quality=95)
+    img.resize((200, 200)).save(tmp_path / "b.png")
+    (a, sharp_a), (b, _) = fingerprint_file(str(tmp_path / "a.jpg")), fingerprint_file(str(tmp_path / "b.png"))
+    assert hamming(a, b) <= image_hash.DEFAULT_MAX_DISTANCE
+    assert sharp_a > 0
+
+
+def test_fingerprint_rejects_undecodable_files(tmp_path, monkeypatch):
+    (tmp_path / "garbage.jpg").write_bytes(b"not an image")
+    assert fingerprint_file(str(tmp_path / "garbage.jpg")) is None
+
+    Image.new("RGB", (100, 100)).save(tmp_path / "bomb.png")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)  # 10k pixels > 2x limit
+    assert fingerprint_file(str(tmp_path / "bomb.png")) is None
+
+
+def test_fingerprint_rejects_value_errors(tmp_path, monkeypatch):
+    Image.new("RGB", (64, 64)).save(tmp_path / "ok.png")
+
+    def broken(img):
+        raise ValueError("unsupported mode")
+
+    monkeypatch.setattr(image_hash, "_phash", broken)
+    assert fingerprint_file(str(tmp_path / "ok.png")) is None
+
+
+@pytest.mark.parametrize("size", [50, 20_000])  # scan fallback and block probing
+@pytest.mark.parametrize("max_distance", [0, 3, 6, 9])
+def test_hash_index_matches_linear_scan(size, max_distance):
+    rng = random.Random(7)
+    items = [(image_hash.to_signed(rng.getrandbits(64)), uuid.uuid4()) for _ in range(size)]
+    # Near-duplicates of the first hashes, up to 9 bits apart
+    for value, _ in items[:20]:
+        flipped = image_hash.to_unsigned(value)
+        for bit in rng.sample(range(64), rng.randint(1, 9)):
+            flipped ^= 1 << bit
+        items.append((image_hash.to_signed(flipped), uuid.uuid4()))
+    index = HashIndex(items)
+    for query, _ in items[:20]:
+        expected = sorted((i, hamming(query, v)) for v, i in items if hamming(query, v) <= max_distance)
+        found = index.search(query, max_distance)
+        assert sorted(found) == expected
+        assert [d for _, d in found] == sorted(d for _, d in found)
+    assert index.size == len(items)
+
+
+def test_invalidate_photo_drops_only_the_index_holding_it():
+    index = ShopHashIndex()
+    moved, other = uuid.uuid4(), uuid.uuid4()
+    shop_a, shop_b = uuid.uuid4(), uuid.uuid4()
+    index.put(shop_a, HashIndex([(1, moved)]))
+    index.put(shop_b, HashIndex([(1, other)]))
+    index.invalidate_photo(moved)
+    assert index.get(shop_a) is None
+    assert index.get(shop_b) is not None
+
+
+def test_photo_notification_invalidates_cached_index():
+    photo_id, shop_id = uuid.uuid4(), uuid.uuid4()
+    shop_index.put(shop_id, HashIndex([(1, photo_id)]))
+    try:
+        InvalidationListener("postgresql://unused")._on_notify(None, 0, "entity_cache", f"{PHOTO}:{photo_id}")
+        assert shop_index.get(shop_id) is None
+    finally:
+        shop_index.clear()
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from app.services import media
+from app.services.media import media_url_for, negotiate_variant, parse_accept, variant_path
+
+
+@pytest.fixture
+def photo(upload_dir, monkeypatch):
+    monkeypatch.setattr(media, "enabled_variant_formats", lambda: ["avif", "webp"])
+    original = upload_dir / "photos" / "a.jpg"
+    original.parent.mkdir()
+    original.write_bytes(b"jpeg")
+    for fmt in ("avif", "webp"):
+        variant_path(original, fmt).write_bytes(b"x")
+    return original
+
+
+def test_parse_accept_q_values():
+    ranges = parse_accept("image/avif;q=0, image/webp;q=0.8 ,image/*;q=0.5, */*, bad;q=x")
+    assert ranges == {"image/avif": 0.0, "image/webp": 0.8, "image/*": 0.5, "*/*": 1.0, "bad": 0.0}
+
+
+def test_negotiate_prefers_configured_order_on_tie(photo):
+    served, mime = negotiate_variant(photo, "image/avif,image/webp,*/*")
+    assert mime == "image/avif"
+    assert served == variant_path(photo, "avif")
+
+
+def test_negotiate_respects_q_zero(photo):
+    served, mime = negotiate_variant(photo, "image/avif;q=0, image/webp, */*;q=0.8")
+    assert mime == "image/webp"
+
+
+def test_negotiate_highest_q_wins(photo):
+    _, mime = negotiate_variant(photo, "image/avif;q=0.5, image/webp;q=0.9")
+    assert mime == "image/webp"
+
+
+def test_negotiate_ignores_wildcards_and_substrings(photo):
+    assert negotiate_variant(photo, "*/*, image/*") == (photo, None)
+    assert negotiate_variant(photo, "image/webpx") == (photo, None)
+
+
+def test_media_url_changes_when_file_is_replaced(photo):
+    first = media_url_for(str(photo))
+    assert first.startswith("/media/") and first.endswith("/photos/a.jpg")
+    stat = photo.stat()
+    os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert media_url_for(str(photo)) != first
+
+
+def test_media_url_skips_remote_and_missing(upload_dir):
+    assert media_url_for("https://cdn.example.com/a.jpg") is None
+    assert media_url_for("uploads/photos/missing.jpg") is None
+
+
+async def test_serve_media_negotiates_and_revalidates(client, photo):
+    url = media_url_for(str(photo))
+    response = await client.get(url, headers={"Accept": "image/avif;q=0, image/webp"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    assert "immutable" in response.headers["cache-control"]
+
+    again = await client.get(
+        url, headers={"Accept": "image/webp", "If-None-Match": response.headers["etag"]}
+    )
+    assert again.status_code == 304
+
+    stale = await client.get("/media/0000000000000000/photos/a.jpg", follow_redirects=False)
+    assert stale.status_code == 307
+    assert stale.headers["location"] == url
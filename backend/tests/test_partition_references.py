@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.models import FaceSwapBatch, FaceSwapBatchItem, Portfolio, RevisitDue, Treatment, TreatmentPhoto
+
+
+async def _treatment(db, customer, created_at: datetime) -> uuid.UUID:
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at}],
+    )
+    return treatment_id
+
+
+@pytest.fixture
+async def photo(db, customer) -> tuple[uuid.UUID, uuid.UUID]:
+    """(treatment_id, photo_id) in the 2025-03 partitions"""
+    created_at = datetime(2025, 3, 1, 12, 0)
+    treatment_id, photo_id = await _treatment(db, customer, created_at), uuid.uuid4()
+    await db.execute(
+        insert(TreatmentPhoto),
+        [{"id": photo_id, "treatment_id": treatment_id, "treatment_created_at": created_at,
+          "photo_url": "uploads/photos/a.jpg", "photo_type": "after"}],
+    )
+    await db.commit()
+    return treatment_id, photo_id
+
+
+@pytest.mark.parametrize("make", [
+    lambda shop_id, photo_id: Portfolio(shop_id=shop_id, photo_id=photo_id),
+    lambda shop_id, photo_id: FaceSwapBatch(shop_id=shop_id, source_photo_id=photo_id),
+])
+async def test_reference_to_missing_photo_is_rejected(db, customer, make):
+    db.add(make(customer.shop_id, uuid.uuid4()))
+
+    with pytest.raises(IntegrityError):
+        await db.commit()
+
+
+async def test_referenced_photo_cannot_be_deleted(db, customer, photo):
+    batch = FaceSwapBatch(shop_id=customer.shop_id, source_photo_id=photo[1])
+    db.add(batch)
+    await db.flush()
+    db.add(FaceSwapBatchItem(batch_id=batch.id, target_photo_id=photo[1]))
+    await db.commit()
+
+    with pytest.raises(IntegrityError):
+        await db.execute(delete(TreatmentPhoto).where(TreatmentPhoto.id == photo[1]))
+    await db.rollback()
+
+    # Nor through the cascade from its treatment
+    with pytest.raises(IntegrityError):
+        await db.execute(delete(Treatment).where(Treatment.id == photo[0]))
+    await db.rollback()
+    assert await db.scalar(select(TreatmentPhoto.id).where(TreatmentPhoto.id == photo[1])) == photo[1]
+
+
+async def test_referenced_photo_can_move_to_another_partition(db, customer, photo):
+    db.add(Portfolio(shop_id=customer.shop_id, photo_id=photo[1]))
+    await db.commit()
+    created_at = datetime(2025, 9, 1, 12, 0)
+    treatment_id = await _treatment(db, customer, created_at)
+
+    await db.execute(
+        update(TreatmentPhoto)
+        .where(TreatmentPhoto.id == photo[1])
+        .values(treatment_id=treatment_id, treatment_created_at=created_at)
+    )
+    await db.commit()
+
+    assert await db.scalar(select(TreatmentPhoto.treatment_id).where(TreatmentPhoto.id == photo[1])) == treatment_id
+
+
+async def test_deleting_a_treatment_clears_revisit_due(db, customer, photo):
+    await db.execute(delete(TreatmentPhoto).where(TreatmentPhoto.id == photo[1]))
+    db.add(RevisitDue(customer_id=customer.id, shop_id=customer.shop_id, treatment_id=photo[0],
+                      last_visit=datetime(2025, 3, 1), interval_days=30, due_at=datetime(2025, 3, 31)))
+    await db.commit()
+
+    await db.execute(delete(Treatment).where(Treatment.id == photo[0]))
+    await db.commit()
+
+    assert await db.scalar(select(RevisitDue.treatment_id).where(RevisitDue.customer_id == customer.id)) is None
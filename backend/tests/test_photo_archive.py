@@ -0,0 +1,148 @@
+import asyncio
+import io
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from sqlalchemy import insert, select, text
+
+from app.models.models import Treatment, TreatmentPhoto
+from app.services import media, photo_archive
+from app.services.media import variant_path
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").convert("RGB").resize((640, 480)).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class FakeS3:
+    """upload_file/download_file against a dict; `fail` names originals whose upload raises."""
+
+    def __init__(self, on_upload=None):
+        self.objects: dict[str, bytes] = {}
+        self.fail: set[str] = set()
+        self.on_upload = on_upload
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None):
+        if self.on_upload:
+            self.on_upload()
+        if Path(filename).name in self.fail:
+            raise OSError("s3 unavailable")
+        self.objects[key] = Path(filename).read_bytes()
+
+    def download_file(self, bucket, key, filename):
+        Path(filename).write_bytes(self.objects[key])
+
+
+@pytest.fixture
+def s3(monkeypatch, session_factory, upload_dir):
+    monkeypatch.setattr(photo_archive, "async_session", session_factory)
+    monkeypatch.setattr(media, "enabled_variant_formats", lambda: ["webp"])
+    fake = FakeS3()
+    monkeypatch.setattr(photo_archive, "_get_s3", lambda: fake)
+    return fake
+
+
+async def _old_photos(db, customer, upload_dir, names: list[str]) -> list[uuid.UUID]:
+    created_at = datetime(2025, 2, 1, 12, 0)
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at}],
+    )
+    (upload_dir / "photos").mkdir(exist_ok=True)
+    ids = [uuid.uuid4() for _ in names]
+    for name in names:
+        (upload_dir / "photos" / name).write_bytes(_jpeg())
+    await db.execute(
+        insert(TreatmentPhoto),
+        [
+            {"id": i, "treatment_id": treatment_id, "treatment_created_at": created_at,
+             "photo_url": f"uploads/photos/{name}", "photo_type": "after"}
+            for i, name in zip(ids, names)
+        ],
+    )
+    await db.commit()
+    return ids
+
+
+async def test_no_transaction_is_open_during_uploads(engine, db, customer, upload_dir, s3):
+    await _old_photos(db, customer, upload_dir, ["a.jpg", "b.jpg", "c.jpg"])
+    loop = asyncio.get_running_loop()
+    open_transactions = []
+
+    async def count_open():
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() "
+                    "AND backend_type = 'client backend' AND pid <> pg_backend_pid() AND xact_start IS NOT NULL"
+                )
+            )
+            return result.scalar()
+
+    s3.on_upload = lambda: open_transactions.append(asyncio.run_coroutine_threadsafe(count_open(), loop).result())
+    stats = await photo_archive.run_archive(older_than_months=1, batch_size=2)
+
+    assert stats["archived"] == 3
+    assert open_transactions == [0, 0, 0]
+
+
+async def test_failed_upload_keeps_photo_hot_and_others_committed(db, customer, upload_dir, s3):
+    ok, broken = await _old_photos(db, customer, upload_dir, ["ok.jpg", "broken.jpg"])
+    s3.fail = {"broken.jpg"}
+
+    stats = await photo_archive.run_archive(older_than_months=1)
+
+    assert (stats["archived"], stats["failed"]) == (1, 1)
+    tiers = dict((await db.execute(select(TreatmentPhoto.id, TreatmentPhoto.storage_tier))).all())
+    assert tiers == {ok: "cold", broken: "hot"}
+    assert not (upload_dir / "photos" / "ok.jpg").exists()
+    assert (upload_dir / "photos" / "ok_thumb.webp").is_file()
+    assert (upload_dir / "photos" / "broken.jpg").is_file()
+
+
+async def test_restore_rebuilds_variants(db, customer, upload_dir, s3):
+    (photo_id,) = await _old_photos(db, customer, upload_dir, ["a.jpg"])
+    await photo_archive.run_archive(older_than_months=1)
+    original = upload_dir / "photos" / "a.jpg"
+    assert not original.exists()
+
+    photo = await db.scalar(
+        select(TreatmentPhoto).where(TreatmentPhoto.id == photo_id).execution_options(populate_existing=True)
+    )
+    photo = await photo_archive.restore_photo(db, photo)
+
+    assert photo.storage_tier == "hot"
+    assert original.is_file()
+    assert variant_path(original, "webp").is_file()
+
+
+
+async def test_restored_photo_is_archived_again_without_upload(db, customer, upload_dir, s3):
+    (photo_id,) = await _old_photos(db, customer, upload_dir, ["a.jpg"])
+    uploads = []
+    s3.on_upload = lambda: uploads.append(1)
+    await photo_archive.run_archive(older_than_months=1)
+    photo = await db.scalar(
+        select(TreatmentPhoto).where(TreatmentPhoto.id == photo_id).execution_options(populate_existing=True)
+    )
+    await photo_archive.restore_photo(db, photo)
+    original = upload_dir / "photos" / "a.jpg"
+    assert original.is_file()
+
+    stats = await photo_archive.run_archive(older_than_months=1)
+
+    assert stats["archived"] == 1
+    assert len(uploads) == 1  # the cold copy from the first run is reused
+    assert not original.exists()
+    assert not variant_path(original, "webp").exists()
+    photo = await db.scalar(
+        select(TreatmentPhoto).where(TreatmentPhoto.id == photo_id).execution_options(populate_existing=True)
+    )
+    assert (photo.storage_tier, photo.cold_key) == ("cold", "cold/photos/a.jpg")
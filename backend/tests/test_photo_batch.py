@@ -0,0 +1,89 @@
+import io
+import uuid
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from sqlalchemy import func, insert, select
+
+from app.api import treatments
+from app.core.config import settings
+from app.models.models import Treatment, TreatmentPhoto
+
+
+def _jpeg(size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+async def treatment(db, customer):
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": datetime(2026, 10, 1, 12, 0)}],
+    )
+    await db.commit()
+    return customer.shop_id, treatment_id
+
+
+def _originals(upload_dir) -> list:
+    return sorted(p.name for p in (upload_dir / "photos").glob("*.jpg")) if (upload_dir / "photos").exists() else []
+
+
+async def _upload(client, treatment, files, **form):
+    shop_id, treatment_id = treatment
+    return await client.post(
+        f"/api/shops/{shop_id}/treatments/{treatment_id}/photos/batch",
+        files=[("files", (name, content, "image/jpeg")) for name, content in files],
+        data=form,
+    )
+
+
+async def _photo_count(db) -> int:
+    count = await db.scalar(select(func.count()).select_from(TreatmentPhoto))
+    await db.commit()
+    return count
+
+
+async def test_oversized_file_fails_alone(client, db, treatment, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10_000)
+    response = await _upload(
+        client, treatment, [("a.jpg", _jpeg()), ("huge.jpg", b"\xff" * 20_000), ("b.jpg", _jpeg())]
+    )
+
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [r["status"] for r in body["results"]] == ["created", "failed", "created"]
+    assert len(_originals(upload_dir)) == 2
+    assert await _photo_count(db) == 2
+
+
+async def test_failed_insert_deletes_saved_files(client, db, treatment, upload_dir):
+    # photo_type is checked by the database (migration 007), after the files are on disk
+    with pytest.raises(Exception):
+        await _upload(client, treatment, [("a.jpg", _jpeg()), ("b.jpg", _jpeg())], photo_types=["after", "sideways"])
+
+    assert _originals(upload_dir) == []
+    assert await _photo_count(db) == 0
+
+
+async def test_unexpected_error_deletes_saved_files(client, db, treatment, upload_dir, monkeypatch):
+    real_fingerprint = treatments.fingerprint
+    calls = 0
+
+    async def flaky_fingerprint(path):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("decoder crashed")
+        return await real_fingerprint(path)
+
+    monkeypatch.setattr(treatments, "fingerprint", flaky_fingerprint)
+    with pytest.raises(RuntimeError):
+        await _upload(client, treatment, [("a.jpg", _jpeg()), ("b.jpg", _jpeg()), ("c.jpg", _jpeg())])
+
+    assert _originals(upload_dir) == []
+    assert await _photo_count(db) == 0
@@ -0,0 +1,110 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.models.models import Customer, Shop, Treatment, TreatmentPhoto
+
+
+async def _add_photo(db, shop_id, customer_id) -> tuple[uuid.UUID, uuid.UUID]:
+    """An already-uploaded photo, attached to a placeholder treatment of the shop."""
+    treatment_id, photo_id = uuid.uuid4(), uuid.uuid4()
+    created_at = datetime(2026, 9, 1, 12, 0)
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": shop_id, "customer_id": customer_id,
+          "service_type": "draft", "created_at": created_at}],
+    )
+    await db.execute(
+        insert(TreatmentPhoto),
+        [{"id": photo_id, "treatment_id": treatment_id, "treatment_created_at": created_at,
+          "photo_url": "uploads/photos/a.jpg", "photo_type": "after"}],
+    )
+    await db.commit()
+    return treatment_id, photo_id
+
+
+async def _state(db, customer) -> tuple[int, int]:
+    """(customer's visit_count, number of non-draft treatments)"""
+    visits = await db.scalar(select(Customer.visit_count).where(Customer.id == customer.id))
+    treatments = await db.scalar(
+        select(func.count()).select_from(Treatment).where(Treatment.service_type != "draft")
+    )
+    await db.commit()
+    return visits, treatments
+
+
+@pytest.fixture
+async def photo(db, customer):
+    return await _add_photo(db, customer.shop_id, customer.id)
+
+
+async def test_creates_treatment_and_reparents_photos(client, db, customer, photo):
+    draft_id, photo_id = photo
+    before = await _state(db, customer)
+
+    response = await client.post(
+        f"/api/shops/{customer.shop_id}/treatments/quick",
+        json={"customer_id": str(customer.id), "service_type": "cut",
+              "products": [{"brand": "로레알", "code": "7.1"}], "photo_ids": [str(photo_id)]},
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["service_type"] == "cut"
+    assert [p["id"] for p in body["photos"]] == [str(photo_id)]
+    assert await _state(db, customer) == (before[0] + 1, before[1] + 1)
+    moved = (await db.execute(select(TreatmentPhoto).where(TreatmentPhoto.id == photo_id))).scalar_one()
+    treatment = (await db.execute(select(Treatment).where(Treatment.id == moved.treatment_id))).scalar_one()
+    # Moved into the new treatment's partition along with it
+    assert moved.treatment_id == uuid.UUID(body["id"]) != draft_id
+    assert moved.treatment_created_at == treatment.created_at
+
+
+async def test_unknown_customer_is_404_and_persists_nothing(client, db, customer, photo):
+    before = await _state(db, customer)
+
+    response = await client.post(
+        f"/api/shops/{customer.shop_id}/treatments/quick",
+        json={"customer_id": str(uuid.uuid4()), "service_type": "cut", "photo_ids": [str(photo[1])]},
+    )
+
+    assert response.status_code == 404
+    assert await _state(db, customer) == before
+    assert await db.scalar(select(TreatmentPhoto.treatment_id).where(TreatmentPhoto.id == photo[1])) == photo[0]
+
+
+async def test_unknown_designer_is_404_and_persists_nothing(client, db, customer):
+    before = await _state(db, customer)
+
+    response = await client.post(
+        f"/api/shops/{customer.shop_id}/treatments/quick",
+        json={"customer_id": str(customer.id), "designer_id": str(uuid.uuid4()), "service_type": "cut"},
+    )
+
+    assert response.status_code == 404
+    assert await _state(db, customer) == before
+
+
+async def test_other_shops_photo_rolls_back_everything(client, db, customer, photo):
+    other_shop = Shop(name="다른샵", shop_type="hair")
+    db.add(other_shop)
+    await db.commit()
+    other_customer = Customer(shop_id=other_shop.id, name="이고객")
+    db.add(other_customer)
+    await db.commit()
+    other_treatment_id, other_photo_id = await _add_photo(db, other_shop.id, other_customer.id)
+    before = await _state(db, customer)
+
+    response = await client.post(
+        f"/api/shops/{customer.shop_id}/treatments/quick",
+        json={"customer_id": str(customer.id), "service_type": "cut",
+              "photo_ids": [str(photo[1]), str(other_photo_id)]},
+    )
+
+    # The visit bump and the treatment insert ran before the photo check; both are undone
+    assert response.status_code == 404
+    assert await _state(db, customer) == before
+    owners = dict((await db.execute(select(TreatmentPhoto.id, TreatmentPhoto.treatment_id))).all())
+    assert owners == {photo[1]: photo[0], other_photo_id: other_treatment_id}
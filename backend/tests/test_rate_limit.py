@@ -0,0 +1,136 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+
+import httpx
+import pytest
+
+from app.services.rate_limit import FairLimiter, Priority, RateLimitedError
+from app.services.resilience import Upstream, request_budget
+
+SHOP_A = uuid.uuid4()
+SHOP_B = uuid.uuid4()
+SHOP_C = uuid.uuid4()
+
+
+def _limiter(**overrides) -> FairLimiter:
+    options = {"global_rate": 100.0, "global_burst": 100, "shop_rate": 0.01, "shop_burst": 2, "max_wait": 0.05}
+    return FairLimiter("test", **{**options, **overrides})
+
+
+async def test_shop_burst_is_enforced_per_shop():
+    limiter = _limiter()
+    await limiter.acquire(SHOP_A)
+    await limiter.acquire(SHOP_A)
+    with pytest.raises(RateLimitedError) as info:
+        await limiter.acquire(SHOP_A)
+    assert info.value.retry_after >= 1.0
+    # Another shop still has its own burst
+    await limiter.acquire(SHOP_B)
+    assert limiter.stats()["rejected"] == 1
+
+
+async def test_unkeyed_callers_get_the_global_limit_only():
+    limiter = _limiter(global_rate=0.01, global_burst=5)
+    for _ in range(5):
+        await limiter.acquire(None)
+    with pytest.raises(RateLimitedError):
+        await limiter.acquire(None)
+
+
+async def test_round_robin_across_shops():
+    # One token every 10 ms globally; per-shop limits out of the way
+    limiter = _limiter(global_rate=100.0, global_burst=1, shop_rate=100.0, shop_burst=100, max_wait=2.0)
+    await limiter.acquire(SHOP_A)  # drain the burst
+    order = []
+
+    async def call(shop, tag):
+        await limiter.acquire(shop)
+        order.append(tag)
+
+    tasks = [asyncio.create_task(call(SHOP_A, f"a{n}")) for n in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call(SHOP_B, "b0")))
+    await asyncio.gather(*tasks)
+    # B's single call is served after at most one more of A's, not after all four
+    assert order.index("b0") <= 1
+
+
+async def test_interactive_before_batch():
+    limiter = _limiter(global_rate=100.0, global_burst=1, shop_rate=100.0, shop_burst=100, max_wait=2.0)
+    await limiter.acquire(SHOP_A)
+    order = []
+
+    async def call(priority, tag):
+        await limiter.acquire(SHOP_A, priority)
+        order.append(tag)
+
+    batch = [asyncio.create_task(call(Priority.BATCH, f"batch{n}")) for n in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call(Priority.INTERACTIVE, "interactive"))
+    await asyncio.gather(*batch, interactive)
+    assert order[0] == "interactive"
+
+
+async def test_wait_is_bounded_by_request_budget():
+    limiter = _limiter(shop_burst=1, max_wait=30.0)
+    await limiter.acquire(SHOP_A)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with request_budget(0.05), pytest.raises(RateLimitedError):
+        await limiter.acquire(SHOP_A)
+    assert loop.time() - started < 1.0
+
+
+class ThrottlingUpstream:
+    """MockTransport handler enforcing its own limit: 429 + Retry-After above `rate` requests/second."""
+
+    WINDOW = 0.1
+
+    def __init__(self, rate: float):
+        self.max_in_window = int(rate * self.WINDOW)
+        self.recent: deque[float] = deque()
+        self.served = 0
+        self.throttled = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] >= self.WINDOW:
+            self.recent.popleft()
+        if len(self.recent) >= self.max_in_window:
+            self.throttled += 1
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        self.recent.append(now)
+        self.served += 1
+        return httpx.Response(200, json={"shop": request.url.params["shop"]})
+
+
+async def test_busy_shop_does_not_starve_others_behind_a_throttling_upstream():
+    stub = ThrottlingUpstream(rate=50)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(stub), base_url="http://upstream")
+    upstream = Upstream("stub", timeout=1.0, max_retries=3, backoff_base=0.01, backoff_max=0.05)
+    # Global rate under the upstream's; each shop may use half of it
+    limiter = _limiter(global_rate=40.0, global_burst=2, shop_rate=20.0, shop_burst=2, max_wait=5.0)
+    finished = []
+
+    async def call(shop, tag):
+        async def fn():
+            response = await client.get("/", params={"shop": tag})
+            response.raise_for_status()
+            return response.json()
+
+        await upstream.call(fn, acquire=lambda: limiter.acquire(shop))
+        finished.append(tag)
+
+    tasks = [asyncio.create_task(call(SHOP_A, "a")) for _ in range(24)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(call(shop, tag)) for shop, tag in ((SHOP_B, "b"), (SHOP_C, "c")) for _ in range(4)]
+    await asyncio.gather(*tasks)
+
+    assert sorted(finished) == ["a"] * 24 + ["b"] * 4 + ["c"] * 4
+    # The small shops are served alongside the busy one, not after its backlog
+    last_small = max(i for i, tag in enumerate(finished) if tag != "a")
+    assert last_small < finished.index("a") + 16
+    assert limiter.stats()["rejected"] == 0
+    assert stub.served == 32
@@ -0,0 +1,234 @@
+"""Upstream policy against a local fault-injecting httpx transport."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import resilience
+from app.services.rate_limit import RateLimitedError
+from app.services.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, Upstream, request_budget
+
+
+class FaultyUpstream:
+    """MockTransport handler replaying a script of faults: status codes, "hang" or "drop"."""
+
+    def __init__(self, *script, retry_after: str | None = None):
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        fault = self.script.pop(0) if self.script else 200
+        if fault == "hang":
+            await asyncio.sleep(10)
+        if fault == "drop":
+            raise httpx.ConnectError("connection reset", request=request)
+        headers = {"Retry-After": self.retry_after} if self.retry_after and fault == 429 else {}
+        return httpx.Response(fault, json={"ok": fault == 200}, headers=headers)
+
+
+def _caller(handler: FaultyUpstream):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://upstream")
+
+    async def fn():
+        response = await client.get("/")
+        response.raise_for_status()
+        return response.json()
+
+    return fn
+
+
+def _upstream(**overrides) -> Upstream:
+    options = {"timeout": 1.0, "max_retries": 2, "backoff_base": 0.01, "backoff_max": 0.02}
+    return Upstream("test", **{**options, **overrides})
+
+
+@pytest.fixture
+def jitter(monkeypatch):
+    """Record the backoff ranges drawn from and skip the actual sleep time."""
+    ranges = []
+
+    def uniform(low, high):
+        ranges.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(resilience.random, "uniform", uniform)
+    return ranges
+
+
+async def test_retries_transient_failures_with_full_jitter(jitter):
+    handler = FaultyUpstream(503, "drop")
+    upstream = _upstream(backoff_base=0.5, backoff_max=0.8)
+    assert await upstream.call(_caller(handler)) == {"ok": True}
+    assert handler.requests == 3
+    # Full jitter: uniform(0, min(max, base * 2**attempt))
+    assert jitter == [(0, 0.5), (0, 0.8)]
+    assert upstream.stats()["retries"] == 2
+
+
+async def test_client_errors_are_not_retried_or_counted():
+    handler = FaultyUpstream(400)
+    upstream = _upstream(failure_threshold=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(_caller(handler))
+    assert handler.requests == 1
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_non_idempotent_calls_are_attempted_once():
+    handler = FaultyUpstream(503)
+    with pytest.raises(httpx.HTTPStatusError):
+        await _upstream().call(_caller(handler), idempotent=False)
+    assert handler.requests == 1
+
+
+async def test_attempt_timeout():
+    handler = FaultyUpstream("hang", "hang")
+    upstream = _upstream(timeout=0.05, max_retries=1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        await upstream.call(_caller(handler))
+    assert time.monotonic() - started < 1.0
+    assert upstream.stats()["timeouts"] == 2
+
+
+async def test_breaker_opens_half_opens_and_closes():
+    handler = FaultyUpstream(500, 500)
+    upstream = _upstream(max_retries=0, failure_threshold=2, reset_timeout=0.05)
+    call = _caller(handler)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await upstream.call(call)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await upstream.call(call)
+    assert handler.requests == 2  # failed fast, upstream not called
+
+    await asyncio.sleep(0.06)
+    assert upstream.breaker.allow()  # half-open: one probe
+    assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+    assert not upstream.breaker.allow()  # ...and only one
+    upstream.breaker.record_success()
+
+    assert await upstream.call(call) == {"ok": True}
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_failed_probe_reopens():
+    handler = FaultyUpstream(500, 500)
+    upstream = _upstream(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    call = _caller(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(call)
+    await asyncio.sleep(0.06)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(call)  # the probe
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert upstream.breaker.opened_count == 2
+
+
+async def test_429_is_retried_but_never_opens_the_breaker(jitter):
+    handler = FaultyUpstream(429, 429, 429, 429, 429, 429)
+    upstream = _upstream(max_retries=2, failure_threshold=1)
+    call = _caller(handler)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await upstream.call(call)
+    assert handler.requests == 6
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+    assert upstream.stats()["throttled"] == 6
+    assert upstream.stats()["failures"] == 0
+
+
+async def test_429_probe_frees_the_half_open_slot():
+    handler = FaultyUpstream(500, 429)
+    upstream = _upstream(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    call = _caller(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(call)
+    await asyncio.sleep(0.06)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(call)  # probe throttled
+    assert await upstream.call(call) == {"ok": True}  # next probe allowed
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_request_budget_bounds_attempts():
+    handler = FaultyUpstream("hang", "hang", "hang")
+    upstream = _upstream(timeout=5.0, backoff_base=1.0, backoff_max=1.0)
+    started = time.monotonic()
+    with request_budget(0.1), pytest.raises(TimeoutError):
+        await upstream.call(_caller(handler))
+    assert time.monotonic() - started < 1.0
+    assert handler.requests == 1  # no time left for a retry
+
+
+async def test_exhausted_budget_fails_before_calling():
+    handler = FaultyUpstream()
+    with request_budget(0), pytest.raises(DeadlineExceededError):
+        await _upstream().call(_caller(handler))
+    assert handler.requests == 0
+
+
+async def test_guard_counts_failures_but_not_429():
+    upstream = _upstream(failure_threshold=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        async with upstream.guard():
+            await _caller(FaultyUpstream(429))()
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+    with pytest.raises(httpx.HTTPStatusError):
+        async with upstream.guard():
+            await _caller(FaultyUpstream(502))()
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+
+
+async def test_retry_waits_at_least_retry_after(jitter):
+    handler = FaultyUpstream(429, retry_after="0.2")
+    upstream = _upstream()
+    started = time.monotonic()
+    assert await upstream.call(_caller(handler)) == {"ok": True}
+    # The jitter drew 0; the upstream's Retry-After is the floor
+    assert time.monotonic() - started >= 0.2
+
+
+async def test_retry_after_beyond_the_budget_is_not_waited_for(jitter):
+    handler = FaultyUpstream(429, retry_after="30")
+    started = time.monotonic()
+    with request_budget(0.5), pytest.raises(httpx.HTTPStatusError):
+        await _upstream().call(_caller(handler))
+    assert time.monotonic() - started < 0.5
+    assert handler.requests == 1
+
+
+async def test_every_attempt_takes_a_token(jitter):
+    handler = FaultyUpstream(503, 429)
+    tokens = 0
+
+    async def acquire():
+        nonlocal tokens
+        tokens += 1
+
+    assert await _upstream().call(_caller(handler), acquire=acquire) == {"ok": True}
+    assert tokens == handler.requests == 3
+
+
+async def test_rate_limited_probe_frees_the_half_open_slot():
+    handler = FaultyUpstream(500)
+    upstream = _upstream(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    call = _caller(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(call)
+    await asyncio.sleep(0.06)
+
+    async def no_token():
+        raise RateLimitedError("test", 1.0)
+
+    with pytest.raises(RateLimitedError):
+        await upstream.call(call, acquire=no_token)
+    assert handler.requests == 1  # nothing sent
+    assert await upstream.call(call) == {"ok": True}  # the probe slot is free again
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
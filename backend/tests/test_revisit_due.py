@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert, select, text
+
+from app.models.models import RevisitDue, Treatment
+from app.services import revisit_due
+
+
+@pytest.fixture(autouse=True)
+def job_session(monkeypatch, session_factory):
+    monkeypatch.setattr(revisit_due, "async_session", session_factory)
+
+
+@pytest.fixture
+async def visited_customer(db, customer):
+    customer.last_visit = datetime(2026, 9, 1)
+    await db.commit()
+    return customer
+
+
+def _treatment(customer, recommendation: str, created_at: datetime) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "shop_id": customer.shop_id,
+        "customer_id": customer.id,
+        "service_type": "cut",
+        "next_visit_recommendation": recommendation,
+        "created_at": created_at,
+    }
+
+
+async def _due(db, customer) -> RevisitDue | None:
+    query = select(RevisitDue).where(RevisitDue.customer_id == customer.id)
+    return await db.scalar(query.execution_options(populate_existing=True))
+
+
+async def test_late_commit_is_picked_up_by_next_run(engine, db, visited_customer):
+    await revisit_due.run_revisit_due(full=True)
+
+    # A writer that started before the next run but commits after it
+    async with engine.connect() as writer:
+        await writer.execute(
+            insert(Treatment), [_treatment(visited_customer, "4주 후", datetime(2026, 9, 1))]
+        )
+        await asyncio.sleep(0.05)
+        stats = await revisit_due.run_revisit_due()
+        assert stats["customers"] == 0
+        await writer.commit()
+
+    await revisit_due.run_revisit_due()
+    due = await _due(db, visited_customer)
+    assert due is not None and due.interval_days == 28
+
+
+async def test_deleted_treatment_falls_back_to_previous_recommendation(db, visited_customer):
+    older = _treatment(visited_customer, "4주 후", datetime(2026, 8, 1))
+    newer = _treatment(visited_customer, "2주 후", datetime(2026, 9, 1))
+    await db.execute(insert(Treatment), [older, newer])
+    await db.commit()
+    await revisit_due.run_revisit_due(full=True)
+    assert (await _due(db, visited_customer)).treatment_id == newer["id"]
+
+    await db.execute(delete(Treatment).where(Treatment.id == newer["id"]))
+    await db.commit()
+    stats = await revisit_due.run_revisit_due()
+
+    assert stats == {**stats, "mode": "incremental", "customers": 1}
+    due = await _due(db, visited_customer)
+    assert (due.treatment_id, due.interval_days) == (older["id"], 28)
+
+
+async def test_deleting_only_recommendation_removes_due_row(db, visited_customer):
+    only = _treatment(visited_customer, "6 weeks", datetime(2026, 9, 1))
+    await db.execute(insert(Treatment), [only])
+    await db.commit()
+    await revisit_due.run_revisit_due(full=True)
+    assert await _due(db, visited_customer) is not None
+
+    await db.execute(delete(Treatment).where(Treatment.id == only["id"]))
+    await db.commit()
+    await revisit_due.run_revisit_due()
+    assert await _due(db, visited_customer) is None
+
+
+async def test_watermark_is_horizon_not_wall_clock(engine, db, visited_customer):
+    async with engine.connect() as idle:
+        await idle.execute(text("SELECT 1"))  # opens a transaction and keeps it open
+        opened = (await idle.execute(text("SELECT now()"))).scalar_one()
+        await asyncio.sleep(0.05)
+        await revisit_due.run_revisit_due(full=True)
+        watermark = await db.scalar(
+            text("SELECT last_started_at FROM revisit_job_runs WHERE job_name = :name"), {"name": revisit_due.JOB_NAME}
+        )
+        await idle.rollback()
+    assert watermark <= opened + timedelta(milliseconds=1)
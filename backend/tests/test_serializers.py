@@ -0,0 +1,123 @@
+"""serializers.py must produce exactly what the response schemas would."""
+
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from asyncpg.pgproto import pgproto
+
+from app.core.responses import dumps
+from app.models.models import Customer, Portfolio, Treatment, TreatmentPhoto
+from app.schemas.schemas import CustomerResponse, PortfolioResponse, TreatmentResponse
+from app.schemas.serializers import customer_to_dict, portfolio_to_dict, treatment_to_dict
+
+
+def _id() -> uuid.UUID:
+    # What asyncpg actually returns: a uuid.UUID subclass
+    return pgproto.UUID(str(uuid.uuid4()))
+
+
+NOW = datetime(2026, 10, 19, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def _photo(treatment_id, **overrides) -> TreatmentPhoto:
+    fields = {
+        "id": _id(),
+        "treatment_id": treatment_id,
+        "photo_url": "uploads/photos/a.jpg",
+        "photo_type": "after",
+        "face_swapped_url": None,
+        "thumbnail_url": None,
+        "is_portfolio": False,
+        "caption": "뿌리 염색",
+        "storage_tier": "hot",
+        "taken_at": NOW,
+    }
+    return TreatmentPhoto(**{**fields, **overrides})
+
+
+@pytest.fixture
+def stored_photo(upload_dir):
+    (upload_dir / "photos").mkdir()
+    (upload_dir / "photos" / "a.jpg").write_bytes(b"jpeg")
+    (upload_dir / "photos" / "a_thumb.webp").write_bytes(b"webp")
+
+
+def _roundtrip(content) -> object:
+    return orjson.loads(dumps(content))
+
+
+def test_customer_matches_schema():
+    customer = Customer(
+        id=_id(),
+        shop_id=_id(),
+        name="김고객",
+        phone="010-0000-0000",
+        gender=None,
+        birth_date=None,
+        notes=None,
+        visit_count=3,
+        last_visit=NOW,
+        created_at=datetime(2026, 1, 2, 3, 4, 5),  # naive stays naive in both
+    )
+    assert _roundtrip(customer_to_dict(customer)) == CustomerResponse.model_validate(customer).model_dump(
+        mode="json"
+    )
+
+
+def test_treatment_matches_schema(stored_photo):
+    treatment_id = _id()
+    treatment = Treatment(
+        id=treatment_id,
+        customer_id=_id(),
+        designer_id=None,
+        shop_id=_id(),
+        service_type="color",
+        service_detail="뿌리",
+        products_used=[{"brand": "로레알", "code": "7.1", "area": "뿌리"}],
+        area="뿌리",
+        duration_minutes=90,
+        price=80000,
+        satisfaction="high",
+        customer_notes=None,
+        ai_summary="요약",
+        next_visit_recommendation="4주 후",
+        created_at=NOW,
+        photos=[
+            _photo(treatment_id),
+            _photo(treatment_id, storage_tier="cold", thumbnail_url="uploads/photos/a_thumb.webp"),
+            _photo(treatment_id, photo_url="https://cdn.example.com/b.jpg"),
+        ],
+    )
+    expected = TreatmentResponse.model_validate(treatment).model_dump(mode="json")
+    assert _roundtrip(treatment_to_dict(treatment)) == expected
+    assert [p["media_url"] is not None for p in expected["photos"]] == [True, True, False]
+
+
+def test_portfolio_matches_schema(stored_photo):
+    photo = _photo(_id(), is_portfolio=True)
+    item = Portfolio(
+        id=_id(),
+        shop_id=_id(),
+        photo_id=photo.id,
+        title="봄 컬러",
+        description=None,
+        tags=["염색"],
+        is_published=True,
+        created_at=NOW,
+        photo=photo,
+    )
+    assert _roundtrip(portfolio_to_dict(item)) == PortfolioResponse.model_validate(item).model_dump(mode="json")
+
+
+def test_utc_datetimes_end_in_z():
+    assert dumps({"at": NOW}) == b'{"at":"2026-10-19T12:30:15.123456Z"}'
+
+
+async def test_list_customers_encodes_db_rows(client, customer):
+    response = await client.get(f"/api/shops/{customer.shop_id}/customers/")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": str(customer.id), "name": "김고객", "phone": None, "visit_count": 0, "last_visit": None}
+    ]
@@ -0,0 +1,138 @@
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, insert, text, update
+
+from app.core.config import settings
+from app.models.models import Customer, Treatment, TreatmentPhoto
+
+
+async def _changes(client, shop_id, since=None, limit=200) -> dict:
+    params = {"limit": limit}
+    if since:
+        params["since"] = since
+    response = await client.get(f"/api/shops/{shop_id}/sync/changes", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def _drain(client, shop_id, since=None, limit=200) -> tuple[dict[str, list], str]:
+    """Follow next_token until has_more is false; returns all rows per stream and the final token."""
+    rows: dict[str, list] = {"customers": [], "treatments": [], "portfolios": [], "deleted": []}
+    while True:
+        page = await _changes(client, shop_id, since, limit)
+        for stream in rows:
+            rows[stream] += page[stream]
+        since = page["next_token"]
+        if not page["has_more"]:
+            return rows, since
+
+
+async def _treatment(db, customer, created_at=datetime(2026, 10, 1, 12, 0)) -> uuid.UUID:
+    treatment_id = uuid.uuid4()
+    await db.execute(
+        insert(Treatment),
+        [{"id": treatment_id, "shop_id": customer.shop_id, "customer_id": customer.id,
+          "service_type": "cut", "created_at": created_at}],
+    )
+    await db.commit()
+    return treatment_id
+
+
+async def test_pages_cover_every_row_once(client, db, shop):
+    await db.execute(insert(Customer), [{"shop_id": shop.id, "name": f"고객{n}"} for n in range(7)])
+    await db.commit()
+
+    rows, token = await _drain(client, shop.id, limit=3)
+
+    assert len(rows["customers"]) == 7
+    assert len({c["id"] for c in rows["customers"]}) == 7
+    assert (await _changes(client, shop.id, token))["customers"] == []
+
+
+async def test_transaction_open_during_sync_is_picked_up_later(client, db, engine, shop):
+    _, token = await _drain(client, shop.id)
+
+    async with engine.connect() as slow:
+        await slow.execute(insert(Customer).values(shop_id=shop.id, name="느린고객"))
+        # Not committed yet: the feed must not move past this transaction's start
+        page = await _changes(client, shop.id, token)
+        assert page["customers"] == []
+        await slow.commit()
+
+    page = await _changes(client, shop.id, page["next_token"])
+    assert [c["name"] for c in page["customers"]] == ["느린고객"]
+
+
+async def test_moving_a_photo_resends_both_treatments(client, db, customer):
+    source = await _treatment(db, customer)
+    target = await _treatment(db, customer)
+    created_at = datetime(2026, 10, 1, 12, 0)
+    photo_id = uuid.uuid4()
+    await db.execute(
+        insert(TreatmentPhoto),
+        [{"id": photo_id, "treatment_id": source, "treatment_created_at": created_at,
+          "photo_url": "uploads/photos/a.jpg", "photo_type": "after"}],
+    )
+    await db.commit()
+    _, token = await _drain(client, customer.shop_id)
+
+    await db.execute(
+        update(TreatmentPhoto)
+        .where(TreatmentPhoto.id == photo_id)
+        .values(treatment_id=target)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    rows, _ = await _drain(client, customer.shop_id, token)
+
+    photos = {t["id"]: [p["id"] for p in t["photos"]] for t in rows["treatments"]}
+    assert photos == {str(source): [], str(target): [str(photo_id)]}
+
+
+async def test_deletions_arrive_as_tombstones(client, db, customer):
+    treatment_id = await _treatment(db, customer)
+    _, token = await _drain(client, customer.shop_id)
+
+    await db.execute(delete(Treatment).where(Treatment.id == treatment_id))
+    await db.commit()
+    rows, _ = await _drain(client, customer.shop_id, token)
+
+    assert {"entity": "treatments", "id": str(treatment_id)} in rows["deleted"]
+    assert rows["treatments"] == []
+
+
+async def test_horizon_is_now_without_other_transactions(db):
+    horizon, now = (await db.execute(text("SELECT sync_horizon(), now()"))).one()
+    await db.commit()
+    assert horizon == now
+
+
+async def test_idle_transaction_holds_the_feed_back_only_up_to_the_cap(
+    client, db, engine, shop, monkeypatch, caplog
+):
+    _, token = await _drain(client, shop.id)
+    monkeypatch.setattr(settings, "SYNC_HORIZON_MAX_LAG_SECONDS", 0)
+
+    async with engine.connect() as idle:
+        await idle.execute(text("SELECT 1"))  # open transaction, never committed
+        await db.execute(insert(Customer).values(shop_id=shop.id, name="새고객"))
+        await db.commit()
+
+        with caplog.at_level(logging.WARNING, logger="app.services.sync"):
+            page = await _changes(client, shop.id, token)
+
+    assert [c["name"] for c in page["customers"]] == ["새고객"]
+    assert "sync horizon capped" in caplog.text
+
+
+async def test_horizon_function_pins_search_path(db):
+    config = await db.scalar(text("SELECT proconfig FROM pg_proc WHERE proname = 'sync_horizon'"))
+    await db.commit()
+    assert config == ["search_path=pg_catalog, public"]
+
+
+async def test_bad_token_is_400(client, shop):
+    response = await client.get(f"/api/shops/{shop.id}/sync/changes", params={"since": "garbage"})
+    assert response.status_code == 400
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.api import voice_memo
+from app.core.config import settings
+from app.main import app
+from app.services import openai_service
+from app.services.audio import AudioChunk
+from app.services.openai_service import (
+    TreatmentExtraction,
+    stitch_transcripts,
+    stream_treatment_info,
+    transcribe_audio,
+)
+from app.services.resilience import Upstream
+
+
+@pytest.fixture
+def chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIO_PREPROCESS_ENABLED", False)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"chunk{i}.ogg"
+        path.write_bytes(b"opus")
+        paths.append(str(path))
+
+    async def split_audio(path, max_chunk, overlap):
+        return [AudioChunk(p, i * 60.0, (i + 1) * 60.0) for i, p in enumerate(paths)]
+
+    monkeypatch.setattr(openai_service, "split_audio", split_audio)
+    return paths
+
+
+def test_stitch_drops_overlap_once():
+    assert stitch_transcripts(["펌 시술 후 다음 달", "다음 달 재방문 권장"]) == "펌 시술 후 다음 달 재방문 권장"
+
+
+async def test_chunks_are_stitched_in_order(chunks, monkeypatch):
+    async def transcribe(path, shop_id, priority):
+        await asyncio.sleep(0.01 * (3 - chunks.index(path)))  # finish out of order
+        return f"part{chunks.index(path)}"
+
+    monkeypatch.setattr(openai_service, "_transcribe_file", transcribe)
+
+    assert await transcribe_audio("memo.webm") == "part0 part1 part2"
+    assert not any(os.path.exists(p) for p in chunks)
+
+
+async def test_failed_chunk_cancels_siblings_before_cleanup(chunks, monkeypatch):
+    in_use_at_cancel = []
+
+    async def transcribe(path, shop_id, priority):
+        if path == chunks[0]:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            in_use_at_cancel.append(os.path.exists(path))
+            raise
+
+    monkeypatch.setattr(openai_service, "_transcribe_file", transcribe)
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        await asyncio.wait_for(transcribe_audio("memo.webm"), timeout=2)
+    assert in_use_at_cancel == [True, True]
+    assert not any(os.path.exists(p) for p in chunks)
+
+
+class FakeStream:
+    """Stands in for client.beta.chat.completions.stream(...)."""
+
+    def __init__(self, snapshots: list[dict], delay: float = 0.0):
+        self.snapshots = snapshots
+        self.delay = delay
+        self.closed = False
+
+    def __call__(self, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def __aiter__(self):
+        for parsed in self.snapshots:
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(type="content.delta", parsed=parsed)
+
+    async def get_final_completion(self):
+        parsed = TreatmentExtraction(**self.snapshots[-1])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=parsed))])
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    stream = FakeStream(
+        [
+            {"customer_name": "김"},
+            {"customer_name": "김고객", "service_type": "펌"},
+            {"customer_name": "김고객", "service_type": "펌", "summary": "다음 달 재방문"},
+        ]
+    )
+    monkeypatch.setattr(openai_service, "client", SimpleNamespace(beta=SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(stream=stream)))))
+    monkeypatch.setattr(openai_service, "upstream", Upstream("test", timeout=0.2, max_retries=0))
+    return stream
+
+
+async def test_slow_consumer_does_not_count_against_upstream_timeout(fake_stream):
+    events = []
+    async for kind, payload in stream_treatment_info("전사문"):
+        events.append(kind)
+        await asyncio.sleep(0.15)  # two of these exceed the 0.2 s upstream timeout
+
+    assert events == ["partial", "partial", "result"]
+    assert openai_service.upstream.stats()["timeouts"] == 0
+
+
+async def test_closing_the_stream_stops_the_upstream_read(fake_stream):
+    fake_stream.delay = 0.05
+    stream = stream_treatment_info("전사문")
+    assert (await anext(stream))[0] == "partial"
+    await stream.aclose()
+
+    assert fake_stream.closed
+    assert not openai_service.upstream.breaker._probe_in_flight
+
+
+async def test_upstream_error_reaches_the_consumer(fake_stream):
+    fake_stream.snapshots = [{"customer_name": "김"}] * 3
+    fake_stream.delay = 0.5  # past the upstream timeout
+
+    with pytest.raises(TimeoutError):
+        async for _ in stream_treatment_info("전사문"):
+            pass
+    assert openai_service.upstream.stats()["timeouts"] == 1
+
+
+async def test_stream_endpoint_accepts_format_alias(fake_stream, monkeypatch):
+    async def transcribe(path, shop_id=None):
+        return "전사문"
+
+    monkeypatch.setattr(voice_memo, "transcribe_audio", transcribe)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.post(
+            "/api/voice/transcribe/stream",
+            params={"format": "ndjson"},
+            files={"file": ("memo.webm", b"audio")},
+        )
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["event"] for line in lines] == ["transcript", "partial", "partial", "result"]
+    assert lines[-1]["data"]["summary"] == "다음 달 재방문"
@@ -218,7 +218,7 @@ export async function transcribeVoiceMemo(audioBlob: Blob): Promise<VoiceMemoRes
   const formData = new FormData();
   formData.append("file", audioBlob, "voice-memo.webm");
 
-  const res = await fetch(`${API_BASE}/voice/transcribe`, {
+  const res = await fetch(`${API_BASE}/voice/transcribe?shop_id=${SHOP_ID}`, {
     method: "POST",
     body: formData,
   });
@@ -282,7 +282,7 @@ export function startFaceSwap(sourcePhotoId: string, targetPhotoId: string) {
 }
 
 export function getFaceSwapStatus(jobId: string) {
-  return request<FaceSwapJob>(`/face-swap/status/${jobId}`);
+  return request<FaceSwapJob>(`/face-swap/status/${jobId}?shop_id=${SHOP_ID}`);
 }
 
 export function completeFaceSwap(photoId: string, faceSwappedUrl: string) {
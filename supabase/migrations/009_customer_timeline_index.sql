@@ -0,0 +1,14 @@
+-- Covering index for the customer timeline (GET .../customers/{id}/timeline)
+-- Serves "WHERE customer_id = ? ORDER BY created_at DESC, id DESC LIMIT n" as an
+-- index-only scan; id is part of the keyset cursor so visits recorded in the
+-- same instant are neither skipped nor repeated across pages. Supersedes
+-- idx_treatments_customer_id (same leading column).
+CREATE INDEX IF NOT EXISTS idx_treatments_customer_created_at
+  ON treatments(customer_id, created_at DESC, id DESC)
+  INCLUDE (shop_id, service_type, service_detail, satisfaction, next_visit_recommendation);
+
+DROP INDEX IF EXISTS idx_treatments_customer_id;
+
+-- Per-treatment photo count, cover lookup and lazy photo paging
+CREATE INDEX IF NOT EXISTS idx_treatment_photos_treatment_taken_at
+  ON treatment_photos(treatment_id, taken_at DESC);
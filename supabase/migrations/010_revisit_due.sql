@@ -0,0 +1,69 @@
+-- 010: 재방문 예정 고객 (revisit_due)
+-- Filled by the batch job in backend/app/services/revisit_due.py; read by
+-- GET /shops/{shop_id}/customers/revisit-due.
+
+-- Parse free-text recommendations ("4주 후", "2개월", "45일", "6 weeks") into days.
+-- Returns NULL when no interval can be recognised.
+create or replace function parse_revisit_interval_days(rec text)
+returns integer as $$
+declare
+  m text[];
+  n integer;
+begin
+  if rec is null then
+    return null;
+  end if;
+  m := regexp_match(lower(rec), '(\d+)\s*(일|주|개월|달|days?|weeks?|months?)');
+  if m is null then
+    return null;
+  end if;
+  n := m[1]::integer;
+  return case
+    when m[2] in ('주', 'week', 'weeks') then n * 7
+    when m[2] in ('개월', '달', 'month', 'months') then n * 30
+    else n
+  end;
+end;
+$$ language plpgsql immutable;
+
+create table revisit_due (
+  customer_id uuid primary key references customers(id) on delete cascade,
+  shop_id uuid not null references shops(id) on delete cascade,
+  treatment_id uuid references treatments(id) on delete set null,
+  last_visit timestamptz not null,
+  interval_days integer not null,
+  due_at timestamptz not null,
+  computed_at timestamptz not null default now()
+);
+
+create index idx_revisit_due_shop_due_at on revisit_due(shop_id, due_at);
+
+-- Watermark for incremental runs
+create table revisit_job_runs (
+  job_name varchar(50) primary key,
+  last_started_at timestamptz not null,
+  last_finished_at timestamptz
+);
+
+-- Customers with a visit, per shop (also serves list_customers' last_visit ordering)
+create index if not exists idx_customers_shop_last_visit on customers(shop_id, last_visit desc);
+
+-- Change detection for incremental runs
+create index if not exists idx_customers_updated_at on customers(updated_at);
+create index if not exists idx_treatments_updated_at on treatments(updated_at);
+
+-- A deleted treatment leaves no row for the incremental run to find, and a
+-- treatment moved to another customer only shows up under its new customer -
+-- so touch the (old) customer instead. The sync feed re-sends that customer
+-- too, which is harmless.
+create or replace function touch_treatment_customer()
+returns trigger as $$
+begin
+  update customers set updated_at = now() where id = old.customer_id;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger treatments_touch_customer
+  after delete or update of customer_id on treatments
+  for each row execute function touch_treatment_customer();
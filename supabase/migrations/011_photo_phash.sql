@@ -0,0 +1,5 @@
+-- 011: 사진 중복 감지용 perceptual hash
+-- phash: 64-bit pHash stored as signed bigint; sharpness: edge variance used to pick the best shot
+ALTER TABLE treatment_photos
+  ADD COLUMN IF NOT EXISTS phash bigint,
+  ADD COLUMN IF NOT EXISTS sharpness real;
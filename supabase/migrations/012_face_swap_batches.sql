@@ -0,0 +1,30 @@
+-- 012: 페이스 스왑 일괄 처리 (batch)
+-- One batch = one source (model) face applied to many target photos.
+--
+-- Batch runners claim items in the database (pending -> in_flight with
+-- FOR UPDATE SKIP LOCKED) before submitting them to AKOOL, so two runners -
+-- in different API workers, or a resume racing a running batch - never
+-- submit the same item twice. An item left in_flight by a crashed runner is
+-- reclaimed once its updated_at is older than FACE_SWAP_CLAIM_TIMEOUT_SECONDS.
+create table face_swap_batches (
+  id uuid primary key default gen_random_uuid(),
+  shop_id uuid not null references shops(id) on delete cascade,
+  source_photo_id uuid not null references treatment_photos(id),
+  created_at timestamptz not null default now()
+);
+
+create index idx_face_swap_batches_shop_id on face_swap_batches(shop_id);
+
+create table face_swap_batch_items (
+  id uuid primary key default gen_random_uuid(),
+  batch_id uuid not null references face_swap_batches(id) on delete cascade,
+  target_photo_id uuid not null references treatment_photos(id),
+  status varchar(20) not null default 'pending', -- pending, in_flight, submitted, failed
+  job_id varchar(100),
+  error text,
+  updated_at timestamptz not null default now(),
+  unique (batch_id, target_photo_id),
+  constraint check_face_swap_item_status check (status in ('pending', 'in_flight', 'submitted', 'failed'))
+);
+
+create index idx_face_swap_batch_items_batch_status on face_swap_batch_items(batch_id, status);
@@ -0,0 +1,206 @@
+-- 013: Hot/cold tiering - monthly range partitions for treatments and treatment_photos
+--
+-- treatments is partitioned by created_at; treatment_photos by the owning
+-- treatment's created_at (new column treatment_created_at), so a treatment
+-- and its photos always live in the same month. Queries ordered by
+-- created_at with a LIMIT (list_treatments) scan partitions newest-first and
+-- stop early; queries with a created_at range are pruned at plan time.
+--
+-- There is deliberately no DEFAULT partition: with one, the planner can't
+-- treat the partitions as ordered by created_at (the default may hold any
+-- month) and ORDER BY created_at DESC LIMIT n merges every partition.
+-- Partitions are created here from the oldest existing row to three months
+-- ahead; photo_archive.ensure_partitions (nightly) keeps them ahead of the
+-- clock. created_at is always stamped by the server, so no new row falls
+-- outside them.
+--
+-- Lookups by id alone (no created_at) still probe the id index of every
+-- partition; the hot ones are served from the API's entity cache.
+--
+-- Postgres requires the partition key in every unique constraint, so the
+-- primary keys become (id, created_at) / (id, treatment_created_at).
+-- Foreign keys that pointed at treatments(id) or treatment_photos(id) alone
+-- (portfolios, revisit_due, face_swap_*) can no longer be declared; the
+-- triggers at the end of this file enforce them instead, with the same
+-- semantics (no action, or set null for revisit_due).
+
+-- Create one partition per month in [from_month, to_month]
+create or replace function create_monthly_partitions(parent text, from_month date, to_month date)
+returns void as $$
+declare
+  m date := date_trunc('month', from_month)::date;
+begin
+  while m <= to_month loop
+    execute format(
+      'create table if not exists %I partition of %I for values from (%L) to (%L)',
+      parent || '_' || to_char(m, 'YYYY_MM'),
+      parent,
+      m::text || ' 00:00:00+00',
+      (m + interval '1 month')::date::text || ' 00:00:00+00'
+    );
+    m := (m + interval '1 month')::date;
+  end loop;
+end;
+$$ language plpgsql;
+
+-- Detach foreign keys pointing at the tables being rebuilt
+alter table treatment_photos drop constraint if exists treatment_photos_treatment_id_fkey;
+alter table portfolios drop constraint if exists portfolios_photo_id_fkey;
+alter table revisit_due drop constraint if exists revisit_due_treatment_id_fkey;
+alter table face_swap_batches drop constraint if exists face_swap_batches_source_photo_id_fkey;
+alter table face_swap_batch_items drop constraint if exists face_swap_batch_items_target_photo_id_fkey;
+
+alter table treatments rename to treatments_unpartitioned;
+alter table treatment_photos rename to treatment_photos_unpartitioned;
+
+-- Treatments
+create table treatments (
+  like treatments_unpartitioned including defaults including constraints
+) partition by range (created_at);
+
+select create_monthly_partitions(
+  'treatments',
+  coalesce((select min(created_at) from treatments_unpartitioned)::date, current_date),
+  (current_date + interval '3 months')::date
+);
+
+insert into treatments select * from treatments_unpartitioned;
+
+-- Treatment photos (+ tiering columns)
+create table treatment_photos (
+  like treatment_photos_unpartitioned including defaults including constraints,
+  treatment_created_at timestamptz not null,
+  storage_tier varchar(10) not null default 'hot', -- hot, cold
+  cold_key varchar(500),
+  archived_at timestamptz,
+  constraint check_storage_tier check (storage_tier in ('hot', 'cold'))
+) partition by range (treatment_created_at);
+
+select create_monthly_partitions(
+  'treatment_photos',
+  coalesce((select min(created_at) from treatments_unpartitioned)::date, current_date),
+  (current_date + interval '3 months')::date
+);
+
+insert into treatment_photos
+select p.*, t.created_at, 'hot', null, null
+from treatment_photos_unpartitioned p
+join treatments_unpartitioned t on t.id = p.treatment_id;
+
+drop table treatment_photos_unpartitioned;
+drop table treatments_unpartitioned;
+
+-- Keys
+alter table treatments
+  add primary key (id, created_at),
+  add foreign key (customer_id) references customers(id),
+  add foreign key (designer_id) references designers(id),
+  add foreign key (shop_id) references shops(id);
+
+alter table treatment_photos
+  add primary key (id, treatment_created_at),
+  add foreign key (treatment_id, treatment_created_at)
+    references treatments(id, created_at) on delete cascade on update cascade;
+
+-- Indexes (created on every partition)
+create index idx_treatments_shop_created_at on treatments(shop_id, created_at desc);
+create index idx_treatments_created_at on treatments(created_at desc);
+create index idx_treatments_designer_id on treatments(designer_id);
+create index idx_treatments_updated_at on treatments(updated_at);
+create index idx_treatments_customer_created_at
+  on treatments(customer_id, created_at desc, id desc)
+  include (shop_id, service_type, service_detail, satisfaction, next_visit_recommendation);
+create index idx_treatments_id on treatments(id);
+
+create index idx_treatment_photos_treatment_id on treatment_photos(treatment_id);
+create index idx_treatment_photos_treatment_taken_at on treatment_photos(treatment_id, taken_at desc);
+create index idx_treatment_photos_id on treatment_photos(id);
+create index idx_treatment_photos_hot on treatment_photos(treatment_created_at) where storage_tier = 'hot';
+
+create trigger treatments_updated_at
+  before update on treatments
+  for each row execute function update_updated_at();
+
+create trigger treatments_touch_customer
+  after delete or update of customer_id on treatments
+  for each row execute function touch_treatment_customer();
+
+-- Foreign keys on id alone, as triggers. The referenced row is locked
+-- key share like a real foreign key check does, so a concurrent delete
+-- waits for (or is seen by) the referencing insert. An UPDATE that moves a
+-- row to another partition fires the delete triggers too, hence the "still
+-- there" checks.
+create or replace function check_reference()
+returns trigger as $$
+declare
+  ref_id uuid := to_jsonb(new) ->> tg_argv[0];
+  n integer;
+begin
+  if ref_id is null then
+    return null;
+  end if;
+  execute format('select 1 from %I where id = $1 for key share', tg_argv[1]) using ref_id;
+  get diagnostics n = row_count;
+  if n = 0 then
+    raise foreign_key_violation using message = format(
+      '%s.%s = %s is not present in %s', tg_table_name, tg_argv[0], ref_id, tg_argv[1]);
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger portfolios_photo_fkey
+  after insert or update of photo_id on portfolios
+  for each row execute function check_reference('photo_id', 'treatment_photos');
+
+create trigger revisit_due_treatment_fkey
+  after insert or update of treatment_id on revisit_due
+  for each row execute function check_reference('treatment_id', 'treatments');
+
+create trigger face_swap_batches_source_photo_fkey
+  after insert or update of source_photo_id on face_swap_batches
+  for each row execute function check_reference('source_photo_id', 'treatment_photos');
+
+create trigger face_swap_batch_items_target_photo_fkey
+  after insert or update of target_photo_id on face_swap_batch_items
+  for each row execute function check_reference('target_photo_id', 'treatment_photos');
+
+create or replace function restrict_photo_delete()
+returns trigger as $$
+begin
+  if exists (select 1 from treatment_photos where id = old.id) then
+    return null;
+  end if;
+  if exists (select 1 from portfolios where photo_id = old.id)
+     or exists (select 1 from face_swap_batches where source_photo_id = old.id)
+     or exists (select 1 from face_swap_batch_items where target_photo_id = old.id) then
+    raise foreign_key_violation using message = format(
+      'treatment_photos id = %s is still referenced from portfolios or face_swap_*', old.id);
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger treatment_photos_restrict_delete
+  after delete on treatment_photos
+  for each row execute function restrict_photo_delete();
+
+create or replace function release_treatment_references()
+returns trigger as $$
+begin
+  if not exists (select 1 from treatments where id = old.id) then
+    update revisit_due set treatment_id = null where treatment_id = old.id;
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger treatments_release_references
+  after delete on treatments
+  for each row execute function release_treatment_references();
+
+-- Referencing-side indexes for the delete checks
+create index if not exists idx_portfolios_photo_id on portfolios(photo_id);
+create index if not exists idx_revisit_due_treatment_id on revisit_due(treatment_id);
+create index if not exists idx_face_swap_batches_source_photo_id on face_swap_batches(source_photo_id);
+create index if not exists idx_face_swap_batch_items_target_photo_id on face_swap_batch_items(target_photo_id);
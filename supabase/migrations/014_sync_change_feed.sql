@@ -0,0 +1,112 @@
+-- 014: 태블릿 델타 동기화 (change feed)
+--
+-- GET /api/shops/{shop_id}/sync/changes returns customers, treatments and
+-- portfolios changed since a sync token, keyset-paginated on
+-- (updated_at, id), plus tombstones for deleted rows.
+--
+-- updated_at is always stamped by the database (before insert or update), so
+-- every row's updated_at is its writing transaction's start time. The feed
+-- never reads past the start of the oldest still-open client transaction, so
+-- a row can't commit "behind" a token that was already handed out.
+
+-- Stamp updated_at on insert as well as update (app-server clocks don't matter)
+drop trigger if exists customers_updated_at on customers;
+create trigger customers_updated_at
+  before insert or update on customers
+  for each row execute function update_updated_at();
+
+drop trigger if exists treatments_updated_at on treatments;
+create trigger treatments_updated_at
+  before insert or update on treatments
+  for each row execute function update_updated_at();
+
+alter table portfolios add column if not exists updated_at timestamptz not null default now();
+drop trigger if exists portfolios_updated_at on portfolios;
+create trigger portfolios_updated_at
+  before insert or update on portfolios
+  for each row execute function update_updated_at();
+
+-- Photos are embedded in treatments and portfolios; a photo change re-syncs its
+-- parents. A photo moved to another treatment (quick record re-parents
+-- uploaded photos) touches both, or synced tablets would keep showing it
+-- under the old one.
+create or replace function touch_photo_parents()
+returns trigger as $$
+begin
+  if tg_op <> 'INSERT' then
+    update treatments set updated_at = now()
+      where id = old.treatment_id and created_at = old.treatment_created_at;
+    update portfolios set updated_at = now() where photo_id = old.id;
+  end if;
+  if tg_op = 'INSERT'
+     or (new.treatment_id, new.treatment_created_at)
+        is distinct from (old.treatment_id, old.treatment_created_at) then
+    update treatments set updated_at = now()
+      where id = new.treatment_id and created_at = new.treatment_created_at;
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger treatment_photos_touch_parents
+  after insert or update or delete on treatment_photos
+  for each row execute function touch_photo_parents();
+
+-- Tombstones for deleted rows
+create table sync_tombstones (
+  id uuid primary key default gen_random_uuid(),
+  shop_id uuid not null,
+  entity varchar(20) not null, -- customers, treatments, portfolios
+  entity_id uuid not null,
+  deleted_at timestamptz not null default now()
+);
+
+create index idx_sync_tombstones_shop_deleted_at on sync_tombstones(shop_id, deleted_at, id);
+create index idx_sync_tombstones_deleted_at on sync_tombstones(deleted_at);
+
+-- For the partitioned treatments table tg_table_name is the partition
+-- (treatments_2026_10); the entity is the partition root's name.
+create or replace function record_tombstone()
+returns trigger as $$
+begin
+  insert into sync_tombstones (shop_id, entity, entity_id)
+  values (old.shop_id, (select relname from pg_class where oid = pg_partition_root(tg_relid)), old.id);
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger customers_tombstone
+  after delete on customers
+  for each row execute function record_tombstone();
+
+create trigger treatments_tombstone
+  after delete on treatments
+  for each row execute function record_tombstone();
+
+create trigger portfolios_tombstone
+  after delete on portfolios
+  for each row execute function record_tombstone();
+
+-- Keyset pagination of changes per shop
+create index idx_customers_shop_updated_at on customers(shop_id, updated_at, id);
+create index idx_treatments_shop_updated_at on treatments(shop_id, updated_at, id);
+create index idx_portfolios_shop_updated_at on portfolios(shop_id, updated_at, id);
+
+-- Start of the oldest open client transaction (other than the caller's) in
+-- this database: every row stamped before it is committed and visible.
+-- Background processes (autovacuum etc.) never write synced rows and are
+-- ignored, or a long vacuum would hold the feed back. The API caps how far
+-- back this may lag (SYNC_HORIZON_MAX_LAG_SECONDS, app.services.sync).
+-- security definer so the API role can see other sessions' xact_start;
+-- search_path pinned so callers can't shadow pg_stat_activity.
+create or replace function sync_horizon()
+returns timestamptz as $$
+  select least(
+    now(),
+    (select min(xact_start) from pg_stat_activity
+     where datname = current_database()
+       and backend_type = 'client backend'
+       and pid <> pg_backend_pid()
+       and xact_start is not null)
+  );
+$$ language sql stable security definer set search_path = pg_catalog, public;
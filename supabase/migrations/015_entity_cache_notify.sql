@@ -0,0 +1,79 @@
+-- 015: API 워커 엔티티 캐시 무효화 (LISTEN/NOTIFY)
+--
+-- Each API worker caches hot rows by id (app.services.entity_cache) and
+-- LISTENs on `entity_cache`. Any update or delete made outside the worker
+-- holding the cache - other API workers, batch jobs (photo_archive,
+-- face_swap_batch, revisit_due) or SQL run against the database - sends
+-- `<table>:<id>`, delivered when the writing transaction commits (duplicates
+-- within one transaction are collapsed). Inserts need no notification:
+-- misses are not cached.
+--
+-- The payload names the partition root: for the partitioned treatments and
+-- treatment_photos tables tg_table_name is the partition (treatments_2026_10),
+-- not the table the API caches under.
+--
+-- Updates that change nothing but updated_at don't notify. Every photo write
+-- touches its treatment (touch_photo_parents, migration 014) and treatment
+-- writes touch their customer; evicting on those would drop the treatment
+-- from every worker's cache on each upload. No cached lookup serves
+-- updated_at, so the stale value is harmless.
+--
+-- Notifications only reach a listener on a real server session: LISTEN
+-- through a transaction-mode pooler (Supabase port 6543) never receives
+-- them. See ENTITY_CACHE_LISTEN_URL.
+
+create or replace function notify_entity_change()
+returns trigger as $$
+begin
+  perform pg_notify(
+    'entity_cache',
+    (select relname from pg_class where oid = pg_partition_root(tg_relid)) || ':' || old.id::text
+  );
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger shops_entity_cache
+  after update on shops
+  for each row when ((to_jsonb(old) - 'updated_at') is distinct from (to_jsonb(new) - 'updated_at'))
+  execute function notify_entity_change();
+
+create trigger shops_entity_cache_delete
+  after delete on shops
+  for each row execute function notify_entity_change();
+
+create trigger designers_entity_cache
+  after update on designers
+  for each row when ((to_jsonb(old) - 'updated_at') is distinct from (to_jsonb(new) - 'updated_at'))
+  execute function notify_entity_change();
+
+create trigger designers_entity_cache_delete
+  after delete on designers
+  for each row execute function notify_entity_change();
+
+create trigger customers_entity_cache
+  after update on customers
+  for each row when ((to_jsonb(old) - 'updated_at') is distinct from (to_jsonb(new) - 'updated_at'))
+  execute function notify_entity_change();
+
+create trigger customers_entity_cache_delete
+  after delete on customers
+  for each row execute function notify_entity_change();
+
+create trigger treatments_entity_cache
+  after update on treatments
+  for each row when ((to_jsonb(old) - 'updated_at') is distinct from (to_jsonb(new) - 'updated_at'))
+  execute function notify_entity_change();
+
+create trigger treatments_entity_cache_delete
+  after delete on treatments
+  for each row execute function notify_entity_change();
+
+create trigger treatment_photos_entity_cache
+  after update on treatment_photos
+  for each row when ((to_jsonb(old) - 'updated_at') is distinct from (to_jsonb(new) - 'updated_at'))
+  execute function notify_entity_change();
+
+create trigger treatment_photos_entity_cache_delete
+  after delete on treatment_photos
+  for each row execute function notify_entity_change();